@@ -0,0 +1,635 @@
+"""
+Offline benchmarks for the terminal's services.
+
+Google Calendar calls go to the local stand-in in calendar_stand_in.py with
+throwaway credentials, and email to the SMTP stand-in in smtp_stand_in.py, so
+results are reproducible without network access.
+
+    python chatgpt-terminal/benchmark.py --runs 50 calendar
+"""
+import argparse
+import asyncio
+import json
+import os
+import pickle
+import smtplib
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from email.mime.text import MIMEText
+import numpy as np
+import pytz
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build
+from openai import AsyncOpenAI
+from calendar_stand_in import CalendarStandIn
+from smtp_stand_in import SMTPStandIn
+from services import intervals
+from services.email_outbox import EmailOutbox
+from services.email_service import EmailService
+from services.smtp_pool import SMTPPool
+from services.session_journal import SessionJournal
+from services.google_calendar_service import GoogleCalendarService
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from shared import openai_clients
+from shared.model_router import ModelRouter
+from shared.openai_stand_in import OpenAIStandIn
+
+def report(name: str, values: list) -> None:
+    print(f"{name:<34} mean={statistics.mean(values) * 1000:8.2f}ms  p50={statistics.median(values) * 1000:8.2f}ms  max={max(values) * 1000:8.2f}ms")
+
+def write_token(directory: str) -> str:
+    """A token.pickle holding credentials that stay valid for the whole benchmark"""
+    token_path = os.path.join(directory, 'token.pickle')
+    creds = Credentials(token="benchmark-token", expiry=datetime.utcnow() + timedelta(hours=1))
+    with open(token_path, 'wb') as token:
+        pickle.dump(creds, token)
+    return token_path
+
+def list_events_uncached(token_path: str, api_endpoint: str) -> dict:
+    """The original per-call path: unpickle the token and build a new service for every call"""
+    with open(token_path, 'rb') as token:
+        creds = pickle.load(token)
+    service = build('calendar', 'v3', credentials=creds, client_options={"api_endpoint": api_endpoint})
+    return service.events().list(calendarId='primary', maxResults=10, singleEvents=True).execute()
+
+def bench_calendar(args) -> None:
+    """Per-call overhead of list_events: new service per call vs cached credentials and service"""
+    stand_in = CalendarStandIn(latency=args.latency, handshake_delay=args.handshake_delay)
+    server = stand_in.serve()
+    api_endpoint = f"http://localhost:{server.server_port}/calendar/v3/"
+    now = datetime.now()
+    for i in range(10):
+        start = now + timedelta(hours=i + 1)
+        stand_in.add_event('primary', {
+            "summary": f"Event {i}",
+            "start": {"dateTime": start.isoformat() + 'Z'},
+            "end": {"dateTime": (start + timedelta(minutes=30)).isoformat() + 'Z'}
+        })
+
+    with tempfile.TemporaryDirectory() as directory:
+        token_path = write_token(directory)
+        print(f"Stand-in latency {args.latency * 1000:.0f}ms, connection setup {args.handshake_delay * 1000:.0f}ms")
+
+        connections = stand_in.connections
+        values = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            list_events_uncached(token_path, api_endpoint)
+            values.append(time.perf_counter() - started)
+        report("new service per call", values)
+        print(f"{'':<34} {stand_in.connections - connections} connections opened")
+
+        service = GoogleCalendarService(token_path=token_path, api_endpoint=api_endpoint)
+        connections = stand_in.connections
+        values = []
+        overhead = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            service._get_events()
+            overhead.append(time.perf_counter() - started)
+            result = service.list_events()
+            values.append(time.perf_counter() - started)
+            assert result["success"], result["message"]
+        report("cached service", values)
+        report("  of which credentials + service", overhead)
+        print(f"{'':<34} {stand_in.connections - connections} connections opened")
+
+        values = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            with open(token_path, 'rb') as token:
+                creds = pickle.load(token)
+            build('calendar', 'v3', credentials=creds, client_options={"api_endpoint": api_endpoint})
+            values.append(time.perf_counter() - started)
+        report("  uncached credentials + build", values)
+    server.shutdown()
+
+def seed_events(stand_in: CalendarStandIn, count: int, days: int = 365) -> None:
+    """Spread count 30-60 minute events over the next `days` days"""
+    rng = np.random.default_rng(0)
+    now = datetime.now(pytz.UTC).replace(minute=0, second=0, microsecond=0)
+    for i, offset in enumerate(np.sort(rng.uniform(-days / 4, days, count))):
+        start = now + timedelta(days=float(offset))
+        stand_in.add_event('primary', {
+            "summary": f"Event {i}",
+            "start": {"dateTime": start.isoformat()},
+            "end": {"dateTime": (start + timedelta(minutes=int(rng.choice([30, 45, 60])))).isoformat()}
+        })
+
+def bench_mirror(args) -> None:
+    """list_events answered by the API every call vs the local mirror with delta syncs"""
+    stand_in = CalendarStandIn(latency=args.latency)
+    server = stand_in.serve()
+    api_endpoint = f"http://localhost:{server.server_port}/calendar/v3/"
+    seed_events(stand_in, args.events)
+
+    with tempfile.TemporaryDirectory() as directory:
+        token_path = write_token(directory)
+        print(f"{args.events} events, stand-in latency {args.latency * 1000:.0f}ms")
+
+        direct = GoogleCalendarService(token_path=token_path, api_endpoint=api_endpoint)
+        values = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            direct.list_events(max_results=50)
+            values.append(time.perf_counter() - started)
+        report("API list_events", values)
+
+        mirrored = GoogleCalendarService(token_path=token_path, api_endpoint=api_endpoint,
+                                         mirror_path=os.path.join(directory, 'mirror.db'))
+        mirror = mirrored._get_mirror()
+        started = time.perf_counter()
+        mirror.sync()
+        print(f"{'initial full sync':<34} {(time.perf_counter() - started) * 1000:8.2f}ms ({len(mirror)} events)")
+
+        values = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            mirrored.list_events(max_results=50)
+            values.append(time.perf_counter() - started)
+        report("mirror list_events", values)
+
+        now = time.time()
+        values = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            mirror.query(now, now + 7 * 86400, 50)
+            values.append(time.perf_counter() - started)
+        report("  of which interval index query", values)
+
+        seed_events(stand_in, args.changes, days=7)
+        started = time.perf_counter()
+        mirror.sync()
+        print(f"{'delta sync':<34} {(time.perf_counter() - started) * 1000:8.2f}ms ({args.changes} changes)")
+    server.shutdown()
+
+def bench_batch(args) -> None:
+    """Creating many events: one create_event call per event vs batched create_events"""
+    stand_in = CalendarStandIn(latency=args.latency, rate_limit_every=args.rate_limit_every)
+    server = stand_in.serve()
+    api_endpoint = f"http://localhost:{server.server_port}/calendar/v3/"
+    now = datetime.now().replace(minute=0, second=0, microsecond=0)
+    events = [{
+        "summary": f"Session {i + 1}",
+        "start_time": (now + timedelta(days=i + 1)).isoformat(),
+        "end_time": (now + timedelta(days=i + 1, hours=1)).isoformat()
+    } for i in range(args.events)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        service = GoogleCalendarService(token_path=write_token(directory), api_endpoint=api_endpoint)
+        print(f"{args.events} events, stand-in latency {args.latency * 1000:.0f}ms")
+
+        requests_before = stand_in.requests
+        started = time.perf_counter()
+        created = sum(service.create_event(**event)["success"] for event in events)
+        elapsed = time.perf_counter() - started
+        print(f"{'create_event per event':<34} {elapsed * 1000:8.1f}ms  {created} created, {stand_in.requests - requests_before} HTTP requests")
+
+        requests_before = stand_in.requests
+        started = time.perf_counter()
+        result = service.create_events(events)
+        elapsed = time.perf_counter() - started
+        created = sum(item["success"] for item in result["results"])
+        print(f"{'create_events (batched)':<34} {elapsed * 1000:8.1f}ms  {created} created, {stand_in.requests - requests_before} HTTP requests")
+    server.shutdown()
+
+def bench_free_slots(args) -> None:
+    """Free-window computation over a busy calendar: pure-Python scan vs NumPy interval arithmetic"""
+    rng = np.random.default_rng(0)
+    lower = time.time()
+    upper = lower + args.days * 86400
+    starts = np.sort(rng.uniform(lower, upper, args.events))
+    ends = starts + rng.choice([1800, 2700, 3600], args.events)
+    print(f"{args.events} busy intervals over {args.days} days")
+
+    def python_scan():
+        free, cursor = [], lower
+        for start, end in sorted(zip(starts.tolist(), ends.tolist())):
+            if start > cursor:
+                free.append((cursor, start))
+            cursor = max(cursor, end)
+        if cursor < upper:
+            free.append((cursor, upper))
+        windows = []
+        day = lower - lower % 86400
+        while day < upper:
+            windows.append((day + 9 * 3600, day + 18 * 3600))
+            day += 86400
+        return [(max(a, c), min(b, d)) for a, b in free for c, d in windows if max(a, c) + 3600 <= min(b, d)]
+
+    def vectorized():
+        windows = intervals.daily_windows(lower, upper, 'UTC', "09:00", "18:00", set(range(7)))
+        free_starts, free_ends = intervals.intersect(intervals.complement(*intervals.merge(starts, ends), lower, upper), windows)
+        return free_starts[free_ends - free_starts >= 3600]
+
+    for name, compute in (("python scan", python_scan), ("numpy intervals", vectorized)):
+        values = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            found = len(compute())
+            values.append(time.perf_counter() - started)
+        report(f"{name} ({found} slots)", values)
+
+def bench_pages(args) -> None:
+    """Counting events over a long range: all pages materialized vs streamed, with and without prefetch"""
+    stand_in = CalendarStandIn(latency=args.latency)
+    server = stand_in.serve()
+    api_endpoint = f"http://localhost:{server.server_port}/calendar/v3/"
+    seed_events(stand_in, args.events)
+    now = datetime.now(pytz.UTC)
+    time_min = now.strftime('%Y-%m-%dT%H:%M:%SZ')
+    time_max = (now + timedelta(days=365)).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+    def slow_count(events):
+        # Stands in for per-page work on the consumer side (formatting, filtering)
+        count = 0
+        for count, _ in enumerate(events, 1):
+            if count % 250 == 0:
+                time.sleep(args.page_work)
+        return count
+
+    with tempfile.TemporaryDirectory() as directory:
+        service = GoogleCalendarService(token_path=write_token(directory), api_endpoint=api_endpoint)
+        print(f"{args.events} events, stand-in latency {args.latency * 1000:.0f}ms, consumer work {args.page_work * 1000:.0f}ms per page")
+        cases = (
+            ("materialized list", lambda: slow_count(list(service.iter_events(time_min, time_max, prefetch=False)))),
+            ("streamed", lambda: slow_count(service.iter_events(time_min, time_max, prefetch=False))),
+            ("streamed + prefetch", lambda: slow_count(service.iter_events(time_min, time_max, prefetch=True))),
+        )
+        for name, run in cases:
+            values = []
+            for _ in range(args.runs):
+                started = time.perf_counter()
+                count = run()
+                values.append(time.perf_counter() - started)
+            tracemalloc.start()
+            run()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            report(f"{name} ({count} events)", values)
+            print(f"{'':<34} peak memory={peak / 1e6:.2f} MB")
+    server.shutdown()
+
+def send_unpooled(service: EmailService, to_email: str, subject: str, body: str) -> None:
+    """The original per-message path: connect, log in, send and quit for every email"""
+    msg = MIMEText(body)
+    msg["From"] = service.smtp_username
+    msg["To"] = to_email
+    msg["Subject"] = subject
+    with smtplib.SMTP(service.smtp_server, service.smtp_port) as server:
+        if service.smtp_starttls:
+            server.starttls()
+        server.login(service.smtp_username, service.smtp_password)
+        server.send_message(msg)
+
+def email_service_for(server) -> EmailService:
+    """The EmailService singleton, configured for a local SMTP stand-in"""
+    os.environ.update({
+        "SMTP_SERVER": "localhost", "SMTP_PORT": str(server.server_port), "SMTP_STARTTLS": "false",
+        "SMTP_USERNAME": "bench@example.com", "SMTP_PASSWORD": "benchmark"
+    })
+    return EmailService()
+
+def bench_email(args) -> None:
+    """Per-email latency: new connection and login per message vs pooled sessions"""
+    stand_in = SMTPStandIn(greeting_delay=args.greeting_delay, auth_delay=args.auth_delay)
+    server = stand_in.serve()
+    service = email_service_for(server)
+    print(f"SMTP stand-in: connection setup {args.greeting_delay * 1000:.0f}ms, login {args.auth_delay * 1000:.0f}ms")
+
+    for name, send in (
+        ("new connection per email", lambda i: send_unpooled(service, "to@example.com", f"Test {i}", "Hello")),
+        ("pooled sessions", lambda i: service.send_email("to@example.com", f"Test {i}", "Hello")),
+    ):
+        connections = stand_in.connections
+        values = []
+        for i in range(args.runs):
+            started = time.perf_counter()
+            send(i)
+            values.append(time.perf_counter() - started)
+        report(name, values)
+        print(f"{'':<34} {stand_in.connections - connections} connections opened")
+    print(service.pool.format_stats())
+    service.pool.close()
+    server.shutdown()
+
+def bench_email_recovery(args) -> None:
+    """
+    Check that pooled sessions the server has dropped are replaced without failing a send:
+    a session used after the server's idle timeout (421 on the next command) and one
+    found dead by the NOOP probe. Exits non-zero if a check fails.
+    """
+    stand_in = SMTPStandIn(idle_timeout=args.server_idle_timeout)
+    server = stand_in.serve()
+    service = email_service_for(server)
+    message = service._build_message("to@example.com", "Recovery check", "Hello", False)
+    print(f"SMTP stand-in: drops sessions idle for {args.server_idle_timeout * 1000:.0f}ms")
+
+    def check(name: str, pool: SMTPPool, idle: float, reconnects: int, connections: int) -> bool:
+        """Send, wait `idle` seconds, send again; the second send must succeed with the expected pool work"""
+        pool.send_message(message)
+        time.sleep(idle)
+        delivered, opened, reconnected = len(stand_in.messages), pool.connections_opened, pool.reconnects
+        started = time.perf_counter()
+        try:
+            pool.send_message(message)
+            error = None
+        except Exception as e:
+            error = e
+        elapsed = time.perf_counter() - started
+        results = (len(stand_in.messages) - delivered, pool.reconnects - reconnected, pool.connections_opened - opened)
+        passed = error is None and results == (1, reconnects, connections)
+        print(f"{name:<34} {'ok' if passed else 'FAILED':<6}  {elapsed * 1000:6.1f}ms  delivered={results[0]} "
+              f"reconnects={results[1]} (expected {reconnects}) connections={results[2]} (expected {connections})"
+              + (f"  error: {error!r}" if error else ""))
+        pool.close()
+        return passed
+
+    idle = args.server_idle_timeout * 2
+    passed = all([
+        # Probed and found alive: reused as is
+        check("idle session, still open", SMTPPool(service._connect, check_after=0.0), args.server_idle_timeout / 4, 0, 0),
+        # Not probed: the send gets 421, and is retried once on a new connection
+        check("server idle drop, no probe", SMTPPool(service._connect, check_after=3600), idle, 1, 1),
+        # The NOOP probe finds the session dead before anything is sent on it
+        check("server idle drop, NOOP probe", SMTPPool(service._connect, check_after=0.0), idle, 1, 1),
+        # Past the pool's own idle timeout: closed without a probe
+        check("pool idle timeout", SMTPPool(service._connect, idle_timeout=args.server_idle_timeout / 2), idle, 0, 1),
+    ])
+    service.pool.close()
+    server.shutdown()
+    if not passed:
+        sys.exit(1)
+
+def bench_outbox(args) -> None:
+    """Time the caller waits per email (synchronous vs queued), then bulk delivery time with 1 vs N workers"""
+    stand_in = SMTPStandIn(greeting_delay=args.greeting_delay, auth_delay=args.auth_delay,
+                           message_delay=args.message_delay, fail_every=args.fail_every)
+    server = stand_in.serve()
+    os.environ["SMTP_POOL_SIZE"] = str(args.workers)
+    service = email_service_for(server)
+    print(f"SMTP stand-in: {args.message_delay * 1000:.0f}ms per message, every {args.fail_every}th rejected with 451")
+
+    with tempfile.TemporaryDirectory() as directory:
+        deliver = lambda m: service.deliver(m['to_email'], m['subject'], m['body'], m['is_html'])
+        outbox = EmailOutbox(deliver, os.path.join(directory, "outbox.db"), workers=args.workers, backoff=0.05)
+        for name, send in (
+            ("send_email (waits for SMTP)", lambda i: service.send_email("to@example.com", f"Test {i}", "Hello")),
+            ("queued send", lambda i: outbox.enqueue("to@example.com", f"Test {i}", "Hello")),
+        ):
+            values = []
+            for i in range(args.runs):
+                started = time.perf_counter()
+                send(i)
+                values.append(time.perf_counter() - started)
+            report(name, values)
+        outbox.flush()
+        outbox.close()
+
+        messages = [dict(to_email=f"user{i}@example.com", subject=f"Hello user{i}", body="Hi", is_html=False)
+                    for i in range(args.emails)]
+        for workers in (1, args.workers):
+            outbox = EmailOutbox(deliver, os.path.join(directory, f"bulk{workers}.db"), workers=workers, backoff=0.05)
+            delivered = len(stand_in.messages)
+            started = time.perf_counter()
+            outbox.enqueue_many(messages, batch_id="bulk")
+            outbox.flush()
+            elapsed = time.perf_counter() - started
+            status = outbox.batch_status("bulk")
+            print(f"{args.emails} emails, {workers} worker(s):".ljust(34) +
+                  f" {elapsed:.2f}s  sent={status['sent']} failed={status['failed']} "
+                  f"delivered={len(stand_in.messages) - delivered} retries={outbox.retries}")
+            outbox.close()
+    service.pool.close()
+    server.shutdown()
+
+def bench_openai(args) -> None:
+    """Completion latency for the first request and after the user has been typing: default client vs shared pool"""
+    stand_in = OpenAIStandIn(latency=args.latency, handshake_delay=args.handshake_delay)
+    server = stand_in.serve()
+    os.environ.update({"OPENAI_BASE_URL": f"http://localhost:{server.server_port}/v1", "OPENAI_API_KEY": "benchmark"})
+    print(f"OpenAI stand-in: {args.handshake_delay * 1000:.0f}ms per new connection, "
+          f"{args.idle:.0f}s of typing between requests")
+
+    async def session(client, prewarm: bool) -> list:
+        if prewarm:
+            # Runs while the user types the first message, so it is not timed
+            await openai_clients.prewarm_async()
+        values = []
+        for i in range(args.requests):
+            if i:
+                await asyncio.sleep(args.idle)
+            started = time.perf_counter()
+            await client.chat.completions.create(model="gpt-4o", messages=[{"role": "user", "content": "Hi"}])
+            values.append(time.perf_counter() - started)
+        return values
+
+    for name, make_client, prewarm in (
+        ("default client", AsyncOpenAI, False),
+        ("shared prewarmed client", openai_clients.get_async_client, True),
+    ):
+        connections = stand_in.connections
+        values = asyncio.run(session(make_client(), prewarm))
+        report(f"{name}: first", values[:1])
+        report(f"{name}: after typing", values[1:])
+        print(f"{'':<34} {stand_in.connections - connections} connections opened")
+    print(openai_clients.stats.format_stats())
+    server.shutdown()
+
+def bench_router(args) -> None:
+    """Decision-phase latency, always the large model vs routed, while the small model slows down and recovers"""
+    small, large = "gpt-4o-mini", "gpt-4o"
+    stand_in = OpenAIStandIn(model_latency={small: args.small_latency, large: args.large_latency})
+    server = stand_in.serve()
+    os.environ.update({"OPENAI_BASE_URL": f"http://localhost:{server.server_port}/v1", "OPENAI_API_KEY": "benchmark"})
+    client = openai_clients.get_client()
+    print(f"Stand-in: {small} {args.small_latency * 1000:.0f}ms ({args.degraded_latency * 1000:.0f}ms while degraded), "
+          f"{large} {args.large_latency * 1000:.0f}ms; budget {args.budget * 1000:.0f}ms; "
+          f"every {args.invalid_every}th {small} decision treated as invalid")
+
+    def run(router) -> dict:
+        values = {"normal": [], "degraded": [], "recovered": []}
+        produced = 0
+        for phase, count in (("normal", args.requests), ("degraded", args.requests), ("recovered", args.requests)):
+            stand_in.model_latency[small] = args.degraded_latency if phase == "degraded" else args.small_latency
+            if phase == "recovered":
+                # Let the samples from the slow period expire
+                time.sleep(args.max_age)
+            for _ in range(count):
+                started = time.perf_counter()
+                model = None
+                while True:
+                    with router.call("decision", model) as route:
+                        response = client.chat.completions.create(model=route.model, messages=[{"role": "user", "content": "Hi"}])
+                        route.add_usage(response.usage)
+                        if route.model == small:
+                            produced += 1
+                            # Stands in for a decision that fails validation
+                            if produced % args.invalid_every == 0:
+                                route.reject()
+                    model = router.escalate("decision", route.model) if route.rejected else None
+                    if model is None:
+                        break
+                values[phase].append(time.perf_counter() - started)
+        return values
+
+    for name, routes in (("always " + large, [large]), ("routed", [small, large])):
+        router = ModelRouter({"decision": routes}, budgets={"decision": args.budget}, max_age=args.max_age)
+        for phase, values in run(router).items():
+            report(f"{name}: {phase}", values)
+        print(router.format_stats())
+    server.shutdown()
+
+def bench_session(args) -> None:
+    """A whole terminal session: recorded against the stand-in, then replayed offline at each speed"""
+    directory = tempfile.mkdtemp()
+    cassette = args.cassette or os.path.join(directory, "session.cassette.jsonl.gz")
+    env = dict(os.environ, OPENAI_API_KEY="benchmark", COINBASE_API_KEY="benchmark", COINBASE_API_SECRET="benchmark",
+               SMTP_USERNAME="benchmark@example.com", SMTP_PASSWORD="benchmark", CASSETTE_PATH=cassette)
+
+    def run(mode: str, speed: float = 1.0, base_url: str = "http://localhost:9/v1", stdin: str = "") -> float:
+        # A fresh outbox and journal per run, so nothing carries over between runs
+        outbox = tempfile.mktemp(suffix=".db", dir=directory)
+        journal = tempfile.mktemp(suffix=".journal", dir=directory)
+        started = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "index.py")],
+            input=stdin, capture_output=True, text=True, timeout=600,
+            env=dict(env, CASSETTE_MODE=mode, CASSETTE_SPEED=str(speed), OPENAI_BASE_URL=base_url, EMAIL_OUTBOX_DB=outbox,
+                     SESSION_JOURNAL=journal)
+        )
+        elapsed = time.perf_counter() - started
+        if result.returncode:
+            raise RuntimeError(f"{mode} run failed:\n{result.stderr}")
+        for line in result.stdout.splitlines():
+            if line.startswith("Cassette"):
+                print(f"{'':<34} {line}")
+        return elapsed
+
+    if not args.cassette:
+        stand_in = OpenAIStandIn(latency=args.latency, chunk_delay=args.chunk_delay,
+                                 reply="Sure, here is a short answer to that question.")
+        server = stand_in.serve()
+        messages = [f"Question {i + 1}, please answer briefly" for i in range(args.turns)] + ["/stats"]
+        elapsed = run("record", base_url=f"http://localhost:{server.server_port}/v1", stdin="\n".join(messages) + "\n")
+        server.shutdown()
+        print(f"{'recorded session':<34} {elapsed:.2f}s, {os.path.getsize(cassette)} bytes of cassette")
+    # The stand-in is gone and OPENAI_BASE_URL points nowhere: everything comes from the cassette
+    for speed in args.speeds:
+        print(f"{f'replay at {speed:g}x':<34} {run('replay', speed):.2f}s")
+
+def bench_journal(args) -> None:
+    """Per-turn write and resume time as the session grows: journal vs dumping the whole context as JSON"""
+    directory = tempfile.mkdtemp()
+    roles = ("user", "assistant", "tool")
+    print(f"{args.message_bytes}-byte messages, resuming {args.budget} tokens")
+    for count in args.messages:
+        messages = [{"role": roles[i % 3], "content": f"Message {i} " + "x" * args.message_bytes} for i in range(count)]
+        path = os.path.join(directory, f"{count}.journal")
+        journal = SessionJournal(path)
+        started = time.perf_counter()
+        for message in messages:
+            journal.append(message)
+        append = (time.perf_counter() - started) / count
+        journal.close()
+
+        dump_path = os.path.join(directory, f"{count}.json")
+        started = time.perf_counter()
+        with open(dump_path, "w") as file:
+            json.dump(messages, file)
+        dump = time.perf_counter() - started
+
+        resumes = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            resumed = SessionJournal(path).tail(args.budget)
+            resumes.append(time.perf_counter() - started)
+        loads = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            with open(dump_path) as file:
+                json.load(file)
+            loads.append(time.perf_counter() - started)
+        print(f"{count:>7} messages: write per turn {append * 1e6:.0f}us (journal) vs {dump * 1000:.1f}ms (full dump); "
+              f"resume {statistics.median(resumes) * 1000:.2f}ms ({len(resumed)} messages) vs "
+              f"{statistics.median(loads) * 1000:.1f}ms (full load)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for chatgpt-terminal")
+    parser.add_argument("--runs", type=int, default=30)
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+    calendar_parser = subparsers.add_parser("calendar", help="Per-call overhead of Google Calendar requests")
+    calendar_parser.add_argument("--latency", type=float, default=0.0, help="Stand-in time per request")
+    calendar_parser.add_argument("--handshake-delay", type=float, default=0.05, help="Stand-in time per new connection")
+    calendar_parser.set_defaults(run=bench_calendar)
+    mirror_parser = subparsers.add_parser("mirror", help="list_events from the API vs the local calendar mirror")
+    mirror_parser.add_argument("--events", type=int, default=2000)
+    mirror_parser.add_argument("--changes", type=int, default=5, help="Events added before the delta sync")
+    mirror_parser.add_argument("--latency", type=float, default=0.05, help="Stand-in time per request")
+    mirror_parser.set_defaults(run=bench_mirror)
+    batch_parser = subparsers.add_parser("batch", help="Sequential inserts vs batched create_events")
+    batch_parser.add_argument("--events", type=int, default=120)
+    batch_parser.add_argument("--latency", type=float, default=0.05, help="Stand-in time per request")
+    batch_parser.add_argument("--rate-limit-every", type=int, default=0, help="Make the stand-in reject every Nth insert")
+    batch_parser.set_defaults(run=bench_batch)
+    slots_parser = subparsers.add_parser("slots", help="Free-slot computation, Python scan vs NumPy intervals")
+    slots_parser.add_argument("--events", type=int, default=5000)
+    slots_parser.add_argument("--days", type=int, default=90)
+    slots_parser.set_defaults(run=bench_free_slots)
+    pages_parser = subparsers.add_parser("pages", help="Streaming paged listing vs materializing every page")
+    pages_parser.add_argument("--events", type=int, default=5000)
+    pages_parser.add_argument("--latency", type=float, default=0.05, help="Stand-in time per request")
+    pages_parser.add_argument("--page-work", type=float, default=0.03, help="Consumer time per page")
+    pages_parser.set_defaults(run=bench_pages)
+    email_parser = subparsers.add_parser("email", help="Per-email latency, new SMTP connection vs pooled sessions")
+    email_parser.add_argument("--greeting-delay", type=float, default=0.1, help="Stand-in connection setup time")
+    email_parser.add_argument("--auth-delay", type=float, default=0.15, help="Stand-in login time")
+    email_parser.set_defaults(run=bench_email)
+    recovery_parser = subparsers.add_parser("email-recovery", help="Check that dropped or dead SMTP sessions are replaced without failing a send")
+    recovery_parser.add_argument("--server-idle-timeout", type=float, default=0.3, help="Stand-in idle timeout")
+    recovery_parser.set_defaults(run=bench_email_recovery)
+    outbox_parser = subparsers.add_parser("outbox", help="Synchronous vs queued sends, and bulk delivery with 1 vs N workers")
+    outbox_parser.add_argument("--emails", type=int, default=200)
+    outbox_parser.add_argument("--workers", type=int, default=4)
+    outbox_parser.add_argument("--greeting-delay", type=float, default=0.1, help="Stand-in connection setup time")
+    outbox_parser.add_argument("--auth-delay", type=float, default=0.15, help="Stand-in login time")
+    outbox_parser.add_argument("--message-delay", type=float, default=0.02, help="Stand-in time to accept a message")
+    outbox_parser.add_argument("--fail-every", type=int, default=10, help="Make the stand-in reject every Nth message")
+    outbox_parser.set_defaults(run=bench_outbox)
+    openai_parser = subparsers.add_parser("openai", help="OpenAI request latency, default client vs shared prewarmed pool")
+    openai_parser.add_argument("--requests", type=int, default=4, help="Requests per simulated session")
+    openai_parser.add_argument("--idle", type=float, default=6.0, help="Seconds the user types between requests")
+    openai_parser.add_argument("--latency", type=float, default=0.05, help="Stand-in time per completion")
+    openai_parser.add_argument("--handshake-delay", type=float, default=0.15, help="Stand-in time per new connection")
+    openai_parser.set_defaults(run=bench_openai)
+    router_parser = subparsers.add_parser("router", help="Decision latency, always the large model vs the model router")
+    router_parser.add_argument("--requests", type=int, default=60, help="Requests per period (normal, degraded, recovered)")
+    router_parser.add_argument("--small-latency", type=float, default=0.05)
+    router_parser.add_argument("--degraded-latency", type=float, default=0.4, help="Small model latency while degraded")
+    router_parser.add_argument("--large-latency", type=float, default=0.2)
+    router_parser.add_argument("--budget", type=float, default=0.15, help="Decision phase p90 latency budget")
+    router_parser.add_argument("--invalid-every", type=int, default=10, help="Treat every Nth small-model decision as invalid")
+    router_parser.add_argument("--max-age", type=float, default=3.0, help="Seconds latency samples are kept")
+    router_parser.set_defaults(run=bench_router)
+    session_parser = subparsers.add_parser("session", help="Record a terminal session, then replay it offline at several speeds")
+    session_parser.add_argument("--cassette", help="Replay this recording instead of recording one against the stand-in")
+    session_parser.add_argument("--turns", type=int, default=5, help="Messages in the recorded session")
+    session_parser.add_argument("--latency", type=float, default=0.3, help="Stand-in time to first chunk")
+    session_parser.add_argument("--chunk-delay", type=float, default=0.02, help="Stand-in time between chunks")
+    session_parser.add_argument("--speeds", type=float, nargs="+", default=[1, 10, 0], help="Replay speeds, 0 for no waiting")
+    session_parser.set_defaults(run=bench_session)
+    journal_parser = subparsers.add_parser("journal", help="Session journal append and resume vs full JSON dumps, by session length")
+    journal_parser.add_argument("--messages", type=int, nargs="+", default=[1000, 10000, 100000])
+    journal_parser.add_argument("--message-bytes", type=int, default=300)
+    journal_parser.add_argument("--budget", type=int, default=8000, help="Tokens to resume")
+    journal_parser.set_defaults(run=bench_journal)
+    args = parser.parse_args()
+    args.run(args)
+
+if __name__ == "__main__":
+    main()
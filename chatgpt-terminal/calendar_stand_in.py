@@ -0,0 +1,264 @@
+"""
+Local stand-in for the Google Calendar v3 REST API.
+
+Keeps events in memory and answers events.list (with paging and sync tokens),
+events.insert, events.delete and freebusy.query, directly or inside batch
+requests, so the calendar service can be run and benchmarked without network
+access or Google credentials:
+
+    python chatgpt-terminal/calendar_stand_in.py --port 8780
+    GOOGLE_CALENDAR_API_ENDPOINT=http://localhost:8780/calendar/v3/ python chatgpt-terminal/index.py
+"""
+import argparse
+import itertools
+import json
+import re
+import uuid
+from email.parser import BytesParser
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import pytz
+
+def _parse_time(value: str) -> datetime:
+    dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return dt if dt.tzinfo else pytz.UTC.localize(dt)
+
+def _event_bounds(event: dict) -> tuple[datetime, datetime]:
+    start = event['start'].get('dateTime') or event['start']['date']
+    end = event['end'].get('dateTime') or event['end']['date']
+    return _parse_time(start), _parse_time(end)
+
+class CalendarStandIn:
+    """
+    In-memory calendar server. Every request takes `latency` seconds and every
+    new connection another `handshake_delay`, standing in for TLS setup. With
+    rate_limit_every=N, every Nth insert is rejected with 429.
+    """
+    def __init__(self, latency: float = 0.0, handshake_delay: float = 0.0, rate_limit_every: int = 0):
+        self.latency = latency
+        self.handshake_delay = handshake_delay
+        self.rate_limit_every = rate_limit_every
+        self._inserts = itertools.count(1)
+        self.events: dict[str, dict[str, dict]] = {}
+        self.connections = 0
+        self.requests = 0
+        self.batches = 0
+        self._ids = itertools.count(1)
+        # Every change gets the next sequence number; sync tokens are the last number a client saw
+        self._sequence = 0
+        self._changed_at: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _touch(self, event_id: str) -> None:
+        self._sequence += 1
+        self._changed_at[event_id] = self._sequence
+
+    def add_event(self, calendar_id: str, event: dict) -> dict:
+        with self._lock:
+            event = dict(event, id=event.get('id') or f"evt{next(self._ids)}", status='confirmed')
+            event['htmlLink'] = f"https://calendar.example/event?eid={event['id']}"
+            self.events.setdefault(calendar_id, {})[event['id']] = event
+            self._touch(event['id'])
+            return event
+
+    def delete_event(self, calendar_id: str, event_id: str) -> bool:
+        """Deleted events stay behind as cancelled, so incremental syncs can report them"""
+        with self._lock:
+            event = self.events.get(calendar_id, {}).get(event_id)
+            if event is None or event['status'] == 'cancelled':
+                return False
+            self.events[calendar_id][event_id] = {"id": event_id, "status": 'cancelled'}
+            self._touch(event_id)
+            return True
+
+    def list_events(self, calendar_id: str, query: dict) -> tuple[int, dict]:
+        time_min = _parse_time(query['timeMin']) if 'timeMin' in query else None
+        time_max = _parse_time(query['timeMax']) if 'timeMax' in query else None
+        max_results = int(query.get('maxResults', 250))
+        offset = int(query.get('pageToken', 0))
+        with self._lock:
+            items = list(self.events.get(calendar_id, {}).values())
+            sequence = self._sequence
+            changed_at = dict(self._changed_at)
+
+        if 'syncToken' in query:
+            since = int(query['syncToken'])
+            if since > sequence:
+                return 410, {"error": {"code": 410, "message": "Sync token is no longer valid, a full sync is required."}}
+            selected = sorted((changed_at[event['id']], event) for event in items if changed_at[event['id']] > since)
+        else:
+            selected = []
+            for event in items:
+                if event['status'] == 'cancelled' and query.get('showDeleted') != 'true':
+                    continue
+                if event['status'] != 'cancelled':
+                    start, end = _event_bounds(event)
+                    if (time_min is not None and end <= time_min) or (time_max is not None and start >= time_max):
+                        continue
+                    selected.append((start, event))
+            selected.sort(key=lambda pair: pair[0])
+
+        page = [event for _, event in selected[offset:offset + max_results]]
+        body = {"kind": "calendar#events", "items": page}
+        if offset + max_results < len(selected):
+            body["nextPageToken"] = str(offset + max_results)
+        elif 'timeMin' not in query and 'timeMax' not in query:
+            body["nextSyncToken"] = str(sequence)
+        return 200, body
+
+    def handle(self, method: str, path: str, query: dict, body: bytes) -> tuple[int, dict | None]:
+        """One REST call; returns (status, JSON body or None)"""
+        parts = path.strip('/').split('/')
+        # calendar/v3/calendars/{calendarId}/events[/{eventId}]
+        if parts[:3] == ['calendar', 'v3', 'calendars'] and len(parts) == 5 and parts[4] == 'events':
+            if method == 'GET':
+                return self.list_events(parts[3], query)
+            if method == 'POST':
+                if self.rate_limit_every and next(self._inserts) % self.rate_limit_every == 0:
+                    return 429, {"error": {"code": 429, "message": "Rate Limit Exceeded"}}
+                return 200, self.add_event(parts[3], json.loads(body))
+        if parts[:3] == ['calendar', 'v3', 'calendars'] and len(parts) == 6 and parts[4] == 'events' and method == 'DELETE':
+            if self.delete_event(parts[3], parts[5]):
+                return 204, None
+            return 410, {"error": {"code": 410, "message": "Resource has been deleted"}}
+        if parts == ['calendar', 'v3', 'freeBusy'] and method == 'POST':
+            return 200, self.free_busy(json.loads(body))
+        return 404, {"error": {"code": 404, "message": f"Not found: {path}"}}
+
+    def free_busy(self, query: dict) -> dict:
+        time_min, time_max = _parse_time(query['timeMin']), _parse_time(query['timeMax'])
+        calendars = {}
+        for item in query.get('items', []):
+            with self._lock:
+                events = list(self.events.get(item['id'], {}).values()) if item['id'] in self.events else None
+            if events is None:
+                calendars[item['id']] = {"errors": [{"domain": "global", "reason": "notFound"}], "busy": []}
+                continue
+            busy = []
+            for event in events:
+                if event['status'] == 'cancelled' or event.get('transparency') == 'transparent':
+                    continue
+                start, end = _event_bounds(event)
+                if end > time_min and start < time_max:
+                    busy.append((start, end))
+            calendars[item['id']] = {"busy": [
+                {"start": start.astimezone(pytz.UTC).strftime('%Y-%m-%dT%H:%M:%SZ'),
+                 "end": end.astimezone(pytz.UTC).strftime('%Y-%m-%dT%H:%M:%SZ')}
+                for start, end in sorted(busy)
+            ]}
+        return {"kind": "calendar#freeBusy", "timeMin": query['timeMin'], "timeMax": query['timeMax'], "calendars": calendars}
+
+    def handle_batch(self, content_type: str, body: bytes) -> tuple[str, bytes]:
+        """
+        A multipart/mixed batch request: every part is an embedded HTTP request,
+        answered by a part with the matching "response-" Content-ID, in order.
+        Returns (content type, body) of the multipart/mixed response.
+        """
+        message = BytesParser().parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+        boundary = f"batch_{uuid.uuid4().hex}"
+        out = []
+        for part in message.get_payload():
+            request = part.get_payload(decode=True)
+            # googleapiclient separates lines with a bare \n
+            head, request_body = re.split(rb"\r?\n\r?\n", request, maxsplit=1)
+            request_line = re.split(rb"\r?\n", head, maxsplit=1)[0].decode()
+            method, target, _ = request_line.split(" ", 2)
+            url = urlparse(target)
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            status, response = self.handle(method, url.path, query, request_body)
+            payload = json.dumps(response) if response is not None else ""
+            out.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\n"
+                f"Content-ID: <response-{part['Content-ID'].strip('<>')}>\r\n\r\n"
+                f"HTTP/1.1 {status} {'OK' if status < 400 else 'Error'}\r\n"
+                f"Content-Type: application/json; charset=UTF-8\r\nContent-Length: {len(payload.encode())}\r\n\r\n"
+                f"{payload}\r\n"
+            )
+        out.append(f"--{boundary}--\r\n")
+        return f"multipart/mixed; boundary={boundary}", "".join(out).encode()
+
+    def make_handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes; avoid Nagle stalls on kept-alive connections
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                stand_in.connections += 1
+                time.sleep(stand_in.handshake_delay)
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, body: dict) -> None:
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=UTF-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _route(self, method: str) -> None:
+                stand_in.requests += 1
+                time.sleep(stand_in.latency)
+                url = urlparse(self.path)
+                query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length) if length else b""
+                if url.path.strip('/') == 'batch/calendar/v3' and method == 'POST':
+                    stand_in.batches += 1
+                    content_type, data = stand_in.handle_batch(self.headers["Content-Type"], body)
+                    self.send_response(200)
+                    self.send_header("Content-Type", content_type)
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                    return
+                status, response = stand_in.handle(method, url.path, query, body)
+                if response is None:
+                    self.send_response(status)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                else:
+                    self._send_json(status, response)
+
+            def do_GET(self):
+                self._route('GET')
+
+            def do_POST(self):
+                self._route('POST')
+
+            def do_DELETE(self):
+                self._route('DELETE')
+
+        return Handler
+
+    def serve(self, host: str = "localhost", port: int = 0) -> ThreadingHTTPServer:
+        """Start serving in a background thread; returns the server (shutdown() it to stop)"""
+        server = ThreadingHTTPServer((host, port), self.make_handler())
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Google Calendar API")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8780)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument("--handshake-delay", type=float, default=0.0, help="Seconds added to every new connection")
+    args = parser.parse_args()
+    server = CalendarStandIn(args.latency, args.handshake_delay).serve(args.host, args.port)
+    print(f"Calendar stand-in listening on http://{args.host}:{server.server_port}/calendar/v3/")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
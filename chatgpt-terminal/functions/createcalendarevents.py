@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta
+import pytz
+from functions.functioncallingbase import FunctionCallingBase
+from services.google_calendar_service import GoogleCalendarService
+
+class CreateCalendarEvents(FunctionCallingBase):
+    def __init__(self):
+        self.calendar_service = GoogleCalendarService()
+        super().__init__()
+
+    def _get_function_definition(self):
+        # Get current date and time in the specified timezone for examples
+        now = datetime.now(pytz.timezone(self.calendar_service.timezone))
+        current_time = now.strftime("%Y-%m-%dT%H:%M:%S")
+        one_hour_later = (now.replace(minute=0, second=0, microsecond=0) +
+                         timedelta(hours=2)).strftime("%Y-%m-%dT%H:%M:%S")
+
+        return {
+            "name": "create_calendar_events",
+            "description": f"Creates several events in the calendar of the user at once (e.g. a series of sessions or blocking the same slot on many days). Prefer it over repeated create_calendar_event calls. Current time reference: {current_time} ({self.calendar_service.timezone})",
+            "operation_type": "write",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "events": {
+                        "type": "array",
+                        "description": "The events to create",
+                        "minItems": 1,
+                        "maxItems": 500,
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "summary": {
+                                    "type": "string",
+                                    "description": "Title of the event"
+                                },
+                                "description": {
+                                    "type": "string",
+                                    "description": "Description of the event"
+                                },
+                                "start_time": {
+                                    "type": "string",
+                                    "description": f"Start time in ISO format (YYYY-MM-DDTHH:MM:SS). Example for now: {current_time}",
+                                    "example": current_time
+                                },
+                                "end_time": {
+                                    "type": "string",
+                                    "description": f"End time in ISO format (YYYY-MM-DDTHH:MM:SS). Example for 2 hours from now: {one_hour_later}",
+                                    "example": one_hour_later
+                                },
+                                "attendees": {
+                                    "type": "array",
+                                    "description": "List of attendee email addresses",
+                                    "items": {
+                                        "type": "string",
+                                        "format": "email"
+                                    }
+                                },
+                                "add_conference": {
+                                    "type": "boolean",
+                                    "description": "Whether to add a Google Meet conference to the event. If not mentioned, it must be set to False",
+                                    "default": False
+                                }
+                            },
+                            "required": ["summary", "start_time", "end_time"],
+                            "additionalProperties": False
+                        }
+                    },
+                    "timezone": {
+                        "type": "string",
+                        "description": f"Timezone for the events (default: {self.calendar_service.timezone}). Use IANA timezone names (e.g., America/New_York, Europe/London)",
+                        "default": self.calendar_service.timezone
+                    },
+                    "send_updates": {
+                        "type": "string",
+                        "description": "Whether to send notifications about the creation of the events. If not mentioned, it will be set to 'none'",
+                        "enum": ["all", "externalOnly", "none"],
+                        "default": "none"
+                    }
+                },
+                "required": ["events"],
+                "additionalProperties": False
+            }
+        }
+
+    def execute(self, **kwargs):
+        return self.calendar_service.create_events(
+            events=kwargs.get('events', []),
+            timezone=kwargs.get('timezone', self.calendar_service.timezone),
+            send_updates=kwargs.get('send_updates', 'none')
+        )
+
+    def compact_result(self, result):
+        # The message already counts the created events; only the failures need their details
+        results = result.get("results", [])
+        compact = {key: value for key, value in result.items() if key != "results"}
+        compact["failed"] = [
+            {"index": index, "message": item["message"]} for index, item in enumerate(results) if not item["success"]
+        ]
+        return super().compact_result(compact)
@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta
+import pytz
+from functions.functioncallingbase import FunctionCallingBase
+from services.google_calendar_service import GoogleCalendarService
+
+class FindFreeSlots(FunctionCallingBase):
+    def __init__(self):
+        self.calendar_service = GoogleCalendarService()
+        super().__init__()
+
+    def _get_function_definition(self):
+        # Get current date and time in the specified timezone for examples
+        now = datetime.now(pytz.timezone(self.calendar_service.timezone))
+        week_later = now + timedelta(days=7)
+
+        return {
+            "name": "find_free_slots",
+            "description": f"Finds free time windows in the user's calendar (and optionally other people's calendars) within working hours, e.g. 'when am I free for an hour next week?'. Use it instead of listing events and working out the gaps. Current time reference: {now.isoformat()} ({self.calendar_service.timezone})",
+            "operation_type": "read",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "duration_minutes": {
+                        "type": "integer",
+                        "description": "Minimum length of a free window in minutes (default: 60)",
+                        "minimum": 5,
+                        "default": 60
+                    },
+                    "time_min": {
+                        "type": "string",
+                        "description": "Start of the search range in ISO format (YYYY-MM-DDTHH:MM:SS). Default: current time",
+                        "example": now.isoformat()
+                    },
+                    "time_max": {
+                        "type": "string",
+                        "description": "End of the search range in ISO format (YYYY-MM-DDTHH:MM:SS). Default: 7 days from now",
+                        "example": week_later.isoformat()
+                    },
+                    "timezone": {
+                        "type": "string",
+                        "description": f"Timezone for the search and the results (default: {self.calendar_service.timezone}). Use IANA timezone names (e.g., America/New_York, Europe/London)",
+                        "default": self.calendar_service.timezone
+                    },
+                    "calendars": {
+                        "type": "array",
+                        "description": "Calendars that must all be free: 'primary' for the user and email addresses for other people (default: ['primary'])",
+                        "items": {
+                            "type": "string"
+                        }
+                    },
+                    "calendar_timezones": {
+                        "type": "object",
+                        "description": "Timezone of calendars whose working hours are not in the search timezone, e.g. {\"ana@example.com\": \"Europe/Lisbon\"}",
+                        "additionalProperties": {
+                            "type": "string"
+                        }
+                    },
+                    "working_hours_start": {
+                        "type": "string",
+                        "description": "Start of the working day as HH:MM (default: 09:00)",
+                        "default": "09:00"
+                    },
+                    "working_hours_end": {
+                        "type": "string",
+                        "description": "End of the working day as HH:MM (default: 18:00)",
+                        "default": "18:00"
+                    },
+                    "working_days": {
+                        "type": "array",
+                        "description": "Days of the week to consider, 0 = Monday ... 6 = Sunday (default: Monday to Friday)",
+                        "items": {
+                            "type": "integer",
+                            "minimum": 0,
+                            "maximum": 6
+                        }
+                    },
+                    "max_slots": {
+                        "type": "integer",
+                        "description": "Maximum number of free windows to return (default: 10)",
+                        "minimum": 1,
+                        "maximum": 50,
+                        "default": 10
+                    }
+                },
+                "additionalProperties": False
+            }
+        }
+
+    def execute(self, **kwargs):
+        return self.calendar_service.find_free_slots(
+            duration_minutes=kwargs.get('duration_minutes', 60),
+            time_min=kwargs.get('time_min'),
+            time_max=kwargs.get('time_max'),
+            timezone=kwargs.get('timezone', self.calendar_service.timezone),
+            calendars=kwargs.get('calendars'),
+            working_hours=(kwargs.get('working_hours_start', '09:00'), kwargs.get('working_hours_end', '18:00')),
+            working_days=kwargs.get('working_days', [0, 1, 2, 3, 4]),
+            calendar_timezones=kwargs.get('calendar_timezones'),
+            max_slots=kwargs.get('max_slots', 10)
+        )
@@ -1,4 +1,9 @@
+from services.tool_results import project
+
 class FunctionCallingBase:
+    # Item fields kept in the conversation for list results, e.g. {"events": ("summary", "start")}
+    result_fields = {}
+
     def __init__(self):
         self.function_definition = self._get_function_definition()
 
@@ -16,6 +21,13 @@ class FunctionCallingBase:
         """
         raise NotImplementedError("Subclasses must implement execute()")
 
+    def compact_result(self, result: dict) -> dict:
+        """
+        The projection of a result that goes into the conversation; the full result stays in
+        the tool result store. Override for projections that result_fields cannot express.
+        """
+        return project(result, self.result_fields)
+
     @property
     def requires_confirmation(self) -> bool:
         """
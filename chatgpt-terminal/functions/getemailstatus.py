@@ -0,0 +1,50 @@
+from datetime import datetime
+from functions.functioncallingbase import FunctionCallingBase
+from services.email_service import EmailService
+
+class GetEmailStatus(FunctionCallingBase):
+    def __init__(self):
+        super().__init__()
+        self.email_service = EmailService()
+
+    def _get_function_definition(self):
+        return {
+            "name": "get_email_status",
+            "description": "Check the delivery status of an email queued by send_email (by email_id) or of a bulk send (by batch_id)",
+            "operation_type": "read",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "email_id": {
+                        "type": "string",
+                        "description": "The email_id returned by send_email"
+                    },
+                    "batch_id": {
+                        "type": "string",
+                        "description": "The batch_id returned by send_bulk_email"
+                    }
+                },
+                "additionalProperties": False
+            }
+        }
+
+    def execute(self, **kwargs):
+        email_id = kwargs.get("email_id")
+        batch_id = kwargs.get("batch_id")
+
+        if batch_id:
+            status = self.email_service.batch_status(batch_id)
+            if not status:
+                return {"success": False, "error": f"No bulk send with batch_id {batch_id}"}
+            return {"success": True, **status}
+
+        if not email_id:
+            return {"success": False, "error": "Either email_id or batch_id is required"}
+
+        status = self.email_service.email_status(email_id)
+        if not status:
+            return {"success": False, "error": f"No email with email_id {email_id}"}
+        for field in ("queued_at", "sent_at"):
+            if status[field]:
+                status[field] = datetime.fromtimestamp(status[field]).isoformat(timespec="seconds")
+        return {"success": True, **status}
@@ -4,6 +4,9 @@ from functions.functioncallingbase import FunctionCallingBase
 from services.google_calendar_service import GoogleCalendarService
 
 class ListCalendarEvents(FunctionCallingBase):
+    # IDs and links are only needed when acting on a specific event
+    result_fields = {"events": ("summary", "start", "end", "description")}
+
     def __init__(self):
         self.calendar_service = GoogleCalendarService()
         super().__init__()
@@ -41,6 +44,16 @@ class ListCalendarEvents(FunctionCallingBase):
                         "type": "string",
                         "description": f"Timezone for the search (default: {self.calendar_service.timezone}). Use IANA timezone names (e.g., America/New_York, Europe/London)",
                         "default": self.calendar_service.timezone
+                    },
+                    "query": {
+                        "type": "string",
+                        "description": "Only events whose title, description or location contain this text"
+                    },
+                    "mode": {
+                        "type": "string",
+                        "description": "'list' returns the first max_results events; 'count' only how many events there are; 'summary' returns the count, total scheduled time and busiest day. Use 'count' or 'summary' for questions about long ranges instead of listing everything",
+                        "enum": ["list", "count", "summary"],
+                        "default": "list"
                     }
                 },
                 "additionalProperties": False
@@ -52,5 +65,7 @@ class ListCalendarEvents(FunctionCallingBase):
             max_results=kwargs.get('max_results', 10),
             time_min=kwargs.get('time_min'),
             time_max=kwargs.get('time_max'),
-            timezone=kwargs.get('timezone', self.calendar_service.timezone)
+            timezone=kwargs.get('timezone', self.calendar_service.timezone),
+            query=kwargs.get('query'),
+            mode=kwargs.get('mode', 'list')
         ) 
\ No newline at end of file
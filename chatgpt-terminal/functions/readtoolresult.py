@@ -0,0 +1,62 @@
+from functions.functioncallingbase import FunctionCallingBase
+from services.tool_results import ToolResultStore
+
+class ReadToolResult(FunctionCallingBase):
+    def __init__(self):
+        super().__init__()
+        self.store = ToolResultStore()
+
+    def _get_function_definition(self):
+        return {
+            "name": "read_tool_result",
+            "description": "Read the full result of an earlier function call. Results that include a result_id are compact views: long texts are truncated, long lists cut (their length is in <key>_total) and some fields left out. Use this only when the missing details are needed, and prefer reading a single key or a slice of a list.",
+            "operation_type": "read",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "result_id": {
+                        "type": "string",
+                        "description": "The result_id of the compact result"
+                    },
+                    "key": {
+                        "type": "string",
+                        "description": "Only return this top-level key of the result (e.g. events)"
+                    },
+                    "offset": {
+                        "type": "integer",
+                        "description": "When the key holds a list, the first item to return (default: 0)"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "When the key holds a list, how many items to return (default: all)"
+                    }
+                },
+                "required": ["result_id"],
+                "additionalProperties": False
+            }
+        }
+
+    def compact_result(self, result):
+        # The model asked for the full payload
+        return result
+
+    def execute(self, **kwargs):
+        result_id = kwargs.get("result_id")
+        key = kwargs.get("key")
+
+        result = self.store.get(result_id)
+        if result is None:
+            # Results the conversation no longer refers to are dropped by /compact and /reset
+            return {"success": False, "error": f"No stored result with result_id {result_id}"}
+        if not key:
+            return result
+        if key not in result:
+            return {"success": False, "error": f"Result {result_id} has no key {key}; keys: {', '.join(result)}"}
+
+        value = result[key]
+        if isinstance(value, list):
+            offset = kwargs.get("offset") or 0
+            limit = kwargs.get("limit")
+            items = value[offset:offset + limit if limit else None]
+            return {"success": True, key: items, "offset": offset, "total": len(value)}
+        return {"success": True, key: value}
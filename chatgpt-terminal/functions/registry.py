@@ -3,8 +3,13 @@ from functions.functioncallingbase import FunctionCallingBase
 from functions.createorder import CreateOrder
 from functions.getbalance import GetBalance
 from functions.sendemail import SendEmail
+from functions.sendbulkemail import SendBulkEmail
+from functions.getemailstatus import GetEmailStatus
 from functions.createcalendarevent import CreateCalendarEvent
+from functions.createcalendarevents import CreateCalendarEvents
 from functions.listcalendarevents import ListCalendarEvents
+from functions.findfreeslots import FindFreeSlots
+from functions.readtoolresult import ReadToolResult
 
 class FunctionRegistry:
     _instance = None
@@ -23,8 +28,13 @@ class FunctionRegistry:
         self.register_function(CreateOrder)
         self.register_function(GetBalance)
         self.register_function(SendEmail)
+        self.register_function(SendBulkEmail)
+        self.register_function(GetEmailStatus)
         self.register_function(CreateCalendarEvent)
+        self.register_function(CreateCalendarEvents)
         self.register_function(ListCalendarEvents)
+        self.register_function(FindFreeSlots)
+        self.register_function(ReadToolResult)
         
     def register_function(self, function_class: Type[FunctionCallingBase]):
         """
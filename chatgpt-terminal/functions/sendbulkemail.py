@@ -0,0 +1,112 @@
+from functions.functioncallingbase import FunctionCallingBase
+from functions.sendemail import EMAIL_PATTERN
+from services.email_service import EmailService
+import re
+
+PLACEHOLDER = re.compile(r'\{\{\s*(\w+)\s*\}\}')
+
+def render(template: str, variables: dict) -> str:
+    """Replace {{name}} placeholders; raises KeyError for a placeholder without a value"""
+    return PLACEHOLDER.sub(lambda match: str(variables[match.group(1)]), template)
+
+class SendBulkEmail(FunctionCallingBase):
+    def __init__(self):
+        super().__init__()
+        self.email_service = EmailService()
+
+    def _get_function_definition(self):
+        return {
+            "name": "send_bulk_email",
+            "description": "Send a personalized email to many recipients at once (mail merge). The subject and body are templates with {{placeholders}} filled in from each recipient's variables, e.g. 'Hi {{first_name}}'. Emails are queued and delivered in the background under a rate limit; use get_email_status with the returned batch_id to follow delivery",
+            "operation_type": "write",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "subject": {
+                        "type": "string",
+                        "description": "Subject line template, may contain {{placeholders}}"
+                    },
+                    "body": {
+                        "type": "string",
+                        "description": "Body template, may contain {{placeholders}}. Can include HTML formatting if is_html is true."
+                    },
+                    "is_html": {
+                        "type": "boolean",
+                        "description": "Whether the body contains HTML formatting",
+                        "default": False
+                    },
+                    "recipients": {
+                        "type": "array",
+                        "description": "One entry per email to send",
+                        "minItems": 1,
+                        "maxItems": 1000,
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "to_email": {
+                                    "type": "string",
+                                    "description": "The recipient's email address"
+                                },
+                                "variables": {
+                                    "type": "object",
+                                    "description": "Values for the placeholders, e.g. {\"first_name\": \"Ana\"}",
+                                    "additionalProperties": {
+                                        "type": "string"
+                                    }
+                                }
+                            },
+                            "required": ["to_email"],
+                            "additionalProperties": False
+                        }
+                    }
+                },
+                "required": ["subject", "body", "recipients"],
+                "additionalProperties": False
+            }
+        }
+
+    def execute(self, **kwargs):
+        subject = kwargs.get("subject")
+        body = kwargs.get("body")
+        is_html = kwargs.get("is_html", False)
+
+        messages = []
+        skipped = []
+        for recipient in kwargs.get("recipients", []):
+            to_email = recipient.get("to_email", "")
+            if not re.match(EMAIL_PATTERN, to_email):
+                skipped.append({"to_email": to_email, "error": "Invalid email address format"})
+                continue
+            # The address itself can be used as a placeholder too
+            variables = {"to_email": to_email, **recipient.get("variables", {})}
+            try:
+                messages.append({
+                    "to_email": to_email,
+                    "subject": render(subject, variables),
+                    "body": render(body, variables),
+                    "is_html": is_html
+                })
+            except KeyError as e:
+                skipped.append({"to_email": to_email, "error": f"No value for placeholder {{{{{e.args[0]}}}}}"})
+
+        if not messages:
+            return {
+                "success": False,
+                "error": "No email could be prepared",
+                "skipped": skipped
+            }
+
+        batch_id, email_ids, error = self.email_service.queue_emails(messages)
+        if not batch_id:
+            return {
+                "success": False,
+                "error": error
+            }
+
+        return {
+            "success": True,
+            "message": f"{len(email_ids)} emails queued for delivery" + (f", {len(skipped)} skipped" if skipped else ""),
+            "batch_id": batch_id,
+            "queued": len(email_ids),
+            "skipped": skipped
+        }
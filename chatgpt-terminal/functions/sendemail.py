@@ -2,6 +2,8 @@ from functions.functioncallingbase import FunctionCallingBase
 from services.email_service import EmailService
 import re
 
+EMAIL_PATTERN = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+
 class SendEmail(FunctionCallingBase):
     def __init__(self):
         super().__init__()
@@ -10,7 +12,7 @@ class SendEmail(FunctionCallingBase):
     def _get_function_definition(self):
         return {
             "name": "send_email",
-            "description": "Send an email to a specified recipient",
+            "description": "Send an email to a specified recipient. The email is queued and delivered in the background; use get_email_status with the returned email_id to check whether it was delivered",
             "operation_type": "write",  # This is a write operation as it modifies state (sends an email)
             "parameters": {
                 "type": "object",
@@ -40,8 +42,7 @@ class SendEmail(FunctionCallingBase):
 
     def _validate_email(self, email: str) -> bool:
         """Validate email format"""
-        pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        return bool(re.match(pattern, email))
+        return bool(re.match(EMAIL_PATTERN, email))
 
     def execute(self, **kwargs):
         to_email = kwargs.get("to_email")
@@ -56,15 +57,15 @@ class SendEmail(FunctionCallingBase):
                 "error": "Invalid email address format"
             }
 
-        # Send the email
-        success, error = self.email_service.send_email(
+        # Queue the email; it is delivered in the background
+        email_id, error = self.email_service.queue_email(
             to_email=to_email,
             subject=subject,
             body=body,
             is_html=is_html
         )
 
-        if not success:
+        if not email_id:
             return {
                 "success": False,
                 "error": error
@@ -72,10 +73,11 @@ class SendEmail(FunctionCallingBase):
 
         return {
             "success": True,
-            "message": f"Email sent successfully to {to_email}",
+            "message": f"Email to {to_email} queued for delivery",
             "details": {
+                "email_id": email_id,
                 "to": to_email,
                 "subject": subject,
                 "is_html": is_html
             }
-        } 
\ No newline at end of file
+        }
@@ -1,15 +1,72 @@
-from openai import AsyncOpenAI
 import asyncio
 import json
+import os
+import sys
+import threading
 from functions.registry import FunctionRegistry
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from services.coinbase_service import CoinbaseService
+from services.email_service import EmailService
+from services.google_calendar_service import GoogleCalendarService
+from services.session_journal import JournaledContext, SessionJournal
+from services.tool_results import ToolResultStore
+from shared import cassettes
+from shared.hedging import HedgedCompletions
+from shared.model_router import ModelRouter, models_from_env
+from shared.openai_clients import get_async_client, prewarm_async, stats as connection_stats
 
-client = AsyncOpenAI()
+# Record every outbound call, or serve it from a recording (CASSETTE_MODE=record|replay).
+# What the user typed is part of the recording, so a replay runs the whole session unattended
+cassettes.instrument(CoinbaseService, "coinbase",
+                     ["get_balance", "get_product_details", "create_market_buy_order", "create_market_sell_order"])
+cassettes.instrument(GoogleCalendarService, "calendar", ["create_event", "create_events", "list_events", "find_free_slots"])
+cassettes.instrument(EmailService, "email", ["send_email", "deliver"])
+read_input = cassettes.wrap(input, "user", "input", missing=EOFError)
+
+client = get_async_client("interactive")
+
+# Open the API connection while the user types the first message
+OPENAI_PREWARM = os.getenv("OPENAI_PREWARM", "true").lower() == "true"
+
+# Completion calls have no side effects, so they may be hedged (opt-in)
+OPENAI_HEDGING = os.getenv("OPENAI_HEDGING", "false").lower() == "true"
+completions = HedgedCompletions(
+    client.chat.completions,
+    percentile=float(os.getenv("OPENAI_HEDGING_PERCENTILE", "90"))
+) if OPENAI_HEDGING else client.chat.completions
+
+# Models per phase, fastest first. The forced decision is a small classification task, so it goes
+# to a fast model and is retried on the larger one when its output cannot be acted on
+router = ModelRouter(
+    {
+        "decision": models_from_env("decision", "gpt-4o-mini,gpt-4o"),
+        "answer": models_from_env("answer", "gpt-4o"),
+        "cancellation": models_from_env("cancellation", "gpt-4o-mini,gpt-4o"),
+    },
+    budgets={"decision": 3.0, "answer": 10.0, "cancellation": 3.0}
+)
 
 # Initialize the function registry
 registry = FunctionRegistry()
 
+# Seconds queued emails get to go out when the terminal exits
+EMAIL_EXIT_TIMEOUT = float(os.getenv("EMAIL_EXIT_TIMEOUT", "10"))
+
+# Full tool results stay here; the context gets compact projections
+tool_results = ToolResultStore()
+
+# Every message is journaled as it is added, so the conversation survives a restart. On start,
+# the most recent messages that fit SESSION_TOKEN_BUDGET are resumed
+SESSION_JOURNAL = os.getenv("SESSION_JOURNAL") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "session.journal")
+SESSION_RESUME = os.getenv("SESSION_RESUME", "true").lower() == "true"
+SESSION_TOKEN_BUDGET = int(os.getenv("SESSION_TOKEN_BUDGET", "8000"))
+journal = SessionJournal(SESSION_JOURNAL)
+# Full tool results are kept next to the journal, so read_tool_result still works after a resume
+tool_results.persist(SESSION_JOURNAL + ".results")
+
 # Get all available functions
 functions = registry.get_all_functions()
+function_definitions = {f["name"]: f for f in functions}
 
 function_tools = [{
     "type": "function",
@@ -49,9 +106,24 @@ tools = [{
     }
 }]
 
-async def handle_streaming_response(response_stream) -> tuple[str, list]:
+def decision_is_valid(arguments: str) -> bool:
+    """Whether use_function_decision arguments can be acted on: parseable, a known function and its required arguments"""
+    try:
+        decision = json.loads(arguments)
+        if not decision["use_function"]:
+            return True
+        definition = function_definitions[decision["function_name"]]
+        function_args = json.loads(decision["function_arguments"])
+        return isinstance(function_args, dict) and all(
+            name in function_args for name in definition["parameters"].get("required", [])
+        )
+    except (ValueError, KeyError, TypeError):
+        return False
+
+async def handle_streaming_response(response_stream, route=None) -> tuple[str, list]:
     """
     Handle streaming response from OpenAI API
+    Token usage (the last chunk) is added to `route` if given
     Returns: (full_response, tool_calls_data)
     """
     full_response = ""
@@ -64,6 +136,11 @@ async def handle_streaming_response(response_stream) -> tuple[str, list]:
     print("\nAssistant: ", end="", flush=True)
     async for event in response_stream:
         # print(event)
+        if not event.choices:
+            # The usage chunk requested with stream_options
+            if route:
+                route.add_usage(event.usage)
+            continue
         delta = event.choices[0].delta
         
         # Handle tool calls
@@ -118,29 +195,108 @@ async def handle_streaming_response(response_stream) -> tuple[str, list]:
     
     return full_response, tool_calls_data
 
+def read_line(prompt: str) -> asyncio.Future:
+    """
+    read_input in a daemon thread, so the event loop stays free (e.g. for the prewarm task).
+    Unlike asyncio.to_thread, Ctrl+C does not wait at exit for the thread blocked in input()
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def resolve(set_outcome, value) -> None:
+        if not future.done():
+            set_outcome(value)
+
+    def run() -> None:
+        try:
+            outcome = (future.set_result, read_input(prompt))
+        except BaseException as e:
+            outcome = (future.set_exception, e)
+        try:
+            loop.call_soon_threadsafe(resolve, *outcome)
+        except RuntimeError:
+            # The loop has already closed
+            pass
+
+    threading.Thread(target=run, name="read-input", daemon=True).start()
+    return future
+
 async def main():
     print("Welcome to the ChatGPT terminal!")
 
-    context_window = []
+    if not SESSION_RESUME:
+        journal.reset()
+        tool_results.prune([])
+    context_window = JournaledContext(journal, journal.tail(SESSION_TOKEN_BUDGET))
+    if context_window:
+        print(f"Resumed the previous conversation ({len(context_window)} messages). Type /reset to start over.")
+    # Keep a reference so the task is not garbage collected before it finishes
+    prewarm = asyncio.create_task(prewarm_async()) if OPENAI_PREWARM else None
+    # Emails still queued when the terminal last exited are delivered in the background
+    queued = EmailService().resume_pending()
+    if queued:
+        print(f"Delivering {queued} emails queued in an earlier session.")
 
     while True:
-        user_input = input("\nUser: ")
+        try:
+            user_input = await read_line("\nUser: ")
+        except EOFError:
+            # End of piped input or of a replayed session
+            print()
+            print(tool_results.format_stats())
+            break
+
+        if user_input.strip() == "/stats":
+            print(completions.format_stats() if OPENAI_HEDGING else "Hedging is disabled (set OPENAI_HEDGING=true).")
+            print(connection_stats.format_stats())
+            print(router.format_stats())
+            print(tool_results.format_stats())
+            print(journal.format_stats())
+            if cassettes.active():
+                print(cassettes.active().format_stats())
+            continue
+
+        if user_input.strip() == "/compact":
+            size = journal.size()
+            context_window[:] = journal.compact(SESSION_TOKEN_BUDGET)
+            tool_results.prune(context_window)
+            print(f"Compacted the session journal to the last {len(context_window)} messages "
+                  f"({size / 1024:.1f} KB -> {journal.size() / 1024:.1f} KB).")
+            continue
+
+        if user_input.strip() == "/reset":
+            journal.reset()
+            tool_results.prune([])
+            context_window.clear()
+            print("Started a new conversation.")
+            continue
 
         context_window.append({
             "role": "user",
             "content": user_input
         })
 
-        # First, let the model decide whether to use a function
-        stream = await client.chat.completions.create(
-            model="gpt-4o",
-            messages=context_window,
-            tools=tools,
-            tool_choice={"type": "function", "function": {"name": "use_function_decision"}},  # Force the use of decision tool
-            stream=True
-        )
+        # First, let the model decide whether to use a function; a decision that cannot be
+        # acted on is asked again of the next larger model
+        model = None
+        while True:
+            with router.call("decision", model) as route:
+                tool_results.count_request()
+                stream = await completions.create(
+                    model=route.model,
+                    messages=context_window,
+                    tools=tools,
+                    tool_choice={"type": "function", "function": {"name": "use_function_decision"}},  # Force the use of decision tool
+                    stream=True,
+                    stream_options={"include_usage": True}
+                )
 
-        full_response, tool_calls_data = await handle_streaming_response(stream)
+                full_response, tool_calls_data = await handle_streaming_response(stream, route)
+                if tool_calls_data and not decision_is_valid(tool_calls_data[0]["function"]["arguments"]):
+                    route.reject()
+            model = router.escalate("decision", route.model) if route.rejected else None
+            if model is None:
+                break
         
         # Create the complete message from the accumulated data
         message = {
@@ -173,7 +329,7 @@ async def main():
                 should_proceed = True
                 if instance.requires_confirmation:
                     # Ask for user confirmation
-                    confirmation = input("\nDo you want to proceed? (y/n): ").lower()
+                    confirmation = read_input("\nDo you want to proceed? (y/n): ").lower()
                     should_proceed = confirmation == 'y'
                 
                 if not should_proceed:
@@ -184,13 +340,16 @@ async def main():
                     })
                     
                     # Get response from the model about the cancellation
-                    cancel_response_stream = await client.chat.completions.create(
-                        model="gpt-4o",
-                        messages=context_window,
-                        stream=True
-                    )
-                    
-                    cancel_response_full, _ = await handle_streaming_response(cancel_response_stream)
+                    with router.call("cancellation") as route:
+                        tool_results.count_request()
+                        cancel_response_stream = await completions.create(
+                            model=route.model,
+                            messages=context_window,
+                            stream=True,
+                            stream_options={"include_usage": True}
+                        )
+
+                        cancel_response_full, _ = await handle_streaming_response(cancel_response_stream, route)
                     context_window.append({
                         "role": "assistant",
                         "content": cancel_response_full
@@ -200,21 +359,24 @@ async def main():
                 # Execute the function using the registry
                 result = registry.execute_function(function_decision["function_name"], **function_args)
                 
-                # Add the tool response to the context
+                # Add the tool response to the context, as a compact projection if the result is large
                 context_window.append({
                     "role": "tool",
                     "tool_call_id": tool_call["id"],
-                    "content": json.dumps(result)
+                    "content": tool_results.add(result, instance.compact_result)
                 })
 
                 # Get final response from the model about what was done
-                final_response_stream = await client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=context_window,
-                    stream=True
-                )
+                with router.call("answer") as route:
+                    tool_results.count_request()
+                    final_response_stream = await completions.create(
+                        model=route.model,
+                        messages=context_window,
+                        stream=True,
+                        stream_options={"include_usage": True}
+                    )
 
-                final_response_full, _ = await handle_streaming_response(final_response_stream)
+                    final_response_full, _ = await handle_streaming_response(final_response_stream, route)
                 context_window.append({
                     "role": "assistant",
                     "content": final_response_full
@@ -230,5 +392,14 @@ async def main():
             # If no function was called, just add the response to context
             context_window.append(message)
 
+def finish_emails() -> None:
+    """Give queued emails a chance to go out before exiting, and say what is left"""
+    pending = EmailService().shutdown(EMAIL_EXIT_TIMEOUT)
+    if pending:
+        print(f"{pending} emails are still queued; they will be sent the next time the terminal starts.")
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    try:
+        asyncio.run(main())
+    finally:
+        finish_emails()
@@ -0,0 +1,176 @@
+from datetime import datetime
+from googleapiclient.errors import HttpError
+import json
+import numpy as np
+import pytz
+import sqlite3
+import threading
+import time
+
+class CalendarMirror:
+    """
+    Local copy of one calendar, kept in SQLite and queried from memory.
+
+    The first sync pulls every event; later syncs send the last nextSyncToken
+    and only receive what changed (cancelled events are removed). Time-range
+    queries use an interval index: events sorted by start, plus the running
+    maximum of their ends, so both bounds of a query are binary searches.
+    """
+    def __init__(self, fetch_page, db_path, calendar_id='primary', timezone='UTC', max_age=60.0):
+        """
+        fetch_page: callable taking events().list keyword arguments and returning the response dict
+        max_age: seconds after which list_events() runs a delta sync before answering
+        """
+        self._fetch_page = fetch_page
+        self.calendar_id = calendar_id
+        self.timezone = pytz.timezone(timezone)
+        self.max_age = max_age
+        self.full_syncs = 0
+        self.delta_syncs = 0
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS events (
+                calendar_id TEXT NOT NULL, id TEXT NOT NULL, data TEXT NOT NULL,
+                PRIMARY KEY (calendar_id, id)
+            );
+            CREATE TABLE IF NOT EXISTS sync_state (
+                calendar_id TEXT PRIMARY KEY, sync_token TEXT, synced_at REAL NOT NULL
+            );
+        """)
+        row = self._db.execute(
+            "SELECT sync_token, synced_at FROM sync_state WHERE calendar_id = ?", (calendar_id,)
+        ).fetchone()
+        self._sync_token, self.synced_at = row if row else (None, 0.0)
+        self._events = {
+            event_id: json.loads(data)
+            for event_id, data in self._db.execute("SELECT id, data FROM events WHERE calendar_id = ?", (calendar_id,))
+        }
+        self._build_index()
+
+    def _to_timestamp(self, when):
+        if 'dateTime' in when:
+            return datetime.fromisoformat(when['dateTime'].replace('Z', '+00:00')).timestamp()
+        # All-day events start at local midnight
+        tz = pytz.timezone(when['timeZone']) if 'timeZone' in when else self.timezone
+        return tz.localize(datetime.fromisoformat(when['date'])).timestamp()
+
+    def _build_index(self):
+        ids = list(self._events)
+        starts = np.array([self._to_timestamp(self._events[i]['start']) for i in ids], dtype=np.float64)
+        ends = np.array([self._to_timestamp(self._events[i]['end']) for i in ids], dtype=np.float64)
+        order = np.argsort(starts, kind='stable')
+        self._ids = [ids[i] for i in order]
+        self._starts = starts[order]
+        self._ends = ends[order]
+        # Non-decreasing, so the first event that can still be running at t is a binary search away
+        self._reach = np.maximum.accumulate(self._ends) if len(ids) else self._ends
+
+    def _pull(self, **params):
+        """Fetch every page of a list request; returns (items, nextSyncToken)"""
+        items = []
+        page_token = None
+        while True:
+            page = self._fetch_page(**params, **({'pageToken': page_token} if page_token else {}))
+            items.extend(page.get('items', []))
+            page_token = page.get('nextPageToken')
+            if not page_token:
+                return items, page.get('nextSyncToken')
+
+    def _save(self, changed, removed, replace_all=False):
+        with self._db:
+            if replace_all:
+                self._db.execute("DELETE FROM events WHERE calendar_id = ?", (self.calendar_id,))
+            self._db.executemany(
+                "DELETE FROM events WHERE calendar_id = ? AND id = ?",
+                [(self.calendar_id, event_id) for event_id in removed]
+            )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO events (calendar_id, id, data) VALUES (?, ?, ?)",
+                [(self.calendar_id, event['id'], json.dumps(event)) for event in changed]
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO sync_state (calendar_id, sync_token, synced_at) VALUES (?, ?, ?)",
+                (self.calendar_id, self._sync_token, self.synced_at)
+            )
+
+    def _apply(self, items, replace_all=False):
+        if replace_all:
+            self._events = {}
+        changed, removed = [], []
+        for event in items:
+            if event.get('status') == 'cancelled':
+                self._events.pop(event['id'], None)
+                removed.append(event['id'])
+            else:
+                self._events[event['id']] = event
+                changed.append(event)
+        self.synced_at = time.time()
+        self._save(changed, removed, replace_all)
+        self._build_index()
+
+    def sync(self):
+        """Delta sync when a sync token is held, full sync otherwise (or when Google expired the token)"""
+        with self._lock:
+            if self._sync_token:
+                try:
+                    items, self._sync_token = self._pull(syncToken=self._sync_token, singleEvents=True, maxResults=2500)
+                    self.delta_syncs += 1
+                    self._apply(items)
+                    return
+                except HttpError as e:
+                    if e.resp.status != 410:
+                        raise
+            items, self._sync_token = self._pull(singleEvents=True, maxResults=2500)
+            self.full_syncs += 1
+            self._apply(items, replace_all=True)
+
+    def ensure_fresh(self):
+        with self._lock:
+            if time.time() - self.synced_at > self.max_age:
+                self.sync()
+
+    def invalidate(self):
+        """Make the next list_events() run a delta sync first"""
+        self.synced_at = 0.0
+
+    def upsert(self, event):
+        """Record an event this process just created, without waiting for the next sync"""
+        with self._lock:
+            self._events[event['id']] = event
+            self._save([event], [])
+            self._build_index()
+
+    def query(self, time_min, time_max, max_results=None):
+        """Events overlapping [time_min, time_max) (epoch seconds), ordered by start"""
+        with self._lock:
+            first = int(np.searchsorted(self._reach, time_min, side='right'))
+            last = int(np.searchsorted(self._starts, time_max, side='left'))
+            if first >= last:
+                return []
+            hits = first + np.flatnonzero(self._ends[first:last] > time_min)
+            if max_results is not None:
+                hits = hits[:max_results]
+            return [self._events[self._ids[i]] for i in hits]
+
+    def busy_intervals(self, time_min, time_max):
+        """(starts, ends) arrays of the events overlapping [time_min, time_max) that block time"""
+        with self._lock:
+            first = int(np.searchsorted(self._reach, time_min, side='right'))
+            last = max(first, int(np.searchsorted(self._starts, time_max, side='left')))
+            blocking = np.array([
+                self._events[event_id].get('transparency') != 'transparent' for event_id in self._ids[first:last]
+            ], dtype=bool)
+            return self._starts[first:last][blocking], self._ends[first:last][blocking]
+
+    def list_events(self, time_min, time_max, max_results=None):
+        """Like events().list(singleEvents=True, orderBy='startTime') for RFC3339 bounds, answered locally"""
+        self.ensure_fresh()
+        return self.query(
+            datetime.fromisoformat(time_min.replace('Z', '+00:00')).timestamp(),
+            datetime.fromisoformat(time_max.replace('Z', '+00:00')).timestamp(),
+            max_results
+        )
+
+    def __len__(self):
+        return len(self._events)
@@ -0,0 +1,241 @@
+from typing import Callable, Optional
+import os
+import random
+import smtplib
+import sqlite3
+import threading
+import time
+import uuid
+
+# Sent and failed messages are kept this long so their status can still be looked up
+RETENTION_SECONDS = 7 * 24 * 3600
+
+def pending_in(db_path: str) -> int:
+    """Messages still to deliver in an outbox database, without starting an outbox on it"""
+    if not os.path.exists(db_path):
+        return 0
+    db = sqlite3.connect(db_path)
+    try:
+        return db.execute("SELECT COUNT(*) FROM outbox WHERE status IN ('queued', 'sending')").fetchone()[0]
+    except sqlite3.OperationalError:
+        # Created but never used
+        return 0
+    finally:
+        db.close()
+
+def is_permanent(error: Exception) -> bool:
+    """Whether retrying cannot help: 5xx replies (bad login, rejected recipient) and malformed messages"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code >= 500
+    # Connection problems and timeouts are worth another try
+    return not isinstance(error, (smtplib.SMTPException, OSError))
+
+class RateLimiter:
+    """Token bucket shared by the delivery workers: `rate` messages per second, bursts of up to `burst`"""
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+class EmailOutbox:
+    """
+    Durable queue of outgoing emails, delivered by background worker threads.
+
+    enqueue() only writes the message to SQLite, so callers return immediately;
+    messages still queued when the process exits are delivered on the next
+    start. Temporary failures (4xx replies, dropped connections) are retried
+    with exponential backoff, permanent ones (5xx) fail the message at once.
+    """
+    def __init__(self, deliver: Callable[[dict], None], db_path: str, workers: int = 2,
+                 max_attempts: int = 5, backoff: float = 2.0, max_backoff: float = 300.0,
+                 rate_limit: Optional[RateLimiter] = None, describe_error: Callable[[Exception], str] = str):
+        """
+        deliver: sends one message (a dict with to_email, subject, body and is_html); raises on failure
+        backoff: delay before the first retry in seconds, doubled for each further attempt
+        describe_error: turns a delivery error into the message stored with the email's status
+        """
+        self._deliver = deliver
+        self._describe_error = describe_error
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.rate_limit = rate_limit
+        self.delivered = 0
+        self.retries = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._closed = False
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode = WAL;
+            CREATE TABLE IF NOT EXISTS outbox (
+                id TEXT PRIMARY KEY, batch_id TEXT,
+                to_email TEXT NOT NULL, subject TEXT NOT NULL, body TEXT NOT NULL, is_html INTEGER NOT NULL,
+                status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, error TEXT,
+                created_at REAL NOT NULL, next_attempt REAL NOT NULL, sent_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt);
+            CREATE INDEX IF NOT EXISTS outbox_batch ON outbox (batch_id);
+        """)
+        with self._db:
+            # Messages that were being sent when the process stopped are sent again
+            self._db.execute("UPDATE outbox SET status = 'queued' WHERE status = 'sending'")
+            self._db.execute(
+                "DELETE FROM outbox WHERE status IN ('sent', 'failed') AND created_at < ?",
+                (time.time() - RETENTION_SECONDS,)
+            )
+        self._workers = [
+            threading.Thread(target=self._work, name=f"email-outbox-{i}", daemon=True) for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def enqueue(self, to_email: str, subject: str, body: str, is_html: bool = False) -> str:
+        """Queue one message; returns its ID"""
+        return self.enqueue_many([dict(to_email=to_email, subject=subject, body=body, is_html=is_html)])[0]
+
+    def enqueue_many(self, messages: list, batch_id: Optional[str] = None) -> list:
+        """Queue several messages in one transaction; returns their IDs in order"""
+        now = time.time()
+        ids = [uuid.uuid4().hex[:12] for _ in messages]
+        with self._lock:
+            with self._db:
+                self._db.executemany(
+                    "INSERT INTO outbox (id, batch_id, to_email, subject, body, is_html, status, created_at, next_attempt) "
+                    "VALUES (?, ?, ?, ?, ?, ?, 'queued', ?, ?)",
+                    [(message_id, batch_id, m['to_email'], m['subject'], m['body'], int(m.get('is_html', False)), now, now)
+                     for message_id, m in zip(ids, messages)]
+                )
+            self._wakeup.notify(len(messages))
+        return ids
+
+    def _claim(self) -> Optional[dict]:
+        """Mark the next due message as being sent; waits until one is due. None once closed"""
+        with self._lock:
+            while not self._closed:
+                now = time.time()
+                row = self._db.execute(
+                    "SELECT id, to_email, subject, body, is_html, attempts FROM outbox "
+                    "WHERE status = 'queued' AND next_attempt <= ? ORDER BY next_attempt LIMIT 1", (now,)
+                ).fetchone()
+                if row:
+                    with self._db:
+                        self._db.execute("UPDATE outbox SET status = 'sending' WHERE id = ?", (row[0],))
+                    return dict(id=row[0], to_email=row[1], subject=row[2], body=row[3],
+                                is_html=bool(row[4]), attempts=row[5])
+                upcoming = self._db.execute(
+                    "SELECT MIN(next_attempt) FROM outbox WHERE status = 'queued'"
+                ).fetchone()[0]
+                self._wakeup.wait(None if upcoming is None else max(upcoming - now, 0.01))
+        return None
+
+    def _finish(self, message_id: str, status: str, attempts: int, error: Optional[str] = None,
+                next_attempt: float = 0.0) -> None:
+        with self._lock:
+            with self._db:
+                self._db.execute(
+                    "UPDATE outbox SET status = ?, attempts = ?, error = ?, next_attempt = ?, sent_at = ? WHERE id = ?",
+                    (status, attempts, error, next_attempt, time.time() if status == 'sent' else None, message_id)
+                )
+            if status == 'queued':
+                self._wakeup.notify()
+
+    def _work(self) -> None:
+        while True:
+            message = self._claim()
+            if message is None:
+                return
+            if self.rate_limit:
+                self.rate_limit.acquire()
+            attempts = message['attempts'] + 1
+            try:
+                self._deliver(message)
+            except Exception as e:
+                if is_permanent(e) or attempts >= self.max_attempts:
+                    self._finish(message['id'], 'failed', attempts, self._describe_error(e))
+                else:
+                    # Exponential backoff with jitter, so retries after an outage do not arrive together
+                    delay = min(self.backoff * 2 ** (attempts - 1), self.max_backoff) * random.uniform(0.5, 1.0)
+                    with self._lock:
+                        self.retries += 1
+                    self._finish(message['id'], 'queued', attempts, self._describe_error(e), time.time() + delay)
+                continue
+            with self._lock:
+                self.delivered += 1
+            self._finish(message['id'], 'sent', attempts)
+
+    def status(self, message_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, batch_id, to_email, subject, status, attempts, error, created_at, sent_at FROM outbox WHERE id = ?",
+                (message_id,)
+            ).fetchone()
+        if not row:
+            return None
+        return {
+            "email_id": row[0], "batch_id": row[1], "to": row[2], "subject": row[3], "status": row[4],
+            "attempts": row[5], "error": row[6], "queued_at": row[7], "sent_at": row[8]
+        }
+
+    def batch_status(self, batch_id: str) -> Optional[dict]:
+        """Message counts per status, plus the recipients that failed"""
+        with self._lock:
+            counts = dict(self._db.execute(
+                "SELECT status, COUNT(*) FROM outbox WHERE batch_id = ? GROUP BY status", (batch_id,)
+            ))
+            failed = self._db.execute(
+                "SELECT id, to_email, error FROM outbox WHERE batch_id = ? AND status = 'failed'", (batch_id,)
+            ).fetchall()
+        if not counts:
+            return None
+        return {
+            "batch_id": batch_id,
+            "total": sum(counts.values()),
+            "sent": counts.get('sent', 0),
+            # 'sending' is only a moment; it is still pending for the caller
+            "pending": counts.get('queued', 0) + counts.get('sending', 0),
+            "failed": counts.get('failed', 0),
+            "failures": [{"email_id": i, "to": to, "error": error} for i, to, error in failed]
+        }
+
+    def pending(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM outbox WHERE status IN ('queued', 'sending')").fetchone()[0]
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until nothing is queued or being sent; False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.pending():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self) -> None:
+        """Stop the workers once their current message is done; queued messages stay in the database"""
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify_all()
+        for worker in self._workers:
+            worker.join()
+        self._db.close()
+
+    def format_stats(self) -> str:
+        return (f"Email outbox: {self.delivered} delivered, {self.retries} retries, "
+                f"{self.pending()} pending, {len(self._workers)} workers")
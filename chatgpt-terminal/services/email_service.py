@@ -2,7 +2,11 @@ import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import os
+import threading
+import uuid
 from typing import Optional, Tuple
+from services.email_outbox import EmailOutbox, RateLimiter, pending_in
+from services.smtp_pool import SMTPPool
 
 class EmailService:
     _instance = None
@@ -21,10 +25,76 @@ class EmailService:
         self.smtp_port = int(os.getenv("SMTP_PORT", self.GMAIL_SMTP_PORT))
         self.smtp_username = os.getenv("SMTP_USERNAME")
         self.smtp_password = os.getenv("SMTP_PASSWORD")
+        # Only disable for local test servers that do not offer STARTTLS
+        self.smtp_starttls = os.getenv("SMTP_STARTTLS", "true").lower() == "true"
 
         if not all([self.smtp_username, self.smtp_password]):
             raise ValueError("Email configuration is incomplete. Please check your environment variables.")
 
+        # The configuration cannot change while running, so it is checked once
+        self._config_valid, self._config_error = self._validate_gmail_config()
+
+        self.pool = SMTPPool(
+            self._connect,
+            size=int(os.getenv("SMTP_POOL_SIZE", "2")),
+            idle_timeout=float(os.getenv("SMTP_IDLE_TIMEOUT", "60"))
+        )
+        self._outbox = None
+        self._outbox_lock = threading.Lock()
+
+    def _outbox_path(self) -> str:
+        return os.getenv("EMAIL_OUTBOX_DB") or os.path.join(os.path.dirname(__file__), '..', 'email_outbox.db')
+
+    def resume_pending(self) -> int:
+        """Start delivering emails an earlier run left queued, if there are any; returns how many"""
+        if self._outbox is None and not pending_in(self._outbox_path()):
+            return 0
+        return self.outbox.pending()
+
+    def shutdown(self, timeout: float) -> int:
+        """
+        Give queued emails up to timeout seconds to go out, then stop the workers and close the
+        SMTP sessions. Returns how many are still queued; they are sent on the next start.
+        """
+        with self._outbox_lock:
+            outbox, self._outbox = self._outbox, None
+        if outbox is None:
+            return 0
+        outbox.flush(timeout)
+        pending = outbox.pending()
+        outbox.close()
+        self.pool.close()
+        return pending
+
+    @property
+    def outbox(self) -> EmailOutbox:
+        """The background delivery queue, started on first use"""
+        with self._outbox_lock:
+            if self._outbox is None:
+                rate = float(os.getenv("EMAIL_RATE_LIMIT", "60"))
+                self._outbox = EmailOutbox(
+                    lambda message: self.deliver(message['to_email'], message['subject'], message['body'], message['is_html']),
+                    self._outbox_path(),
+                    # One worker per pooled session
+                    workers=self.pool.size,
+                    max_attempts=int(os.getenv("EMAIL_MAX_ATTEMPTS", "5")),
+                    rate_limit=RateLimiter(rate / 60, burst=10) if rate > 0 else None,
+                    describe_error=self._describe_error
+                )
+            return self._outbox
+
+    def _connect(self) -> smtplib.SMTP:
+        """A new SMTP session with STARTTLS and login done"""
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=30)
+        try:
+            if self.smtp_starttls:
+                server.starttls()
+            server.login(self.smtp_username, self.smtp_password)
+        except Exception:
+            server.close()
+            raise
+        return server
+
     def _validate_gmail_config(self) -> Tuple[bool, Optional[str]]:
         """Validate Gmail-specific configuration"""
         if not self.smtp_username or not self.smtp_password:
@@ -39,42 +109,65 @@ class EmailService:
         
         return True, None
 
+    def _build_message(self, to_email: str, subject: str, body: str, is_html: bool) -> MIMEMultipart:
+        msg = MIMEMultipart()
+        msg["From"] = self.smtp_username
+        msg["To"] = to_email
+        msg["Subject"] = subject
+
+        # Add body with appropriate content type
+        content_type = "html" if is_html else "plain"
+        msg.attach(MIMEText(body, content_type))
+        return msg
+
+    def _describe_error(self, error: Exception) -> str:
+        if isinstance(error, smtplib.SMTPAuthenticationError):
+            if self.smtp_server == self.GMAIL_SMTP_SERVER:
+                return ("Gmail authentication failed. Make sure you're using an App Password, "
+                        "not your regular Gmail password. Check console for setup instructions.")
+            return "SMTP authentication failed"
+        if isinstance(error, smtplib.SMTPException):
+            return f"SMTP error: {str(error)}"
+        return str(error)
+
+    def deliver(self, to_email: str, subject: str, body: str, is_html: bool = False) -> None:
+        """Send an email over a pooled, already authenticated session; raises on failure"""
+        self.pool.send_message(self._build_message(to_email, subject, body, is_html))
+
     def send_email(self, to_email: str, subject: str, body: str, is_html: bool = False) -> Tuple[bool, Optional[str]]:
         """
-        Send an email
+        Send an email and wait for the server to accept it
         Returns: (success, error_message)
         """
+        if not self._config_valid:
+            return False, self._config_error
         try:
-            # Validate configuration
-            is_valid, error = self._validate_gmail_config()
-            if not is_valid:
-                return False, error
-
-            msg = MIMEMultipart()
-            msg["From"] = self.smtp_username
-            msg["To"] = to_email
-            msg["Subject"] = subject
-
-            # Add body with appropriate content type
-            content_type = "html" if is_html else "plain"
-            msg.attach(MIMEText(body, content_type))
-
-            # Create SMTP connection
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                try:
-                    server.login(self.smtp_username, self.smtp_password)
-                except smtplib.SMTPAuthenticationError:
-                    if self.smtp_server == self.GMAIL_SMTP_SERVER:
-                        return False, ("Gmail authentication failed. Make sure you're using an App Password, "
-                                     "not your regular Gmail password. Check console for setup instructions.")
-                    return False, "SMTP authentication failed"
-                
-                server.send_message(msg)
-
-            return True, None
-
-        except smtplib.SMTPException as e:
-            return False, f"SMTP error: {str(e)}"
+            self.deliver(to_email, subject, body, is_html)
         except Exception as e:
-            return False, str(e) 
\ No newline at end of file
+            return False, self._describe_error(e)
+        return True, None
+
+    def queue_email(self, to_email: str, subject: str, body: str, is_html: bool = False) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Queue an email for background delivery
+        Returns: (email_id, error_message)
+        """
+        if not self._config_valid:
+            return None, self._config_error
+        return self.outbox.enqueue(to_email, subject, body, is_html), None
+
+    def queue_emails(self, messages: list) -> Tuple[Optional[str], list, Optional[str]]:
+        """
+        Queue several emails (dicts with to_email, subject, body, is_html) as one batch
+        Returns: (batch_id, email_ids, error_message)
+        """
+        if not self._config_valid:
+            return None, [], self._config_error
+        batch_id = uuid.uuid4().hex[:12]
+        return batch_id, self.outbox.enqueue_many(messages, batch_id), None
+
+    def email_status(self, email_id: str) -> Optional[dict]:
+        return self.outbox.status(email_id)
+
+    def batch_status(self, batch_id: str) -> Optional[dict]:
+        return self.outbox.batch_status(batch_id)
@@ -0,0 +1,72 @@
+"""
+Reducers that consume a stream of Calendar API events (e.g. from
+GoogleCalendarService.iter_events) without materializing it, so answering
+"how many meetings do I have this quarter?" needs no more memory than the
+answer itself. Each one stops pulling pages as soon as it has its result.
+"""
+from collections import Counter
+from datetime import datetime
+import pytz
+
+def format_event(event):
+    """The compact shape returned to the model"""
+    return {
+        "id": event['id'],
+        "summary": event.get('summary', 'No title'),
+        "description": event.get('description', ''),
+        "start": event['start'].get('dateTime', event['start'].get('date')),
+        "end": event['end'].get('dateTime', event['end'].get('date')),
+        "link": event.get('htmlLink')
+    }
+
+def matches(event, query):
+    """Case-insensitive substring match on title, description and location"""
+    if not query:
+        return True
+    query = query.lower()
+    return any(query in (event.get(field) or '').lower() for field in ('summary', 'description', 'location'))
+
+def first_matches(events, limit, query=None):
+    """The first `limit` matching events (formatted) and whether there are more"""
+    found = []
+    for event in events:
+        if not matches(event, query):
+            continue
+        if len(found) == limit:
+            return found, True
+        found.append(format_event(event))
+    return found, False
+
+def count_matches(events, query=None):
+    return sum(1 for event in events if matches(event, query))
+
+def _local(when, tz):
+    if 'dateTime' in when:
+        return datetime.fromisoformat(when['dateTime'].replace('Z', '+00:00')).astimezone(tz)
+    return tz.localize(datetime.fromisoformat(when['date']))
+
+def summarize(events, timezone, query=None):
+    """Count, total scheduled time, events per day and the busiest day of the matching events"""
+    tz = pytz.timezone(timezone)
+    count = 0
+    minutes = 0.0
+    per_day = Counter()
+    first = last = None
+    for event in events:
+        if not matches(event, query):
+            continue
+        start, end = _local(event['start'], tz), _local(event['end'], tz)
+        count += 1
+        minutes += (end - start).total_seconds() / 60
+        per_day[start.date().isoformat()] += 1
+        first = start if first is None else min(first, start)
+        last = end if last is None else max(last, end)
+    busiest = per_day.most_common(1)
+    return {
+        "count": count,
+        "total_minutes": round(minutes),
+        "days_with_events": len(per_day),
+        "busiest_day": {"date": busiest[0][0], "events": busiest[0][1]} if busiest else None,
+        "first_start": first.isoformat() if first else None,
+        "last_end": last.isoformat() if last else None
+    }
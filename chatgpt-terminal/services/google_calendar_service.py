@@ -1,43 +1,170 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build_from_document
+from googleapiclient.http import BatchHttpRequest
+import httplib2
+import json
+import numpy as np
 import os.path
 import pickle
 import pytz
+import requests
+import threading
+import time
 from tzlocal import get_localzone
+from services.calendar_mirror import CalendarMirror
+from services import event_reducers, intervals
+
+# Access tokens are refreshed this long before they expire, so calls never wait on a 401 + refresh
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+
+# Google Calendar accepts at most 50 calls per batch request
+BATCH_LIMIT = 50
+BATCH_MAX_RETRIES = 2
+# Per-item errors worth resending: rate limits only. Inserts are not idempotent, and one that
+# failed with a server error may have been committed anyway, so resending it could duplicate it
+RATE_LIMIT_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded'}
+# Events per events().list page when streaming through a range
+PAGE_SIZE = 250
+
+_discovery_document = None
+_discovery_lock = threading.Lock()
+
+def _is_rate_limited(exception):
+    """429, or a 403 whose reason is a rate limit (other 403s are permission errors)"""
+    status = getattr(getattr(exception, 'resp', None), 'status', None)
+    if status == 429:
+        return True
+    if status != 403:
+        return False
+    try:
+        errors = json.loads(exception.content)['error'].get('errors', [])
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return False
+    return any(error.get('reason') in RATE_LIMIT_REASONS for error in errors)
+
+def _get_discovery_document():
+    """The Calendar v3 discovery document bundled with googleapiclient, parsed once per process"""
+    global _discovery_document
+    with _discovery_lock:
+        if _discovery_document is None:
+            _discovery_document = json.loads(discovery_cache.get_static_doc('calendar', 'v3'))
+        return _discovery_document
 
 class GoogleCalendarService:
-    def __init__(self):
+    # Shared by every instance: the function classes create a new service per call
+    _credentials = None
+    _credentials_lock = threading.Lock()
+    _refresh_request = Request(requests.Session())
+    # httplib2 connections are not thread-safe, so each thread gets its own authorized service
+    _thread_local = threading.local()
+    _mirrors = {}
+    _mirrors_lock = threading.Lock()
+    # Fetches the next events page while the current one is consumed
+    _prefetch_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='calendar-prefetch')
+
+    def __init__(self, token_path=None, credentials_path=None, api_endpoint=None, mirror_path=None):
         self.timezone = str(get_localzone())
         self.scopes = ['https://www.googleapis.com/auth/calendar']
+        self.token_path = token_path or os.path.join(os.path.dirname(__file__), '..', 'token.pickle')
+        self.credentials_path = credentials_path or os.path.join(os.path.dirname(__file__), '..', 'credentials.json')
+        # Point at a local stand-in (see calendar_stand_in.py) instead of Google
+        self.api_endpoint = api_endpoint or os.getenv("GOOGLE_CALENDAR_API_ENDPOINT")
+        # Answer list_events from a local, incrementally synced copy of the calendar (opt-in)
+        if mirror_path is None and os.getenv("GOOGLE_CALENDAR_MIRROR", "false").lower() == "true":
+            mirror_path = os.getenv("GOOGLE_CALENDAR_MIRROR_DB") or os.path.join(os.path.dirname(__file__), '..', 'calendar_mirror.db')
+        self.mirror_path = mirror_path
+        self.mirror_max_age = float(os.getenv("GOOGLE_CALENDAR_MIRROR_MAX_AGE", "60"))
 
-    def _get_credentials(self):
+    def _load_credentials(self):
         creds = None
-        token_path = os.path.join(os.path.dirname(__file__), '..', 'token.pickle')
-        credentials_path = os.path.join(os.path.dirname(__file__), '..', 'credentials.json')
-        
-        if os.path.exists(token_path):
-            with open(token_path, 'rb') as token:
+        if os.path.exists(self.token_path):
+            with open(self.token_path, 'rb') as token:
                 creds = pickle.load(token)
-                
+
         if not creds or not creds.valid:
             if creds and creds.expired and creds.refresh_token:
-                creds.refresh(Request())
+                creds.refresh(self._refresh_request)
             else:
-                if not os.path.exists(credentials_path):
+                if not os.path.exists(self.credentials_path):
                     raise Exception("credentials.json file not found. Please set up Google Calendar API credentials first.")
-                
+
                 flow = InstalledAppFlow.from_client_secrets_file(
-                    credentials_path, self.scopes)
+                    self.credentials_path, self.scopes)
                 creds = flow.run_local_server(port=0)
-                
-            with open(token_path, 'wb') as token:
-                pickle.dump(creds, token)
+
+            self._save_credentials(creds)
 
         return creds
 
+    def _save_credentials(self, creds):
+        with open(self.token_path, 'wb') as token:
+            pickle.dump(creds, token)
+
+    def _expires_soon(self, creds):
+        if not creds.valid:
+            return True
+        # Credentials.expiry is a naive UTC datetime
+        now = datetime.now(pytz.UTC).replace(tzinfo=None)
+        return creds.expiry is not None and creds.expiry - now < TOKEN_REFRESH_MARGIN
+
+    def _get_credentials(self):
+        """Credentials kept in memory, loaded from token.pickle once and refreshed ahead of expiry"""
+        cls = GoogleCalendarService
+        with cls._credentials_lock:
+            if cls._credentials is None:
+                cls._credentials = self._load_credentials()
+            elif cls._credentials.refresh_token and self._expires_soon(cls._credentials):
+                cls._credentials.refresh(self._refresh_request)
+                self._save_credentials(cls._credentials)
+            return cls._credentials
+
+    def _get_service(self):
+        """
+        The calendar service for the current thread, built once from the cached discovery
+        document over a persistent httplib2 connection (kept alive between calls)
+        """
+        creds = self._get_credentials()
+        local = self._thread_local
+        if getattr(local, 'credentials', None) is not creds or local.api_endpoint != self.api_endpoint:
+            http = AuthorizedHttp(creds, http=httplib2.Http(timeout=30))
+            client_options = {"api_endpoint": self.api_endpoint} if self.api_endpoint else None
+            local.service = build_from_document(_get_discovery_document(), http=http, client_options=client_options)
+            # Every service.events() call builds a new resource with all its methods and docstrings
+            local.events = local.service.events()
+            local.freebusy = local.service.freebusy()
+            local.credentials = creds
+            local.api_endpoint = self.api_endpoint
+        return local.service
+
+    def _get_events(self):
+        """The events resource of the current thread's service"""
+        self._get_service()
+        return self._thread_local.events
+
+    def _get_freebusy(self):
+        self._get_service()
+        return self._thread_local.freebusy
+
+    def _get_mirror(self, calendar_id='primary'):
+        """The process-wide mirror of a calendar, created (and loaded from disk) on first use"""
+        key = (self.mirror_path, calendar_id)
+        with self._mirrors_lock:
+            if key not in self._mirrors:
+                self._mirrors[key] = CalendarMirror(
+                    lambda **params: self._get_events().list(calendarId=calendar_id, **params).execute(),
+                    self.mirror_path,
+                    calendar_id=calendar_id,
+                    timezone=self.timezone,
+                    max_age=self.mirror_max_age
+                )
+            return self._mirrors[key]
+
     def _format_datetime_for_google(self, dt_str, timezone_str):
         """Convert datetime string to RFC3339 format with Z timezone indicator"""
         try:
@@ -56,64 +183,84 @@ class GoogleCalendarService:
         # Format in RFC3339 format
         return utc_dt.strftime('%Y-%m-%dT%H:%M:%SZ')
 
+    def _build_event(self, summary, start_time, end_time, description="", timezone=None, attendees=None, add_conference=False, recurrence=None):
+        """Request body for events().insert"""
+        # Validate timezone
+        pytz.timezone(timezone)
+
+        # Format times in RFC3339
+        start_time = self._format_datetime_for_google(start_time, timezone)
+        end_time = self._format_datetime_for_google(end_time, timezone)
+
+        event = {
+            'summary': summary,
+            'description': description,
+            'start': {
+                'dateTime': start_time,
+                'timeZone': timezone,
+            },
+            'end': {
+                'dateTime': end_time,
+                'timeZone': timezone,
+            },
+        }
+
+        # Add attendees if provided
+        if attendees:
+            event['attendees'] = [{'email': email} for email in attendees]
+
+        # Add conference data if requested
+        if add_conference:
+            event['conferenceData'] = {
+                'createRequest': {
+                    'requestId': f"{summary}-{start_time}",
+                    'conferenceSolutionKey': {'type': 'hangoutsMeet'}
+                }
+            }
+
+        # Add recurrence if provided
+        if recurrence:
+            event['recurrence'] = recurrence
+
+        return event
+
+    def _record_created(self, events):
+        """Keep the mirror (if enabled) in step with events this process created"""
+        if not self.mirror_path or not events:
+            return
+        mirror = self._get_mirror()
+        for event in events:
+            # Recurring events are only expanded into instances by a sync
+            if event.get('recurrence'):
+                mirror.invalidate()
+            else:
+                mirror.upsert(event)
+
+    def _created_result(self, event, timezone, add_conference):
+        return {
+            "success": True,
+            "message": f"Event created successfully in {timezone}. Event ID: {event.get('id')}",
+            "event_link": event.get('htmlLink'),
+            "conference_link": event.get('conferenceData', {}).get('entryPoints', [{}])[0].get('uri') if add_conference else None
+        }
+
     def create_event(self, summary, start_time, end_time, description="", timezone=None, attendees=None, add_conference=False, recurrence=None, send_updates='none'):
         """Creates a calendar event"""
         timezone = timezone or self.timezone
         try:
-            # Validate timezone
-            pytz.timezone(timezone)
-            
-            # Format times in RFC3339
-            start_time = self._format_datetime_for_google(start_time, timezone)
-            end_time = self._format_datetime_for_google(end_time, timezone)
-            
-            creds = self._get_credentials()
-            service = build('calendar', 'v3', credentials=creds)
-
-            event = {
-                'summary': summary,
-                'description': description,
-                'start': {
-                    'dateTime': start_time,
-                    'timeZone': timezone,
-                },
-                'end': {
-                    'dateTime': end_time,
-                    'timeZone': timezone,
-                },
-            }
-
-            # Add attendees if provided
-            if attendees:
-                event['attendees'] = [{'email': email} for email in attendees]
-
-            # Add conference data if requested
-            if add_conference:
-                event['conferenceData'] = {
-                    'createRequest': {
-                        'requestId': f"{summary}-{start_time}",
-                        'conferenceSolutionKey': {'type': 'hangoutsMeet'}
-                    }
-                }
-
-            # Add recurrence if provided
-            if recurrence:
-                event['recurrence'] = recurrence
+            event = self._build_event(summary, start_time, end_time, description, timezone, attendees, add_conference, recurrence)
 
             # Create event with additional parameters
-            event = service.events().insert(
+            event = self._get_events().insert(
                 calendarId='primary',
                 body=event,
                 conferenceDataVersion=1 if add_conference else 0,
                 sendUpdates=send_updates
             ).execute()
 
-            return {
-                "success": True,
-                "message": f"Event created successfully in {timezone}. Event ID: {event.get('id')}",
-                "event_link": event.get('htmlLink'),
-                "conference_link": event.get('conferenceData', {}).get('entryPoints', [{}])[0].get('uri') if add_conference else None
-            }
+            self._record_created([event])
+
+            return self._created_result(event, timezone, add_conference)
             
         except Exception as e:
             return {
@@ -121,8 +268,149 @@ class GoogleCalendarService:
                 "message": f"Failed to create event: {str(e)}"
             }
 
-    def list_events(self, max_results=10, time_min=None, time_max=None, timezone=None):
-        """Lists upcoming calendar events"""
+    def _batch_uri(self):
+        """
+        Batch endpoint matching the API endpoint. googleapiclient always derives it from
+        the discovery document's rootUrl, which would bypass an endpoint override.
+        """
+        document = _get_discovery_document()
+        if not self.api_endpoint:
+            return document['rootUrl'] + document['batchPath']
+        root = self.api_endpoint.rstrip('/') + '/'
+        if root.endswith(document['servicePath']):
+            root = root[:-len(document['servicePath'])]
+        return root + document['batchPath']
+
+    def _execute_batch(self, requests_by_index):
+        """
+        Run {index: HttpRequest} as batch HTTP requests of at most BATCH_LIMIT calls.
+        Returns {index: (response, exception)}; items rejected by a rate limit are resent
+        in a later batch, up to BATCH_MAX_RETRIES times with backoff. A batch request that
+        fails as a whole fails only its own items: outcomes of other batches are kept.
+        """
+        outcomes = {}
+        pending = dict(requests_by_index)
+        for attempt in range(BATCH_MAX_RETRIES + 1):
+            retry = {}
+            indexes = list(pending)
+            for chunk_start in range(0, len(indexes), BATCH_LIMIT):
+                chunk = indexes[chunk_start:chunk_start + BATCH_LIMIT]
+                answered = set()
+
+                def callback(request_id, response, exception):
+                    index = int(request_id)
+                    answered.add(index)
+                    if exception is not None and _is_rate_limited(exception) and attempt < BATCH_MAX_RETRIES:
+                        retry[index] = pending[index]
+                    outcomes[index] = (response, exception)
+
+                batch = BatchHttpRequest(callback=callback, batch_uri=self._batch_uri())
+                for index in chunk:
+                    batch.add(pending[index], request_id=str(index))
+                try:
+                    batch.execute()
+                except Exception as e:
+                    for index in chunk:
+                        if index not in answered:
+                            outcomes[index] = (None, e)
+            if not retry:
+                break
+            time.sleep(0.5 * 2 ** attempt)
+            pending = retry
+        return outcomes
+
+    def create_events(self, events, timezone=None, send_updates='none'):
+        """
+        Creates many calendar events with batched requests.
+        events: dicts with the create_event arguments (summary, start_time, end_time, ...)
+        Results are returned per event, in the same order.
+        """
+        timezone = timezone or self.timezone
+        results = [None] * len(events)
+        try:
+            events_resource = self._get_events()
+            requests_by_index = {}
+            for index, item in enumerate(events):
+                item_timezone = item.get('timezone') or timezone
+                try:
+                    body = self._build_event(
+                        item.get('summary'), item.get('start_time'), item.get('end_time'),
+                        item.get('description', ''), item_timezone, item.get('attendees'),
+                        item.get('add_conference', False), item.get('recurrence')
+                    )
+                except Exception as e:
+                    results[index] = {"success": False, "message": f"Failed to create event: {str(e)}"}
+                    continue
+                requests_by_index[index] = events_resource.insert(
+                    calendarId='primary',
+                    body=body,
+                    conferenceDataVersion=1 if item.get('add_conference') else 0,
+                    sendUpdates=send_updates
+                )
+
+            created = []
+            for index, (event, exception) in self._execute_batch(requests_by_index).items():
+                if exception is not None:
+                    results[index] = {"success": False, "message": f"Failed to create event: {str(exception)}"}
+                    continue
+                created.append(event)
+                results[index] = self._created_result(
+                    event, events[index].get('timezone') or timezone, events[index].get('add_conference', False)
+                )
+            self._record_created(created)
+
+            succeeded = sum(1 for result in results if result["success"])
+            return {
+                "success": succeeded == len(events),
+                "message": f"Created {succeeded} of {len(events)} events",
+                "results": results
+            }
+
+        except Exception as e:
+            return {
+                "success": False,
+                "message": f"Failed to create events: {str(e)}",
+                "results": [result or {"success": False, "message": "Not attempted"} for result in results]
+            }
+
+    def iter_events(self, time_min, time_max, page_size=250, prefetch=True, calendar_id='primary'):
+        """
+        Yields the events overlapping [time_min, time_max) (RFC3339) in start order, fetching
+        pages lazily by following nextPageToken. With prefetch, the next page is requested in
+        the background while the current one is being consumed.
+        """
+        if self.mirror_path and calendar_id == 'primary':
+            yield from self._get_mirror().list_events(time_min, time_max)
+            return
+
+        def fetch(page_token):
+            params = dict(calendarId=calendar_id, timeMin=time_min, timeMax=time_max,
+                          maxResults=page_size, singleEvents=True, orderBy='startTime')
+            if page_token:
+                params['pageToken'] = page_token
+            return self._get_events().list(**params).execute()
+
+        page = fetch(None)
+        while True:
+            page_token = page.get('nextPageToken')
+            upcoming = self._prefetch_pool.submit(fetch, page_token) if page_token and prefetch else None
+            try:
+                yield from page.get('items', [])
+            except GeneratorExit:
+                # The consumer has what it needs
+                if upcoming is not None:
+                    upcoming.cancel()
+                raise
+            if not page_token:
+                return
+            page = upcoming.result() if upcoming is not None else fetch(page_token)
+
+    def list_events(self, max_results=10, time_min=None, time_max=None, timezone=None, query=None, mode='list'):
+        """
+        Lists calendar events. mode 'list' returns the first max_results events (matching
+        query, if given), 'count' only their number and 'summary' aggregates over all of them.
+        Pages are streamed through the reducer, never held in memory all at once.
+        """
         timezone = timezone or self.timezone
         try:
             # Validate timezone
@@ -139,48 +427,135 @@ class GoogleCalendarService:
             time_min_str = self._format_datetime_for_google(time_min.isoformat() if isinstance(time_min, datetime) else time_min, timezone)
             time_max_str = self._format_datetime_for_google(time_max.isoformat() if isinstance(time_max, datetime) else time_max, timezone)
 
-            creds = self._get_credentials()
-            service = build('calendar', 'v3', credentials=creds)
+            # A plain listing fits in one page (plus one event to know whether there are more),
+            # so fetching the next page in the background would only be thrown away
+            single_page = mode == 'list' and not query
+            page_size = max_results + 1 if single_page else PAGE_SIZE
+            events = self.iter_events(time_min_str, time_max_str, page_size=page_size, prefetch=not single_page)
 
-            events_result = service.events().list(
-                calendarId='primary',
-                timeMin=time_min_str,
-                timeMax=time_max_str,
-                maxResults=max_results,
-                singleEvents=True,
-                orderBy='startTime'
-            ).execute()
-            
-            events = events_result.get('items', [])
+            if mode == 'count':
+                count = event_reducers.count_matches(events, query)
+                return {
+                    "success": True,
+                    "message": f"Found {count} events",
+                    "count": count
+                }
+
+            if mode == 'summary':
+                summary = event_reducers.summarize(events, timezone, query)
+                return {
+                    "success": True,
+                    "message": f"Summarized {summary['count']} events",
+                    "summary": summary
+                }
+
+            formatted_events, has_more = event_reducers.first_matches(events, max_results, query)
+            events.close()
             
-            if not events:
+            if not formatted_events:
                 return {
                     "success": True,
                     "message": "No upcoming events found.",
                     "events": []
                 }
 
-            formatted_events = []
-            for event in events:
-                start = event['start'].get('dateTime', event['start'].get('date'))
-                end = event['end'].get('dateTime', event['end'].get('date'))
-                formatted_events.append({
-                    "id": event['id'],
-                    "summary": event.get('summary', 'No title'),
-                    "description": event.get('description', ''),
-                    "start": start,
-                    "end": end,
-                    "link": event.get('htmlLink')
-                })
-
             return {
                 "success": True,
-                "message": f"Found {len(formatted_events)} events",
-                "events": formatted_events
+                "message": f"Found {len(formatted_events)} events" + (" (more events exist in this range)" if has_more else ""),
+                "events": formatted_events,
+                "has_more": has_more
             }
             
         except Exception as e:
             return {
                 "success": False,
                 "message": f"Failed to list events: {str(e)}"
-            } 
\ No newline at end of file
+            } 
+
+    def _busy_intervals(self, calendars, time_min_str, time_max_str):
+        """
+        Busy times of all calendars, merged into one interval set, from a single freebusy
+        query (or from the mirror when only the primary calendar is asked for).
+        Returns (interval set, {calendar: error reason} for calendars that could not be read)
+        """
+        if self.mirror_path and calendars == ['primary']:
+            mirror = self._get_mirror()
+            mirror.ensure_fresh()
+            return intervals.merge(*mirror.busy_intervals(
+                datetime.fromisoformat(time_min_str.replace('Z', '+00:00')).timestamp(),
+                datetime.fromisoformat(time_max_str.replace('Z', '+00:00')).timestamp()
+            )), {}
+
+        response = self._get_freebusy().query(body={
+            "timeMin": time_min_str,
+            "timeMax": time_max_str,
+            "items": [{"id": calendar_id} for calendar_id in calendars]
+        }).execute()
+        starts, ends, errors = [], [], {}
+        for calendar_id in calendars:
+            calendar = response.get('calendars', {}).get(calendar_id, {})
+            if calendar.get('errors'):
+                errors[calendar_id] = calendar['errors'][0].get('reason', 'unknown')
+            for busy in calendar.get('busy', []):
+                starts.append(datetime.fromisoformat(busy['start'].replace('Z', '+00:00')).timestamp())
+                ends.append(datetime.fromisoformat(busy['end'].replace('Z', '+00:00')).timestamp())
+        return intervals.merge(starts, ends), errors
+
+    def find_free_slots(self, duration_minutes=60, time_min=None, time_max=None, timezone=None, calendars=None,
+                        working_hours=("09:00", "18:00"), working_days=(0, 1, 2, 3, 4), calendar_timezones=None,
+                        max_slots=10):
+        """
+        Free windows of at least duration_minutes that fall inside working hours for every
+        calendar (each calendar's hours in its own timezone, from calendar_timezones) and are
+        free in all of them. Returns at most max_slots windows, earliest first.
+        """
+        timezone = timezone or self.timezone
+        calendars = calendars or ['primary']
+        calendar_timezones = calendar_timezones or {}
+        try:
+            tz = pytz.timezone(timezone)
+
+            now = datetime.now(tz)
+            if time_min is None:
+                time_min = now
+            if time_max is None:
+                time_max = now + timedelta(days=7)
+            time_min_str = self._format_datetime_for_google(time_min.isoformat() if isinstance(time_min, datetime) else time_min, timezone)
+            time_max_str = self._format_datetime_for_google(time_max.isoformat() if isinstance(time_max, datetime) else time_max, timezone)
+            lower = datetime.fromisoformat(time_min_str.replace('Z', '+00:00')).timestamp()
+            upper = datetime.fromisoformat(time_max_str.replace('Z', '+00:00')).timestamp()
+
+            busy, errors = self._busy_intervals(calendars, time_min_str, time_max_str)
+
+            # Everyone's working hours, each in their own timezone
+            windows = (np.array([lower]), np.array([upper]))
+            for window_timezone in {calendar_timezones.get(calendar_id, timezone) for calendar_id in calendars}:
+                windows = intervals.intersect(windows, intervals.daily_windows(
+                    lower, upper, window_timezone, working_hours[0], working_hours[1], set(working_days)
+                ))
+
+            starts, ends = intervals.intersect(intervals.complement(*busy, lower, upper), windows)
+            long_enough = ends - starts >= duration_minutes * 60
+            starts, ends = starts[long_enough], ends[long_enough]
+
+            slots = [{
+                "start": datetime.fromtimestamp(start, tz).isoformat(),
+                "end": datetime.fromtimestamp(end, tz).isoformat(),
+                "minutes": int((end - start) // 60)
+            } for start, end in zip(starts[:max_slots], ends[:max_slots])]
+
+            result = {
+                "success": True,
+                "message": f"Found {len(starts)} free windows of at least {duration_minutes} minutes" +
+                           (f", showing the first {len(slots)}" if len(starts) > len(slots) else ""),
+                "slots": slots
+            }
+            if errors:
+                result["unavailable_calendars"] = errors
+            return result
+
+        except Exception as e:
+            return {
+                "success": False,
+                "message": f"Failed to find free slots: {str(e)}"
+            }
@@ -0,0 +1,76 @@
+"""
+Vectorized arithmetic on sets of half-open time intervals [start, end).
+
+An interval set is a pair of float64 arrays (starts, ends) in epoch seconds.
+merge() turns any set into a sorted, disjoint one; the other functions expect
+and return sorted, disjoint sets.
+"""
+from datetime import datetime, timedelta
+import numpy as np
+import pytz
+
+def empty():
+    return np.empty(0), np.empty(0)
+
+def merge(starts, ends):
+    """Sort and coalesce overlapping or touching intervals"""
+    starts = np.asarray(starts, dtype=np.float64)
+    ends = np.asarray(ends, dtype=np.float64)
+    keep = ends > starts
+    starts, ends = starts[keep], ends[keep]
+    if not len(starts):
+        return empty()
+    order = np.argsort(starts, kind='stable')
+    starts, ends = starts[order], ends[order]
+    reach = np.maximum.accumulate(ends)
+    # A new group starts wherever an interval begins after everything before it has ended
+    first = np.flatnonzero(np.concatenate(([True], starts[1:] > reach[:-1])))
+    return starts[first], np.maximum.reduceat(ends, first)
+
+def complement(starts, ends, lower, upper):
+    """The gaps of a set within [lower, upper)"""
+    inside = (ends > lower) & (starts < upper)
+    starts, ends = starts[inside], ends[inside]
+    gap_starts = np.concatenate(([lower], ends))
+    gap_ends = np.concatenate((starts, [upper]))
+    keep = gap_ends > gap_starts
+    return gap_starts[keep], gap_ends[keep]
+
+def intersect(a, b):
+    """Intersection of two sets; every overlapping pair is found with two binary searches"""
+    a_starts, a_ends = a
+    b_starts, b_ends = b
+    if not len(a_starts) or not len(b_starts):
+        return empty()
+    # For each interval of a, the run of b intervals it overlaps: [first, last)
+    first = np.searchsorted(b_ends, a_starts, side='right')
+    last = np.searchsorted(b_starts, a_ends, side='left')
+    counts = np.maximum(last - first, 0)
+    a_index = np.repeat(np.arange(len(a_starts)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    b_index = np.repeat(first, counts) + offsets
+    starts = np.maximum(a_starts[a_index], b_starts[b_index])
+    ends = np.minimum(a_ends[a_index], b_ends[b_index])
+    keep = ends > starts
+    return starts[keep], ends[keep]
+
+def daily_windows(lower, upper, timezone, day_start, day_end, weekdays):
+    """
+    Local working hours (day_start-day_end, "HH:MM") on the given weekdays (0 = Monday)
+    between two epoch times, as an interval set. Each day is localized on its own, so
+    windows stay at the same wall-clock time across DST changes.
+    """
+    tz = pytz.timezone(timezone)
+    start_time = datetime.strptime(day_start, "%H:%M").time()
+    end_time = datetime.strptime(day_end, "%H:%M").time()
+    day = datetime.fromtimestamp(lower, tz).date() - timedelta(days=1)
+    last_day = datetime.fromtimestamp(upper, tz).date()
+    starts, ends = [], []
+    while day <= last_day:
+        if day.weekday() in weekdays:
+            # Hours like 22:00-06:00 run past midnight
+            end_day = day + timedelta(days=1) if end_time <= start_time else day
+            starts.append(tz.localize(datetime.combine(day, start_time)).timestamp())
+            ends.append(tz.localize(datetime.combine(end_day, end_time)).timestamp())
+        day += timedelta(days=1)
+    return intersect(merge(starts, ends), (np.array([lower], dtype=np.float64), np.array([upper], dtype=np.float64)))
@@ -0,0 +1,181 @@
+"""
+Append-only journal of the terminal conversation, so it survives a restart.
+
+Each message is appended as one record when it is added to the context:
+
+    [length:u32][crc32:u32][JSON payload][length:u32]
+
+Appending costs the size of the message, not of the conversation. The
+trailing length lets a resume walk the file backwards from its end through
+a memory map, decoding only the most recent messages that fit the token
+budget, so resuming takes the same time however long the session has grown.
+A record cut short by a crash fails its length or checksum check and is
+dropped. Compaction rewrites the journal with only the messages a resume
+would keep.
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import List, Optional
+
+_HEADER = struct.Struct("<II")
+_FOOTER = struct.Struct("<I")
+_OVERHEAD = _HEADER.size + _FOOTER.size
+
+def estimate_tokens(payload: bytes) -> int:
+    """Rough token count (~4 characters per token plus per-message overhead)"""
+    return len(payload) // 4 + 4
+
+def _encode(message: dict) -> bytes:
+    payload = json.dumps(message, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return _HEADER.pack(len(payload), zlib.crc32(payload)) + payload + _FOOTER.pack(len(payload))
+
+def _record_start(data, end: int) -> Optional[int]:
+    """Start of the record ending at `end`, or None if there is no intact record there"""
+    if end < _OVERHEAD:
+        return None
+    (length,) = _FOOTER.unpack_from(data, end - _FOOTER.size)
+    start = end - _OVERHEAD - length
+    if start < 0:
+        return None
+    header_length, crc = _HEADER.unpack_from(data, start)
+    if header_length != length or zlib.crc32(data[start + _HEADER.size:end - _FOOTER.size]) != crc:
+        return None
+    return start
+
+def _valid_end(data, size: int) -> int:
+    """End of the last intact record; only the bytes of a torn last record are scanned"""
+    end = size
+    while end > 0 and _record_start(data, end) is None:
+        end -= 1
+    return end
+
+def _starts_turn(message: dict) -> bool:
+    # A tool message or a reply cannot come first: the API needs what they answer
+    return message.get("role") == "user"
+
+def _complete_turns(entries: list) -> list:
+    """
+    (message, tokens) entries without the turns that were cut short before every tool call got
+    its reply, e.g. by a crash or Ctrl+C while a function ran; the API rejects such a history
+    """
+    starts = [index for index, (message, _) in enumerate(entries) if _starts_turn(message)]
+    complete = []
+    for start, end in zip(starts, starts[1:] + [len(entries)]):
+        turn = entries[start:end]
+        calls = {call["id"] for message, _ in turn for call in message.get("tool_calls") or []}
+        replies = {message.get("tool_call_id") for message, _ in turn if message.get("role") == "tool"}
+        if calls <= replies:
+            complete.extend(turn)
+    return complete
+
+class SessionJournal:
+    def __init__(self, path: str):
+        self.path = path
+        self.appended = 0
+        self.resumed = 0
+        self.resumed_tokens = 0
+        self.resume_seconds = 0.0
+        self._lock = threading.Lock()
+        self._repair()
+        self._file = open(path, "ab")
+
+    def _repair(self) -> None:
+        """Cut a record left incomplete by a crash, so new records follow intact ones"""
+        if not os.path.exists(self.path) or not os.path.getsize(self.path):
+            return
+        with open(self.path, "r+b") as file:
+            size = os.fstat(file.fileno()).st_size
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                end = _valid_end(data, size)
+            if end != size:
+                file.truncate(end)
+
+    def append(self, message: dict) -> None:
+        record = _encode(message)
+        with self._lock:
+            self._file.write(record)
+            # Hand it to the OS right away: a crash of this process does not lose it
+            self._file.flush()
+            self.appended += 1
+
+    def tail(self, token_budget: int) -> List[dict]:
+        """The most recent complete turns that fit in token_budget, starting with a user message"""
+        started = time.perf_counter()
+        payloads = []
+        tokens = 0
+        with self._lock:
+            self._file.flush()
+            size = os.path.getsize(self.path)
+            if size:
+                with open(self.path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    end = size
+                    while end > 0:
+                        start = _record_start(data, end)
+                        if start is None:
+                            break
+                        payload = data[start + _HEADER.size:end - _FOOTER.size]
+                        if tokens + estimate_tokens(payload) > token_budget:
+                            break
+                        payloads.append(payload)
+                        tokens += estimate_tokens(payload)
+                        end = start
+        entries = [(json.loads(payload), estimate_tokens(payload)) for payload in reversed(payloads)]
+        while entries and not _starts_turn(entries[0][0]):
+            entries.pop(0)
+        entries = _complete_turns(entries)
+        messages = [message for message, _ in entries]
+        self.resumed = len(messages)
+        self.resumed_tokens = sum(tokens for _, tokens in entries)
+        self.resume_seconds = time.perf_counter() - started
+        return messages
+
+    def compact(self, token_budget: int) -> List[dict]:
+        """Rewrite the journal with only the messages that fit in token_budget; returns them"""
+        messages = self.tail(token_budget)
+        temporary = self.path + ".compact"
+        with open(temporary, "wb") as file:
+            for message in messages:
+                file.write(_encode(message))
+            file.flush()
+            os.fsync(file.fileno())
+        with self._lock:
+            self._file.close()
+            os.replace(temporary, self.path)
+            self._file = open(self.path, "ab")
+        return messages
+
+    def reset(self) -> None:
+        """Start an empty journal"""
+        with self._lock:
+            self._file.close()
+            self._file = open(self.path, "wb")
+
+    def size(self) -> int:
+        with self._lock:
+            self._file.flush()
+            return os.path.getsize(self.path)
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+    def format_stats(self) -> str:
+        return (
+            f"Session journal ({self.path}): {self.size() / 1024:.1f} KB, {self.appended} messages added this run; "
+            f"resumed {self.resumed} messages (~{self.resumed_tokens} tokens) in {self.resume_seconds * 1000:.1f}ms"
+        )
+
+class JournaledContext(list):
+    """The conversation sent to the model; every appended message is also written to the journal"""
+    def __init__(self, journal: SessionJournal, messages: List[dict] = ()):
+        super().__init__(messages)
+        self.journal = journal
+
+    def append(self, message: dict) -> None:
+        self.journal.append(message)
+        super().append(message)
@@ -0,0 +1,124 @@
+from contextlib import contextmanager
+from typing import Callable
+import smtplib
+import threading
+import time
+
+# Errors that mean the session is gone and a new connection may succeed
+DISCONNECTED_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+def is_disconnect(error: Exception) -> bool:
+    # 421 is the server closing the session (e.g. after an idle timeout); smtplib reports it
+    # as a refusal of whatever command was sent next
+    return isinstance(error, DISCONNECTED_ERRORS) or (
+        isinstance(error, smtplib.SMTPResponseException) and error.smtp_code == 421
+    )
+
+class SMTPPool:
+    """
+    A small pool of connected, authenticated SMTP sessions.
+
+    Checkout is thread-safe and at most `size` sessions exist at once. Sessions
+    idle for longer than idle_timeout are closed instead of reused; sessions
+    idle for longer than check_after are probed with NOOP first. A session that
+    turns out to be dead is replaced with a new connection transparently.
+    """
+    def __init__(self, connect: Callable[[], smtplib.SMTP], size: int = 2,
+                 idle_timeout: float = 60.0, check_after: float = 5.0):
+        """connect: opens a new session, ready to send (STARTTLS and login done)"""
+        self._connect = connect
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.check_after = check_after
+        self._idle: list[tuple[smtplib.SMTP, float]] = []
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+        self.reuses = 0
+        self.reconnects = 0
+
+    def _open(self) -> smtplib.SMTP:
+        session = self._connect()
+        with self._lock:
+            self.connections_opened += 1
+        return session
+
+    @staticmethod
+    def _discard(session: smtplib.SMTP) -> None:
+        try:
+            session.quit()
+        except Exception:
+            session.close()
+
+    def _alive(self, session: smtplib.SMTP) -> bool:
+        try:
+            return session.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _take(self) -> smtplib.SMTP:
+        """The most recently used idle session that is still usable, or a new one"""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                session, idle_since = self._idle.pop()
+            idle_for = time.monotonic() - idle_since
+            if idle_for > self.idle_timeout:
+                self._discard(session)
+                continue
+            if idle_for > self.check_after and not self._alive(session):
+                session.close()
+                with self._lock:
+                    self.reconnects += 1
+                continue
+            with self._lock:
+                self.reuses += 1
+            return session
+        return self._open()
+
+    @contextmanager
+    def session(self):
+        """Check out a session; it goes back to the pool unless it disconnected while in use"""
+        self._slots.acquire()
+        try:
+            session = self._take()
+            try:
+                yield session
+            except Exception as e:
+                # Other SMTP errors (e.g. a refused recipient) leave the session usable
+                if is_disconnect(e):
+                    session.close()
+                else:
+                    self._release(session)
+                raise
+            self._release(session)
+        finally:
+            self._slots.release()
+
+    def _release(self, session: smtplib.SMTP) -> None:
+        with self._lock:
+            self._idle.append((session, time.monotonic()))
+
+    def send_message(self, message) -> None:
+        """Send on a pooled session, retrying once on a fresh connection if the session had died"""
+        try:
+            with self.session() as session:
+                session.send_message(message)
+        except Exception as e:
+            if not is_disconnect(e):
+                raise
+            with self._lock:
+                self.reconnects += 1
+            with self.session() as session:
+                session.send_message(message)
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for session, _ in idle:
+            self._discard(session)
+
+    def format_stats(self) -> str:
+        return (f"SMTP pool: {self.connections_opened} connections opened, {self.reuses} reuses, "
+                f"{self.reconnects} reconnects, {len(self._idle)} idle (max {self.size})")
@@ -0,0 +1,152 @@
+"""
+Full tool results kept locally, compact projections in the conversation.
+
+Everything in context_window is sent again on every later request, so a
+100-event listing or a verbose order response costs its full size on each
+turn. Instead, the context gets a projection of the result: the fields the
+function declares (result_fields), long texts truncated and long lists cut,
+with their total length. The full result stays in this store under a
+result_id, and the model can fetch it (or part of it) with read_tool_result.
+Once persisted (next to the session journal), full results are also written
+to SQLite, so the result_ids in a resumed conversation can still be read.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Iterable, Optional
+
+TEXT_LIMIT = int(os.getenv("TOOL_RESULT_TEXT_LIMIT", "200"))
+LIST_LIMIT = int(os.getenv("TOOL_RESULT_LIST_LIMIT", "25"))
+
+def project(value, fields: dict = None, text_limit: int = TEXT_LIMIT, list_limit: int = LIST_LIMIT):
+    """
+    Compact copy of a tool result.
+    fields: {list key: item fields to keep}, e.g. {"events": ("summary", "start", "end")}
+    Lists longer than list_limit are cut, and their length is added as <key>_total.
+    """
+    fields = fields or {}
+
+    def compact(value, key=None):
+        if isinstance(value, str):
+            return value if len(value) <= text_limit else value[:text_limit] + "…"
+        if isinstance(value, list):
+            keep = fields.get(key)
+            return [
+                compact({name: item[name] for name in keep if name in item} if keep and isinstance(item, dict) else item)
+                for item in value[:list_limit]
+            ]
+        if isinstance(value, dict):
+            projected = {}
+            for name, item in value.items():
+                projected[name] = compact(item, name)
+                if isinstance(item, list) and len(item) > list_limit:
+                    projected[f"{name}_total"] = len(item)
+            return projected
+        return value
+
+    return compact(value)
+
+def referenced_ids(messages: Iterable[dict]) -> set:
+    """result_ids of the compact tool results among messages"""
+    ids = set()
+    for message in messages:
+        content = message.get("content")
+        if message.get("role") != "tool" or not isinstance(content, str) or not content.startswith('{"result_id"'):
+            continue
+        try:
+            ids.add(json.loads(content)["result_id"])
+        except (ValueError, KeyError):
+            pass
+    return ids
+
+class ToolResultStore:
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(ToolResultStore, cls).__new__(cls)
+            cls._instance._initialize()
+        return cls._instance
+
+    def _initialize(self):
+        self._results = {}
+        self._db = None
+        self._lock = threading.Lock()
+        self.full_bytes = 0
+        self.context_bytes = 0
+        # Bytes that later requests did not have to send again
+        self.resent_bytes_saved = 0
+        self.requests = 0
+
+    def persist(self, db_path: str) -> None:
+        """Also keep full results in a SQLite database, where a later run can read them"""
+        with self._lock:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.executescript("""
+                PRAGMA journal_mode = WAL;
+                CREATE TABLE IF NOT EXISTS tool_results (
+                    result_id TEXT PRIMARY KEY, result TEXT NOT NULL, created_at REAL NOT NULL
+                );
+            """)
+
+    def add(self, result, compact: Callable[[dict], dict]) -> str:
+        """Store a tool result; returns the message content for the context (the projection if it is smaller)"""
+        full = json.dumps(result)
+        projected = compact(result) if isinstance(result, dict) else result
+        with self._lock:
+            content = full
+            if projected != result:
+                # Unique across runs: a resumed conversation can still mention earlier IDs
+                result_id = f"result_{uuid.uuid4().hex[:8]}"
+                candidate = json.dumps({"result_id": result_id, **projected})
+                if len(candidate) < len(full):
+                    self._results[result_id] = result
+                    content = candidate
+                    if self._db is not None:
+                        with self._db:
+                            self._db.execute("INSERT INTO tool_results VALUES (?, ?, ?)", (result_id, full, time.time()))
+            self.full_bytes += len(full)
+            self.context_bytes += len(content)
+        return content
+
+    def get(self, result_id: str) -> Optional[dict]:
+        with self._lock:
+            if result_id in self._results or self._db is None:
+                return self._results.get(result_id)
+            row = self._db.execute("SELECT result FROM tool_results WHERE result_id = ?", (result_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def prune(self, messages: Iterable[dict]) -> int:
+        """Drop the results that messages (the conversation that is kept) no longer refer to; returns how many"""
+        keep = referenced_ids(messages)
+        with self._lock:
+            dropped = [result_id for result_id in self._results if result_id not in keep]
+            for result_id in dropped:
+                del self._results[result_id]
+            if self._db is None:
+                return len(dropped)
+            stored = [row[0] for row in self._db.execute("SELECT result_id FROM tool_results")]
+            gone = [(result_id,) for result_id in stored if result_id not in keep]
+            with self._db:
+                self._db.executemany("DELETE FROM tool_results WHERE result_id = ?", gone)
+            return len(set(dropped) | {result_id for (result_id,) in gone})
+
+    def count_request(self) -> None:
+        """Call before each model request: it carries every stored projection instead of the full result"""
+        with self._lock:
+            self.requests += 1
+            self.resent_bytes_saved += self.full_bytes - self.context_bytes
+
+    def format_stats(self) -> str:
+        with self._lock:
+            if not self.full_bytes:
+                return "Tool results: none yet."
+            saved = self.full_bytes - self.context_bytes
+            return (
+                f"Tool results: {len(self._results)} kept locally, {self.full_bytes / 1024:.1f} KB in full vs "
+                f"{self.context_bytes / 1024:.1f} KB in the context ({saved / self.full_bytes:.0%} saved), "
+                f"{self.resent_bytes_saved / 1024:.1f} KB less sent over {self.requests} requests"
+            )
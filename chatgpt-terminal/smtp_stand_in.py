@@ -0,0 +1,186 @@
+"""
+Local stand-in for an SMTP submission server.
+
+Speaks enough ESMTP for smtplib (EHLO, AUTH PLAIN/LOGIN, MAIL, RCPT, DATA,
+NOOP, RSET, QUIT) and keeps delivered messages in memory, so the email
+service can be run and benchmarked without a real mail account:
+
+    python chatgpt-terminal/smtp_stand_in.py --port 8025 --greeting-delay 0.1 --auth-delay 0.2
+    SMTP_SERVER=localhost SMTP_PORT=8025 SMTP_STARTTLS=false python chatgpt-terminal/index.py
+
+STARTTLS is not offered; greeting_delay and auth_delay stand in for the time
+the TCP/TLS handshake and login take on a real server.
+"""
+import argparse
+import asyncio
+import base64
+import itertools
+import threading
+
+class SMTPStandIn:
+    """
+    In-memory SMTP server. Every connection waits greeting_delay before the
+    220 greeting, every login auth_delay and every message message_delay
+    before it is accepted. Connections idle for longer than
+    idle_timeout are closed by the server (421). With fail_every=N, every Nth
+    message is rejected with a temporary 451 error.
+    """
+    def __init__(self, greeting_delay: float = 0.0, auth_delay: float = 0.0, idle_timeout: float = 300.0,
+                 fail_every: int = 0, username: str = None, password: str = None, message_delay: float = 0.0):
+        self.greeting_delay = greeting_delay
+        self.auth_delay = auth_delay
+        self.message_delay = message_delay
+        self.idle_timeout = idle_timeout
+        self.fail_every = fail_every
+        self.username = username
+        self.password = password
+        self.messages: list[dict] = []
+        self.connections = 0
+        self.logins = 0
+        self._deliveries = itertools.count(1)
+
+    def _check_login(self, username: str, password: str) -> bool:
+        return self.username is None or (username == self.username and password == self.password)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+
+        async def reply(line: str) -> None:
+            writer.write(line.encode() + b"\r\n")
+            await writer.drain()
+
+        async def read_line() -> str:
+            return (await asyncio.wait_for(reader.readline(), self.idle_timeout)).decode().rstrip("\r\n")
+
+        await asyncio.sleep(self.greeting_delay)
+        await reply("220 localhost ESMTP stand-in")
+        authenticated = self.username is None
+        envelope = {"from": None, "to": []}
+        try:
+            while True:
+                try:
+                    line = await read_line()
+                except asyncio.TimeoutError:
+                    await reply("421 4.4.2 Idle timeout, closing connection")
+                    return
+                if not line and reader.at_eof():
+                    return
+                command, _, argument = line.partition(" ")
+                command = command.upper()
+
+                if command == "EHLO":
+                    await reply("250-localhost\r\n250-AUTH PLAIN LOGIN\r\n250-8BITMIME\r\n250 SIZE 35882577")
+                elif command == "HELO":
+                    await reply("250 localhost")
+                elif command == "AUTH":
+                    mechanism, _, initial = argument.partition(" ")
+                    if mechanism.upper() == "PLAIN":
+                        if not initial:
+                            await reply("334 ")
+                            initial = await read_line()
+                        _, username, password = base64.b64decode(initial).decode().split("\0")
+                    else:
+                        await reply("334 " + base64.b64encode(b"Username:").decode())
+                        username = base64.b64decode(await read_line()).decode()
+                        await reply("334 " + base64.b64encode(b"Password:").decode())
+                        password = base64.b64decode(await read_line()).decode()
+                    await asyncio.sleep(self.auth_delay)
+                    if self._check_login(username, password):
+                        self.logins += 1
+                        authenticated = True
+                        await reply("235 2.7.0 Authentication successful")
+                    else:
+                        await reply("535 5.7.8 Username and Password not accepted")
+                elif command == "MAIL":
+                    if not authenticated:
+                        await reply("530 5.7.0 Authentication required")
+                        continue
+                    envelope = {"from": argument.partition(":")[2].strip("<> "), "to": []}
+                    await reply("250 2.1.0 OK")
+                elif command == "RCPT":
+                    envelope["to"].append(argument.partition(":")[2].strip("<> "))
+                    await reply("250 2.1.5 OK")
+                elif command == "DATA":
+                    await reply("354 End data with <CR><LF>.<CR><LF>")
+                    lines = []
+                    while True:
+                        data_line = await reader.readline()
+                        if data_line in (b".\r\n", b".\n", b""):
+                            break
+                        lines.append(data_line[1:] if data_line.startswith(b"..") else data_line)
+                    await asyncio.sleep(self.message_delay)
+                    if self.fail_every and next(self._deliveries) % self.fail_every == 0:
+                        await reply("451 4.3.0 Temporary failure, try again later")
+                    else:
+                        self.messages.append(dict(envelope, data=b"".join(lines)))
+                        await reply("250 2.0.0 OK queued")
+                    envelope = {"from": None, "to": []}
+                elif command == "NOOP":
+                    await reply("250 2.0.0 OK")
+                elif command == "RSET":
+                    envelope = {"from": None, "to": []}
+                    await reply("250 2.0.0 OK")
+                elif command == "QUIT":
+                    await reply("221 2.0.0 Bye")
+                    return
+                else:
+                    await reply("502 5.5.2 Command not recognized")
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def serve(self, host: str = "localhost", port: int = 0) -> "StandInServer":
+        """Start serving on a background event loop; returns the server (shutdown() it to stop)"""
+        return StandInServer(self, host, port)
+
+class StandInServer:
+    """An SMTPStandIn running on its own event loop thread"""
+    def __init__(self, stand_in: SMTPStandIn, host: str, port: int):
+        self._loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def run() -> None:
+            asyncio.set_event_loop(self._loop)
+            self._server = self._loop.run_until_complete(asyncio.start_server(stand_in._handle, host, port))
+            self.server_port = self._server.sockets[0].getsockname()[1]
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        started.wait()
+
+    def shutdown(self) -> None:
+        async def stop() -> None:
+            self._server.close()
+            handlers = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in handlers:
+                task.cancel()
+            await asyncio.gather(*handlers, return_exceptions=True)
+
+        asyncio.run_coroutine_threadsafe(stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for an SMTP server")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--greeting-delay", type=float, default=0.0, help="Seconds before greeting each connection")
+    parser.add_argument("--auth-delay", type=float, default=0.0, help="Seconds each login takes")
+    parser.add_argument("--idle-timeout", type=float, default=300.0, help="Close connections idle this long")
+    parser.add_argument("--fail-every", type=int, default=0, help="Reject every Nth message with 451")
+    parser.add_argument("--message-delay", type=float, default=0.0, help="Seconds to accept each message")
+    args = parser.parse_args()
+    server = SMTPStandIn(args.greeting_delay, args.auth_delay, args.idle_timeout, args.fail_every,
+                         message_delay=args.message_delay).serve(args.host, args.port)
+    print(f"SMTP stand-in listening on {args.host}:{server.server_port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import threading
+import time
+import wave
+from typing import Optional
+import numpy as np
+
+class RingBuffer:
+    """Fixed-size FIFO of audio frames shared by a producer thread and an audio callback"""
+    def __init__(self, capacity: int, channels: int = 1, dtype=np.int16):
+        self._buffer = np.zeros((capacity, channels), dtype=dtype)
+        self._capacity = capacity
+        self._read = 0
+        self._size = 0
+        self._condition = threading.Condition()
+
+    def write(self, frames: np.ndarray) -> None:
+        """Copy frames in, blocking while the buffer is full"""
+        frames = frames.reshape(-1, self._buffer.shape[1])
+        offset = 0
+        with self._condition:
+            while offset < len(frames):
+                while self._size == self._capacity:
+                    self._condition.wait()
+                start = (self._read + self._size) % self._capacity
+                count = min(len(frames) - offset, self._capacity - self._size, self._capacity - start)
+                self._buffer[start:start + count] = frames[offset:offset + count]
+                self._size += count
+                offset += count
+
+    def read_into(self, out: np.ndarray) -> int:
+        """Move up to len(out) frames into out; returns how many were available"""
+        with self._condition:
+            count = min(len(out), self._size)
+            first = min(count, self._capacity - self._read)
+            out[:first] = self._buffer[self._read:self._read + first]
+            out[first:count] = self._buffer[:count - first]
+            self._read = (self._read + count) % self._capacity
+            self._size -= count
+            self._condition.notify_all()
+            return count
+
+    def __len__(self) -> int:
+        return self._size
+
+class AudioSink:
+    """
+    Destination for decoded audio. Call open() once, write() frames as they are
+    decoded, then close() to wait until everything has been played or flushed.
+    """
+    def __init__(self):
+        self.first_audio_at: Optional[float] = None
+        self.frames_written = 0
+
+    def open(self, samplerate: int, channels: int = 1, dtype=np.int16) -> None:
+        self.samplerate = samplerate
+        self.channels = channels
+        self.dtype = dtype
+
+    def write(self, frames: np.ndarray) -> None:
+        if self.first_audio_at is None and len(frames):
+            self.first_audio_at = time.perf_counter()
+        self.frames_written += len(frames) // self.channels if frames.ndim == 1 else len(frames)
+
+    def close(self) -> None:
+        pass
+
+class NullSink(AudioSink):
+    """
+    Discards audio; only records timing, for headless tests and benchmarks.
+    With realtime=True, close() takes as long as playing the audio would.
+    """
+    def __init__(self, realtime: bool = False):
+        super().__init__()
+        self.realtime = realtime
+
+    def close(self) -> None:
+        if self.realtime and self.frames_written:
+            time.sleep(self.frames_written / self.samplerate)
+
+class FileSink(AudioSink):
+    """
+    Writes audio to a WAV file instead of the sound device. The wave module only
+    writes integer PCM, so float audio (e.g. from post-processing) is stored as 16-bit.
+    """
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self._wav_file = None
+
+    def open(self, samplerate: int, channels: int = 1, dtype=np.int16) -> None:
+        super().open(samplerate, channels, dtype)
+        self._wav_file = wave.open(self.path, "wb")
+        self._wav_file.setnchannels(channels)
+        self._wav_file.setsampwidth(2 if np.dtype(dtype).kind == "f" else np.dtype(dtype).itemsize)
+        self._wav_file.setframerate(samplerate)
+
+    def write(self, frames: np.ndarray) -> None:
+        super().write(frames)
+        if frames.dtype.kind == "f":
+            frames = (np.clip(frames, -1.0, 1.0) * 32767).astype("<i2")
+        self._wav_file.writeframes(frames.tobytes())
+
+    def close(self) -> None:
+        self._wav_file.close()
+
+class SoundDeviceSink(AudioSink):
+    """
+    Plays audio through a sounddevice.OutputStream fed from a ring buffer, so
+    playback starts with the first chunk while later ones are still arriving.
+    """
+    def __init__(self, buffer_seconds: float = 30.0):
+        super().__init__()
+        self.buffer_seconds = buffer_seconds
+        self._stream = None
+        self._ring = None
+        self._finished = threading.Event()
+        self._done = threading.Event()
+
+    def open(self, samplerate: int, channels: int = 1, dtype=np.int16) -> None:
+        # Imported here so headless environments without PortAudio can use the other sinks
+        import sounddevice as sd
+        super().open(samplerate, channels, dtype)
+        self._ring = RingBuffer(int(samplerate * self.buffer_seconds), channels, dtype)
+        self._finished.clear()
+        self._done.clear()
+
+        def callback(outdata, frames, time_info, status):
+            count = self._ring.read_into(outdata)
+            outdata[count:] = 0
+            if count < frames and self._finished.is_set() and not len(self._ring):
+                raise sd.CallbackStop()
+
+        self._stream = sd.OutputStream(
+            samplerate=samplerate, channels=channels, dtype=np.dtype(dtype).name,
+            callback=callback, finished_callback=self._done.set
+        )
+        self._stream.start()
+
+    def write(self, frames: np.ndarray) -> None:
+        super().write(frames)
+        self._ring.write(frames)
+
+    def close(self) -> None:
+        self._finished.set()
+        self._done.wait()
+        self._stream.close()
@@ -0,0 +1,237 @@
+"""
+Offline benchmarks for the voice pipeline.
+
+By default the OpenAI API is replaced by a local fake that generates a tone at
+a configurable speed, so results are reproducible without network access.
+
+    python chatgpt-voice/benchmark.py --seconds 8 --runs 5 ttfa
+"""
+import argparse
+import asyncio
+import base64
+import io
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+import wave
+from types import SimpleNamespace
+import numpy as np
+from audio_sinks import NullSink
+from pipeline import run_pipeline
+from postprocess import Normalizer, Resampler, SilenceTrimmer, to_float32
+from realtime import RealtimeSession
+from realtime_server import RealtimeStandIn
+from synthesis import PCM16_SAMPLE_RATE, play_wav, stream_speech, synthesize_samples
+from wav_decoder import decode_wav
+
+def make_tone(seconds: float, samplerate: int = PCM16_SAMPLE_RATE) -> np.ndarray:
+    t = np.arange(int(seconds * samplerate)) / samplerate
+    return (np.sin(2 * np.pi * 440 * t) * 8000).astype(np.int16)
+
+def encode_wav(samples: np.ndarray, samplerate: int = PCM16_SAMPLE_RATE) -> bytes:
+    with io.BytesIO() as buffer:
+        with wave.open(buffer, "wb") as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(samples.dtype.itemsize)
+            wav_file.setframerate(samplerate)
+            wav_file.writeframes(samples.tobytes())
+        return buffer.getvalue()
+
+class FakeAudioCompletions:
+    """
+    Stands in for chat.completions with audio output. The first audio is ready
+    after first_chunk_delay; after that audio is generated speedup times faster
+    than real time and streamed in chunk_seconds pieces.
+    """
+    def __init__(self, seconds: float, first_chunk_delay: float = 0.4,
+                 speedup: float = 4.0, chunk_seconds: float = 0.2):
+        self.samples = make_tone(seconds)
+        self.first_chunk_delay = first_chunk_delay
+        self.speedup = speedup
+        self.chunk_seconds = chunk_seconds
+
+    def _chunks(self):
+        chunk_frames = int(self.chunk_seconds * PCM16_SAMPLE_RATE)
+        time.sleep(self.first_chunk_delay)
+        for start in range(0, len(self.samples), chunk_frames):
+            if start:
+                time.sleep(self.chunk_seconds / self.speedup)
+            data = base64.b64encode(self.samples[start:start + chunk_frames].tobytes()).decode()
+            delta = SimpleNamespace(audio={"data": data, "transcript": ""})
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+    def create(self, stream: bool = False, **kwargs):
+        if stream:
+            return self._chunks()
+        duration = len(self.samples) / PCM16_SAMPLE_RATE
+        time.sleep(self.first_chunk_delay + duration / self.speedup)
+        audio = SimpleNamespace(data=base64.b64encode(encode_wav(self.samples)).decode())
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(audio=audio))])
+
+def fake_client(completions) -> SimpleNamespace:
+    return SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+def make_client(args):
+    if args.live:
+        # The same shared, tuned client the app uses
+        sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+        from shared.openai_clients import get_client
+        return get_client("speech")
+    return fake_client(FakeAudioCompletions(args.seconds, args.first_chunk_delay, args.speedup))
+
+def report(name: str, values: list) -> None:
+    print(f"{name:<28} mean={statistics.mean(values) * 1000:8.1f}ms  min={min(values) * 1000:8.1f}ms  max={max(values) * 1000:8.1f}ms")
+
+def bench_ttfa(args) -> None:
+    """Time from request to the first audio reaching the sink, whole-clip vs streaming"""
+    client = make_client(args)
+    for name, play in (("wav (whole clip)", play_wav), ("stream (pcm16 deltas)", stream_speech)):
+        values = []
+        for _ in range(args.runs):
+            sink = NullSink()
+            started = time.perf_counter()
+            play(client, args.text, sink)
+            values.append(sink.first_audio_at - started)
+        report(f"{name} TTFA", values)
+
+def decode_wav_copying(wav_bytes: bytes) -> tuple[np.ndarray, int]:
+    """The original decode path: BytesIO -> wave -> readframes -> frombuffer"""
+    with io.BytesIO(wav_bytes) as wav_buffer:
+        with wave.open(wav_buffer, 'rb') as wav_file:
+            sample_width = wav_file.getsampwidth()
+            framerate = wav_file.getframerate()
+            audio_data = wav_file.readframes(wav_file.getnframes())
+            dtype_map = {1: np.int8, 2: np.int16, 4: np.int32}
+            audio_np = np.frombuffer(audio_data, dtype=dtype_map[sample_width])
+    return audio_np, framerate
+
+def bench_decode(args) -> None:
+    """Decode time and peak extra memory for a long WAV clip, old path vs memoryview parser"""
+    encoded = base64.b64encode(encode_wav(make_tone(args.seconds))).decode()
+    started = time.perf_counter()
+    wav_bytes = base64.b64decode(encoded)
+    print(f"Clip: {args.seconds:.0f}s, {len(wav_bytes) / 1e6:.1f} MB WAV, base64 decode {(time.perf_counter() - started) * 1000:.1f}ms")
+    for name, decode in (("wave + BytesIO (copying)", decode_wav_copying), ("memoryview (zero-copy)", decode_wav)):
+        values = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            decode(wav_bytes)
+            values.append(time.perf_counter() - started)
+        tracemalloc.start()
+        decode(wav_bytes)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        report(f"{name} decode", values)
+        print(f"{'':<28} peak extra memory={peak / 1e6:.2f} MB")
+
+def bench_pipeline(args) -> None:
+    """Phrases per minute of the serial input/synthesize/play loop vs the asyncio pipeline"""
+    client = make_client(args)
+    phrases = [f"{args.text} ({i})" for i in range(args.phrases)]
+
+    started = time.perf_counter()
+    for text in phrases:
+        play_wav(client, text, NullSink(realtime=True))
+    elapsed = time.perf_counter() - started
+    print(f"{'serial loop':<28} {len(phrases) / elapsed * 60:8.1f} phrases/min ({elapsed:.2f}s)")
+
+    async def queued_phrases():
+        for text in phrases:
+            yield text
+
+    result = asyncio.run(run_pipeline(
+        queued_phrases(),
+        lambda text: synthesize_samples(client, text),
+        lambda: NullSink(realtime=True),
+        max_in_flight=args.max_in_flight
+    ))
+    print(f"{'pipeline':<28} {result['phrases_per_minute']:8.1f} phrases/min ({result['elapsed_s']:.2f}s)")
+
+async def _bench_realtime(args) -> None:
+    stand_in = RealtimeStandIn(args.seconds, args.first_chunk_delay, args.speedup,
+                               drop_every=args.drop_every, handshake_delay=args.handshake_delay)
+    server = await stand_in.serve("localhost", args.port)
+    url = f"ws://localhost:{args.port}"
+    try:
+        for name, persistent in (("connection per turn", False), ("persistent session", True)):
+            session = RealtimeSession(url)
+            values = []
+            started = time.perf_counter()
+            for i in range(args.runs):
+                sink = NullSink()
+                turn_started = time.perf_counter()
+                await session.speak(f"{args.text} ({i})", sink)
+                values.append(sink.first_audio_at - turn_started)
+                if not persistent:
+                    await session.close()
+            elapsed = time.perf_counter() - started
+            await session.close()
+            report(f"{name} TTFA", values)
+            print(f"{'':<28} {args.runs / elapsed * 60:.1f} turns/min, {session.reconnects} reconnects")
+    finally:
+        server.close()
+        await server.wait_closed()
+
+def bench_realtime(args) -> None:
+    """Realtime turns against the local stand-in server, new connection per turn vs one session"""
+    asyncio.run(_bench_realtime(args))
+
+def bench_postprocess(args) -> None:
+    """Real-time factor (processing time / audio duration) of each post-processing step, fed in chunks"""
+    samples = to_float32(make_tone(args.seconds))
+    # Pad with silence so the trimmer has something to cut
+    padding = np.zeros((PCM16_SAMPLE_RATE // 2, 1), dtype=np.float32)
+    samples = np.concatenate([padding, samples, padding])
+    duration = len(samples) / PCM16_SAMPLE_RATE
+    chunk_frames = int(args.chunk_ms / 1000 * PCM16_SAMPLE_RATE)
+    print(f"Clip: {duration:.1f}s at {PCM16_SAMPLE_RATE} Hz, {args.chunk_ms:.0f}ms chunks")
+
+    steps = (
+        ("resample 24k -> 48k", lambda: Resampler(PCM16_SAMPLE_RATE, 48000)),
+        ("resample 24k -> 44.1k", lambda: Resampler(PCM16_SAMPLE_RATE, 44100)),
+        ("resample 24k -> 16k", lambda: Resampler(PCM16_SAMPLE_RATE, 16000)),
+        ("normalize (rms)", lambda: Normalizer("rms")),
+        ("normalize (peak)", lambda: Normalizer("peak")),
+        ("trim silence", lambda: SilenceTrimmer(PCM16_SAMPLE_RATE)),
+    )
+    for name, make_step in steps:
+        values = []
+        for _ in range(args.runs):
+            step = make_step()
+            started = time.perf_counter()
+            for start in range(0, len(samples), chunk_frames):
+                step.process(samples[start:start + chunk_frames])
+            step.flush()
+            values.append(time.perf_counter() - started)
+        print(f"{name:<28} mean={statistics.mean(values) * 1000:8.2f}ms  real-time factor={statistics.mean(values) / duration:.5f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for chatgpt-voice")
+    parser.add_argument("--live", action="store_true", help="Use the real OpenAI API instead of the local fake")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--text", default="Bom dia! Como vai você?")
+    parser.add_argument("--seconds", type=float, default=8.0, help="Length of the fake answer")
+    parser.add_argument("--first-chunk-delay", type=float, default=0.4, help="Fake time until audio starts")
+    parser.add_argument("--speedup", type=float, default=4.0, help="Fake generation speed vs real time")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+    subparsers.add_parser("ttfa", help="Time to first audio").set_defaults(run=bench_ttfa)
+    subparsers.add_parser("decode", help="WAV decode time and peak memory").set_defaults(run=bench_decode)
+    pipeline_parser = subparsers.add_parser("pipeline", help="Throughput of the serial loop vs the pipeline")
+    pipeline_parser.add_argument("--phrases", type=int, default=10)
+    pipeline_parser.add_argument("--max-in-flight", type=int, default=3)
+    pipeline_parser.set_defaults(run=bench_pipeline)
+    realtime_parser = subparsers.add_parser("realtime", help="Realtime WebSocket turns against the local stand-in")
+    realtime_parser.add_argument("--port", type=int, default=8765)
+    realtime_parser.add_argument("--drop-every", type=int, default=0, help="Make the stand-in drop every Nth response")
+    realtime_parser.add_argument("--handshake-delay", type=float, default=0.15, help="Simulated connection setup time")
+    realtime_parser.set_defaults(run=bench_realtime)
+    postprocess_parser = subparsers.add_parser("postprocess", help="Real-time factor of the post-processing steps")
+    postprocess_parser.add_argument("--chunk-ms", type=float, default=100.0)
+    postprocess_parser.set_defaults(run=bench_postprocess)
+    args = parser.parse_args()
+    args.run(args)
+
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,106 @@
-import base64
-from openai import OpenAI
-import sounddevice as sd
-import numpy as np
-import io
-import wave
-
-client = OpenAI()
-
-while True:
-    question = input("Enter a phrase to repeat: ")
-    completion = client.chat.completions.create(
-        model="gpt-4o-audio-preview",
-        modalities=["text", "audio"],
-        audio={"voice": "alloy", "format": "wav"},
-        messages=[
-            {
-                "role": "user",
-                "content": "Diga isso de um jeito elaborado e fofo: " + question
-            }
-        ]
-    )
-
-    # Convert base64 audio to numpy array for playback
-    wav_bytes = base64.b64decode(completion.choices[0].message.audio.data)
-    with io.BytesIO(wav_bytes) as wav_buffer:
-        with wave.open(wav_buffer, 'rb') as wav_file:
-            # Get audio parameters
-            sample_width = wav_file.getsampwidth()
-            channels = wav_file.getnchannels()
-            framerate = wav_file.getframerate()
-            # Read audio data
-            audio_data = wav_file.readframes(wav_file.getnframes())
-            # Convert to numpy array
-            dtype_map = {1: np.int8, 2: np.int16, 4: np.int32}
-            audio_np = np.frombuffer(audio_data, dtype=dtype_map[sample_width])
-
-    # Play the audio
-    sd.play(audio_np, framerate)
-    sd.wait()  # Wait until the audio is finished playing
\ No newline at end of file
+import asyncio
+import os
+import sys
+import websockets
+from audio_sinks import AudioSink, SoundDeviceSink
+from pipeline import run_pipeline
+from postprocess import ProcessingSink
+from realtime import REALTIME_URL, RealtimeSession
+from synthesis import play_wav, stream_speech, synthesize_samples
+from tts_cache import TTSCache
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from shared.openai_clients import get_client, prewarm, stats as connection_stats
+
+client = get_client("speech")
+
+# Open the API connection while the user types the first phrase
+OPENAI_PREWARM = os.getenv("OPENAI_PREWARM", "true").lower() == "true"
+
+# "wav" waits for the whole clip before playing, "stream" starts playing on the first audio chunk,
+# "pipeline" synthesizes the next phrases while the current one plays,
+# "realtime" keeps one Realtime API WebSocket session open for every phrase
+VOICE_MODE = os.getenv("VOICE_MODE", "wav").lower()
+VOICE_MAX_IN_FLIGHT = int(os.getenv("VOICE_MAX_IN_FLIGHT", "3"))
+VOICE_REALTIME_URL = os.getenv("VOICE_REALTIME_URL", REALTIME_URL)
+
+# Optional on-disk cache of synthesized phrases
+VOICE_CACHE_DIR = os.getenv("VOICE_CACHE_DIR")
+cache = TTSCache(
+    VOICE_CACHE_DIR,
+    max_bytes=int(float(os.getenv("VOICE_CACHE_MAX_MB", "500")) * 1024 * 1024)
+) if VOICE_CACHE_DIR else None
+
+# Optional post-processing between decode and playback
+VOICE_OUTPUT_RATE = int(os.getenv("VOICE_OUTPUT_RATE", "0")) or None
+VOICE_NORMALIZE = os.getenv("VOICE_NORMALIZE", "off").lower()
+VOICE_TRIM_SILENCE = os.getenv("VOICE_TRIM_SILENCE", "false").lower() == "true"
+
+def make_sink() -> AudioSink:
+    sink = SoundDeviceSink()
+    normalize = VOICE_NORMALIZE if VOICE_NORMALIZE in ("rms", "peak") else None
+    if VOICE_OUTPUT_RATE or normalize or VOICE_TRIM_SILENCE:
+        return ProcessingSink(sink, VOICE_OUTPUT_RATE, normalize, VOICE_TRIM_SILENCE)
+    return sink
+
+def print_stats():
+    print(cache.format_stats() if cache else "TTS cache is disabled (set VOICE_CACHE_DIR).")
+    print(connection_stats.format_stats())
+
+async def read_phrases():
+    """Yield phrases typed by the user without blocking the event loop"""
+    while True:
+        try:
+            question = await asyncio.to_thread(input, "Enter a phrase to repeat: ")
+        except EOFError:
+            return
+        if question.strip() == "/stats":
+            print_stats()
+            continue
+        yield question
+
+async def run_realtime():
+    session = RealtimeSession(VOICE_REALTIME_URL, api_key=client.api_key)
+    await session.connect()
+    try:
+        async for question in read_phrases():
+            try:
+                await session.speak(question, make_sink())
+            except (websockets.ConnectionClosed, OSError):
+                # The session has already reconnected (or will on the next phrase); only this answer is lost
+                print("The connection dropped and the answer was cut off. Please try again.")
+            except RuntimeError as e:
+                # An error event from the server fails only this turn
+                print(f"Synthesis failed: {str(e)}")
+    finally:
+        await session.close()
+
+def main():
+    if VOICE_MODE == "realtime":
+        asyncio.run(run_realtime())
+        return
+
+    if OPENAI_PREWARM:
+        prewarm()
+
+    if VOICE_MODE == "pipeline":
+        result = asyncio.run(run_pipeline(
+            read_phrases(),
+            lambda text: synthesize_samples(client, text, cache),
+            make_sink,
+            max_in_flight=VOICE_MAX_IN_FLIGHT
+        ))
+        print(f"Played {result['phrases']} phrases ({result['phrases_per_minute']} per minute)")
+        return
+
+    while True:
+        question = input("Enter a phrase to repeat: ")
+        if question.strip() == "/stats":
+            print_stats()
+            continue
+        if VOICE_MODE == "stream":
+            stream_speech(client, question, make_sink(), cache)
+        else:
+            play_wav(client, question, make_sink(), cache)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import asyncio
+import time
+from typing import AsyncIterator, Callable
+import numpy as np
+from audio_sinks import AudioSink
+from synthesis import play_samples
+
+async def run_pipeline(phrases: AsyncIterator[str],
+                       synthesize: Callable[[str], tuple[np.ndarray, int]],
+                       make_sink: Callable[[], AudioSink],
+                       max_in_flight: int = 3) -> dict:
+    """
+    Producer/consumer loop: phrases are synthesized concurrently (up to
+    max_in_flight at once) while earlier ones play, and playback follows input
+    order. synthesize and playback are blocking calls run in worker threads.
+    Returns: {"phrases", "elapsed_s", "phrases_per_minute"}
+    """
+    # Holds synthesis tasks in input order; its size bounds clips waiting to play
+    playback_queue: asyncio.Queue = asyncio.Queue(maxsize=max_in_flight)
+    slots = asyncio.Semaphore(max_in_flight)
+
+    async def synthesize_phrase(text: str):
+        try:
+            return await asyncio.to_thread(synthesize, text)
+        finally:
+            slots.release()
+
+    async def produce() -> None:
+        try:
+            async for text in phrases:
+                await slots.acquire()
+                await playback_queue.put(asyncio.create_task(synthesize_phrase(text)))
+        finally:
+            await playback_queue.put(None)
+
+    async def consume() -> int:
+        played = 0
+        while True:
+            task = await playback_queue.get()
+            if task is None:
+                return played
+            try:
+                samples, framerate = await task
+            except Exception as e:
+                print(f"Synthesis failed: {str(e)}")
+                continue
+            await asyncio.to_thread(play_samples, samples, framerate, make_sink())
+            played += 1
+
+    started = time.perf_counter()
+    producer = asyncio.create_task(produce())
+    played = await consume()
+    await producer
+    elapsed = time.perf_counter() - started
+    return {
+        "phrases": played,
+        "elapsed_s": round(elapsed, 3),
+        "phrases_per_minute": round(played / elapsed * 60, 1) if elapsed else 0.0
+    }
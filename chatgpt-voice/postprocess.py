@@ -0,0 +1,183 @@
+from math import gcd
+from typing import List, Optional
+import numpy as np
+from audio_sinks import AudioSink
+
+def to_float32(frames: np.ndarray) -> np.ndarray:
+    """Convert integer PCM (any width, 8-bit unsigned) to float32 in [-1, 1], shaped (frames, channels)"""
+    if frames.ndim == 1:
+        frames = frames.reshape(-1, 1)
+    if frames.dtype == np.uint8:
+        return (frames.astype(np.float32) - 128) / 128
+    if np.issubdtype(frames.dtype, np.integer):
+        return frames.astype(np.float32) / float(-np.iinfo(frames.dtype).min)
+    return frames.astype(np.float32, copy=False)
+
+class Resampler:
+    """
+    Streaming polyphase resampler. A Kaiser-windowed sinc low-pass is split
+    into `up` phases; each output sample is one phase's dot product with the
+    most recent input samples, computed for a whole chunk at once.
+    """
+    def __init__(self, in_rate: int, out_rate: int, channels: int = 1, zero_crossings: int = 16):
+        divisor = gcd(in_rate, out_rate)
+        self.up = out_rate // divisor
+        self.down = in_rate // divisor
+        factor = max(self.up, self.down)
+
+        num_taps = 2 * zero_crossings * factor + 1
+        n = np.arange(num_taps) - (num_taps - 1) / 2
+        prototype = np.sinc(n / factor) / factor * np.kaiser(num_taps, 8.0)
+        taps_per_phase = -(-num_taps // self.up)
+        prototype = np.pad(prototype, (0, taps_per_phase * self.up - num_taps))
+        # bank[p, j] = h[p + j * up], scaled by up to keep unity gain after zero-stuffing
+        self._bank = (prototype.reshape(taps_per_phase, self.up).T * self.up).astype(np.float32)
+        self._taps = taps_per_phase
+        self._history = np.zeros((taps_per_phase - 1, channels), dtype=np.float32)
+        # Position of the next output sample, in up-sampled units from the start of the next chunk
+        self._position = 0
+        # The filter delays its output by half its length; those leading samples are dropped
+        # and the same amount of trailing audio is pushed out by flush()
+        self._skip = (num_taps - 1) // 2 // self.down
+        self._delay = -(-(num_taps - 1) // 2 // self.up)
+
+    def process(self, frames: np.ndarray) -> np.ndarray:
+        buffer = np.concatenate([self._history, frames])
+        total = len(frames) * self.up
+        positions = np.arange(self._position, total, self.down)
+        inputs = positions // self.up + len(self._history)
+        phases = positions % self.up
+        window = buffer[inputs[:, None] - np.arange(self._taps)[None, :]]
+        out = np.einsum("mt,mtc->mc", self._bank[phases], window)
+
+        self._position = (positions[-1] + self.down - total) if len(positions) else self._position - total
+        self._history = buffer[len(buffer) - (self._taps - 1):]
+        if self._skip:
+            skipped = min(self._skip, len(out))
+            out = out[skipped:]
+            self._skip -= skipped
+        return out.astype(np.float32, copy=False)
+
+    def flush(self) -> np.ndarray:
+        """Push out the samples still held back by the filter delay"""
+        return self.process(np.zeros((self._delay, self._history.shape[1]), dtype=np.float32))
+
+class Normalizer:
+    """
+    Loudness normalization towards target_db (dBFS). In "rms" mode the gain
+    follows a running RMS across chunks (exact when given a whole clip);
+    in "peak" mode it follows the running peak. The gain never lets a
+    chunk's peak exceed peak_limit.
+    """
+    def __init__(self, mode: str = "rms", target_db: float = -20.0, peak_limit: float = 0.98, smoothing: float = 0.5):
+        self.mode = mode
+        self.target = 10 ** (target_db / 20)
+        self.peak_limit = peak_limit
+        self.smoothing = smoothing
+        self._level: Optional[float] = None
+
+    def process(self, frames: np.ndarray) -> np.ndarray:
+        if not len(frames):
+            return frames
+        if self.mode == "peak":
+            level = float(np.abs(frames).max())
+            self._level = level if self._level is None else max(self._level, level)
+        else:
+            level = float(np.sqrt(np.mean(np.square(frames))))
+            self._level = level if self._level is None else self.smoothing * self._level + (1 - self.smoothing) * level
+        if self._level < 1e-6:
+            return frames
+        gain = self.target / self._level
+        peak = float(np.abs(frames).max())
+        if peak * gain > self.peak_limit:
+            gain = self.peak_limit / peak
+        return frames * np.float32(gain)
+
+    def flush(self) -> np.ndarray:
+        return np.zeros((0, 1), dtype=np.float32)
+
+class SilenceTrimmer:
+    """
+    Energy-based trimming of leading and trailing silence. Audio is judged in
+    frame_ms windows against threshold_db (dBFS RMS). Silence after speech is
+    held back until more speech arrives, and dropped at flush(); keep_ms of
+    padding is kept at either edge.
+    """
+    def __init__(self, samplerate: int, threshold_db: float = -45.0, frame_ms: float = 10.0, keep_ms: float = 30.0):
+        self.frame = max(1, int(samplerate * frame_ms / 1000))
+        self.keep = int(samplerate * keep_ms / 1000)
+        self.threshold = 10 ** (threshold_db / 20)
+        self._started = False
+        self._pending: Optional[np.ndarray] = None
+
+    def process(self, frames: np.ndarray) -> np.ndarray:
+        if self._pending is not None:
+            frames = np.concatenate([self._pending, frames])
+        whole = len(frames) - len(frames) % self.frame
+        if not whole:
+            self._pending = frames
+            return frames[:0]
+
+        blocks = frames[:whole].reshape(-1, self.frame * frames.shape[1])
+        loud = np.flatnonzero(np.sqrt(np.mean(np.square(blocks), axis=1)) >= self.threshold)
+        if not len(loud):
+            if not self._started:
+                # Only the padding before speech is worth keeping
+                self._pending = frames[max(0, len(frames) - self.keep - self.frame):]
+            else:
+                self._pending = frames
+            return frames[:0]
+
+        start = 0 if self._started else max(0, loud[0] * self.frame - self.keep)
+        end = (loud[-1] + 1) * self.frame
+        self._started = True
+        self._pending = frames[end:]
+        return frames[start:end]
+
+    def flush(self) -> np.ndarray:
+        tail = self._pending[:self.keep] if self._started and self._pending is not None else None
+        self._pending = None
+        return tail if tail is not None else np.zeros((0, 1), dtype=np.float32)
+
+class ProcessingSink(AudioSink):
+    """
+    Runs decoded chunks through resampling, normalization and silence trimming
+    before handing float32 audio to the wrapped sink.
+    """
+    def __init__(self, sink: AudioSink, output_rate: Optional[int] = None,
+                 normalize: Optional[str] = None, trim_silence: bool = False):
+        super().__init__()
+        self.sink = sink
+        self.output_rate = output_rate
+        self.normalize = normalize
+        self.trim_silence = trim_silence
+        self.steps: List = []
+
+    def open(self, samplerate: int, channels: int = 1, dtype=np.int16) -> None:
+        super().open(samplerate, channels, dtype)
+        self.steps = []
+        if self.trim_silence:
+            self.steps.append(SilenceTrimmer(samplerate))
+        if self.output_rate and self.output_rate != samplerate:
+            self.steps.append(Resampler(samplerate, self.output_rate, channels))
+        if self.normalize:
+            self.steps.append(Normalizer(self.normalize))
+        self.sink.open(self.output_rate or samplerate, channels, np.float32)
+
+    def write(self, frames: np.ndarray) -> None:
+        super().write(frames)
+        frames = to_float32(frames)
+        for step in self.steps:
+            frames = step.process(frames)
+        if len(frames):
+            self.sink.write(frames)
+
+    def close(self) -> None:
+        # Each step's leftovers still go through the steps after it
+        for index, step in enumerate(self.steps):
+            frames = step.flush()
+            for later in self.steps[index + 1:]:
+                frames = later.process(frames) if len(frames) else frames
+            if len(frames):
+                self.sink.write(frames.reshape(-1, self.channels))
+        self.sink.close()
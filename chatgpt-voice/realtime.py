@@ -0,0 +1,127 @@
+import asyncio
+import base64
+import json
+import logging
+from typing import Optional
+import numpy as np
+import websockets
+from audio_sinks import AudioSink
+from synthesis import PCM16_SAMPLE_RATE, PROMPT_TEMPLATE, VOICE
+
+REALTIME_URL = "wss://api.openai.com/v1/realtime?model=gpt-4o-realtime-preview"
+
+# Input audio is sent in pieces of this many bytes (0.5 s of 24 kHz PCM16)
+AUDIO_APPEND_BYTES = 24000
+
+class RealtimeSession:
+    """
+    One persistent Realtime API WebSocket session. Each turn sends text or
+    audio input events and plays the response.audio.delta events as they
+    arrive. A dropped connection is reopened with exponential backoff; a turn
+    that had not produced audio yet is retried on the new connection.
+    """
+    def __init__(self, url: str = REALTIME_URL, api_key: Optional[str] = None,
+                 voice: str = VOICE, max_retries: int = 3):
+        self.url = url
+        self.headers = {"Authorization": f"Bearer {api_key}", "OpenAI-Beta": "realtime=v1"} if api_key else {}
+        self.voice = voice
+        self.max_retries = max_retries
+        self._websocket = None
+        self.reconnects = 0
+
+    async def connect(self) -> None:
+        delay = 0.5
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._websocket = await websockets.connect(self.url, extra_headers=self.headers, max_size=None)
+                break
+            except (OSError, websockets.WebSocketException) as e:
+                if attempt == self.max_retries:
+                    raise
+                logging.warning(f"Realtime connection failed ({str(e)}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                delay *= 2
+        await self._send({
+            "type": "session.update",
+            "session": {
+                "modalities": ["text", "audio"],
+                "voice": self.voice,
+                "output_audio_format": "pcm16"
+            }
+        })
+
+    async def close(self) -> None:
+        if self._websocket is not None:
+            await self._websocket.close()
+            self._websocket = None
+
+    async def _send(self, event: dict) -> None:
+        await self._websocket.send(json.dumps(event))
+
+    async def _reconnect(self) -> None:
+        self.reconnects += 1
+        await self.close()
+        await self.connect()
+
+    async def _send_text(self, text: str) -> None:
+        await self._send({
+            "type": "conversation.item.create",
+            "item": {
+                "type": "message",
+                "role": "user",
+                "content": [{"type": "input_text", "text": PROMPT_TEMPLATE.format(text=text)}]
+            }
+        })
+        await self._send({"type": "response.create"})
+
+    async def _send_audio(self, pcm: bytes) -> None:
+        for start in range(0, len(pcm), AUDIO_APPEND_BYTES):
+            await self._send({
+                "type": "input_audio_buffer.append",
+                "audio": base64.b64encode(pcm[start:start + AUDIO_APPEND_BYTES]).decode()
+            })
+        await self._send({"type": "input_audio_buffer.commit"})
+        await self._send({"type": "response.create"})
+
+    async def _play_response(self, sink: AudioSink) -> str:
+        """Write audio deltas to the sink until response.done; returns the transcript"""
+        transcript = ""
+        async for message in self._websocket:
+            event = json.loads(message)
+            if event["type"] == "response.audio.delta":
+                sink.write(np.frombuffer(base64.b64decode(event["delta"]), dtype=np.int16))
+            elif event["type"] == "response.audio_transcript.delta":
+                transcript += event["delta"]
+            elif event["type"] == "response.done":
+                return transcript
+            elif event["type"] == "error":
+                raise RuntimeError(event.get("error", {}).get("message", "Realtime API error"))
+        raise websockets.ConnectionClosed(None, None)
+
+    async def _turn(self, send, sink: AudioSink) -> str:
+        if self._websocket is None:
+            await self.connect()
+        sink.open(PCM16_SAMPLE_RATE, 1, np.int16)
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    await send()
+                    return await self._play_response(sink)
+                except websockets.ConnectionClosed:
+                    # Retrying after audio has started would repeat it
+                    if sink.first_audio_at is not None or attempt == self.max_retries:
+                        await self._reconnect()
+                        raise
+                    logging.warning("Realtime connection dropped, reconnecting")
+                    await self._reconnect()
+        finally:
+            # Waiting for playback to drain blocks, keep it off the event loop
+            await asyncio.to_thread(sink.close)
+
+    async def speak(self, text: str, sink: AudioSink) -> str:
+        """Send a text turn and play the spoken answer; returns its transcript"""
+        return await self._turn(lambda: self._send_text(text), sink)
+
+    async def speak_audio(self, pcm: bytes, sink: AudioSink) -> str:
+        """Send 24 kHz mono PCM16 input audio and play the spoken answer; returns its transcript"""
+        return await self._turn(lambda: self._send_audio(pcm), sink)
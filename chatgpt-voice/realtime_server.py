@@ -0,0 +1,100 @@
+"""
+Local stand-in for the OpenAI Realtime WebSocket API.
+
+Answers every response.create with a scripted tone streamed as
+response.audio.delta events, so realtime mode can be run and benchmarked
+without network access:
+
+    python chatgpt-voice/realtime_server.py --port 8765
+    VOICE_MODE=realtime VOICE_REALTIME_URL=ws://localhost:8765 python chatgpt-voice/index.py
+"""
+import argparse
+import asyncio
+import base64
+import itertools
+import json
+import numpy as np
+import websockets
+from synthesis import PCM16_SAMPLE_RATE
+
+class RealtimeStandIn:
+    """
+    Scripted server: after first_delta_delay seconds, streams seconds of audio
+    in chunk_seconds pieces, speedup times faster than real time. Each opening
+    handshake is delayed by handshake_delay to stand in for DNS/TCP/TLS setup.
+    With drop_every=N, every Nth response closes the connection before any audio.
+    """
+    def __init__(self, seconds: float = 2.0, first_delta_delay: float = 0.3, speedup: float = 4.0,
+                 chunk_seconds: float = 0.1, drop_every: int = 0, handshake_delay: float = 0.0):
+        t = np.arange(int(seconds * PCM16_SAMPLE_RATE)) / PCM16_SAMPLE_RATE
+        self.samples = (np.sin(2 * np.pi * 330 * t) * 8000).astype(np.int16)
+        self.first_delta_delay = first_delta_delay
+        self.speedup = speedup
+        self.chunk_seconds = chunk_seconds
+        self.drop_every = drop_every
+        self.handshake_delay = handshake_delay
+        self.connections = 0
+        self._responses = itertools.count(1)
+        self._event_ids = itertools.count(1)
+
+    async def _send(self, websocket, event: dict) -> None:
+        event["event_id"] = f"event_{next(self._event_ids)}"
+        await websocket.send(json.dumps(event))
+
+    async def _respond(self, websocket) -> None:
+        response_number = next(self._responses)
+        if self.drop_every and response_number % self.drop_every == 0:
+            await websocket.close(code=1011, reason="scripted drop")
+            return
+
+        await asyncio.sleep(self.first_delta_delay)
+        chunk_frames = int(self.chunk_seconds * PCM16_SAMPLE_RATE)
+        for start in range(0, len(self.samples), chunk_frames):
+            if start:
+                await asyncio.sleep(self.chunk_seconds / self.speedup)
+            chunk = self.samples[start:start + chunk_frames]
+            await self._send(websocket, {"type": "response.audio.delta", "delta": base64.b64encode(chunk.tobytes()).decode()})
+        await self._send(websocket, {"type": "response.audio_transcript.delta", "delta": "(scripted tone)"})
+        await self._send(websocket, {"type": "response.done", "response": {"status": "completed"}})
+
+    async def handler(self, websocket) -> None:
+        self.connections += 1
+        await self._send(websocket, {"type": "session.created", "session": {}})
+        try:
+            async for message in websocket:
+                event = json.loads(message)
+                if event["type"] == "session.update":
+                    await self._send(websocket, {"type": "session.updated", "session": event.get("session", {})})
+                elif event["type"] == "response.create":
+                    await self._respond(websocket)
+        except websockets.ConnectionClosed:
+            pass
+
+    async def _process_request(self, path, request_headers):
+        await asyncio.sleep(self.handshake_delay)
+        return None
+
+    async def serve(self, host: str = "localhost", port: int = 8765):
+        """Start serving; returns the websockets server (close() it to stop)"""
+        return await websockets.serve(self.handler, host, port, max_size=None, process_request=self._process_request)
+
+async def _main(args) -> None:
+    stand_in = RealtimeStandIn(args.seconds, args.first_delta_delay, args.speedup,
+                               drop_every=args.drop_every, handshake_delay=args.handshake_delay)
+    server = await stand_in.serve(args.host, args.port)
+    print(f"Realtime stand-in listening on ws://{args.host}:{args.port}")
+    await server.wait_closed()
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the OpenAI Realtime API")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seconds", type=float, default=2.0, help="Length of each scripted answer")
+    parser.add_argument("--first-delta-delay", type=float, default=0.3)
+    parser.add_argument("--speedup", type=float, default=4.0)
+    parser.add_argument("--drop-every", type=int, default=0, help="Drop the connection on every Nth response")
+    parser.add_argument("--handshake-delay", type=float, default=0.0, help="Simulated connection setup time")
+    asyncio.run(_main(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import base64
+import numpy as np
+from typing import Optional
+from audio_sinks import AudioSink
+from tts_cache import TTSCache, cache_key
+from wav_decoder import decode_wav
+
+MODEL = "gpt-4o-audio-preview"
+VOICE = "alloy"
+PROMPT_TEMPLATE = "Diga isso de um jeito elaborado e fofo: {text}"
+
+# Streamed audio comes as raw 16-bit little-endian mono PCM at 24 kHz
+PCM16_SAMPLE_RATE = 24000
+
+def build_messages(text: str) -> list:
+    return [
+        {
+            "role": "user",
+            "content": PROMPT_TEMPLATE.format(text=text)
+        }
+    ]
+
+def synthesize_wav(client, text: str) -> bytes:
+    """Request the whole answer as a WAV clip"""
+    completion = client.chat.completions.create(
+        model=MODEL,
+        modalities=["text", "audio"],
+        audio={"voice": VOICE, "format": "wav"},
+        messages=build_messages(text)
+    )
+    return base64.b64decode(completion.choices[0].message.audio.data)
+
+def play_samples(samples: np.ndarray, framerate: int, sink: AudioSink) -> None:
+    sink.open(framerate, samples.shape[1], samples.dtype)
+    sink.write(samples)
+    sink.close()
+
+def synthesize_samples(client, text: str, cache: Optional[TTSCache] = None) -> tuple[np.ndarray, int]:
+    """
+    Synthesize the whole clip, or take it from the cache
+    Returns: (samples, framerate)
+    """
+    key = cache_key(MODEL, VOICE, PROMPT_TEMPLATE, text)
+    cached = cache.get(key) if cache else None
+    if cached is not None:
+        return cached
+
+    wav_bytes = synthesize_wav(client, text)
+    if cache:
+        cache.put_wav(key, wav_bytes)
+    return decode_wav(wav_bytes)
+
+def play_wav(client, text: str, sink: AudioSink, cache: Optional[TTSCache] = None) -> None:
+    """Synthesize the whole clip (or take it from the cache), decode it, then play it"""
+    play_samples(*synthesize_samples(client, text, cache), sink)
+
+def stream_speech(client, text: str, sink: AudioSink, cache: Optional[TTSCache] = None) -> str:
+    """
+    Request streamed PCM16 audio and hand each chunk to the sink as it arrives,
+    so playback starts on the first chunk. Cached phrases are played directly.
+    Returns: the transcript of the spoken answer (empty for cached phrases)
+    """
+    key = cache_key(MODEL, VOICE, PROMPT_TEMPLATE, text)
+    cached = cache.get(key) if cache else None
+    if cached is not None:
+        play_samples(*cached, sink)
+        return ""
+
+    stream = client.chat.completions.create(
+        model=MODEL,
+        modalities=["text", "audio"],
+        audio={"voice": VOICE, "format": "pcm16"},
+        messages=build_messages(text),
+        stream=True
+    )
+
+    sink.open(PCM16_SAMPLE_RATE, 1, np.int16)
+    transcript = ""
+    leftover = b""
+    pcm_chunks = []
+    try:
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            # Audio deltas are not part of the typed delta model, they arrive as an extra field
+            audio = getattr(chunk.choices[0].delta, "audio", None)
+            if not audio:
+                continue
+            transcript += audio.get("transcript") or ""
+            if audio.get("data"):
+                pcm = leftover + base64.b64decode(audio["data"])
+                # Keep a trailing odd byte for the next chunk
+                usable = len(pcm) - len(pcm) % 2
+                leftover = pcm[usable:]
+                if usable:
+                    sink.write(np.frombuffer(pcm, dtype=np.int16, count=usable // 2))
+                    pcm_chunks.append(pcm[:usable])
+    finally:
+        sink.close()
+
+    if cache and pcm_chunks:
+        cache.put_pcm(key, pcm_chunks, PCM16_SAMPLE_RATE)
+    return transcript
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Iterable, List, Optional
+import numpy as np
+from wav_decoder import decode_wav, wav_header
+
+def cache_key(model: str, voice: str, prompt_template: str, text: str) -> str:
+    """Content address of a synthesized phrase"""
+    payload = json.dumps([model, voice, prompt_template, text], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class TTSCache:
+    """
+    On-disk cache of synthesized audio, one WAV file per key.
+    Entries are stored as 16-bit PCM WAV (the API's own output, without the
+    base64 overhead) so a hit can be memory-mapped and played without decoding.
+    The directory is kept under max_bytes by evicting the least recently used
+    entries; file modification times carry the recency across restarts.
+    """
+    def __init__(self, directory: str, max_bytes: int = 500 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+        os.makedirs(directory, exist_ok=True)
+        files = []
+        for name in os.listdir(directory):
+            if name.endswith(".wav"):
+                stat = os.stat(os.path.join(directory, name))
+                files.append((stat.st_mtime, name[:-4], stat.st_size))
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+            self.total_bytes += size
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.wav")
+
+    def get(self, key: str) -> Optional[tuple[np.ndarray, int]]:
+        """
+        Look up a phrase
+        Returns: (samples, framerate) as a view over the memory-mapped file, or None
+        """
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+        path = self._path(key)
+        try:
+            os.utime(path)
+            with open(path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            # The returned array keeps the mapping alive
+            decoded = decode_wav(mapped)
+        except (OSError, ValueError, struct.error):
+            # Missing or damaged file: drop the entry, the phrase is synthesized again
+            with self._lock:
+                self.misses += 1
+                self.total_bytes -= self._entries.pop(key, 0)
+            return None
+        with self._lock:
+            self.hits += 1
+            self.bytes_saved += len(mapped)
+        return decoded
+
+    def _store(self, key: str, parts: Iterable) -> None:
+        path = self._path(key)
+        # A unique name per call: threads of one process may store the same phrase at once
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for part in parts:
+                    f.write(part)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+        size = os.path.getsize(path)
+        with self._lock:
+            self.total_bytes += size - self._entries.pop(key, 0)
+            self._entries[key] = size
+            while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+                evicted, evicted_size = self._entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+                try:
+                    os.remove(self._path(evicted))
+                except OSError:
+                    pass
+
+    def put_wav(self, key: str, wav_bytes: bytes) -> None:
+        """Store a WAV clip as returned by the API"""
+        self._store(key, [wav_bytes])
+
+    def put_pcm(self, key: str, pcm_chunks: List[bytes], framerate: int, channels: int = 1, sample_width: int = 2) -> None:
+        """Store raw PCM audio, given in the chunks it was streamed in"""
+        data_size = sum(len(chunk) for chunk in pcm_chunks)
+        self._store(key, [wav_header(data_size, framerate, channels, sample_width), *pcm_chunks])
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def format_stats(self) -> str:
+        return (
+            f"TTS cache: {self.hits}/{self.hits + self.misses} hits ({self.hit_rate:.0%}), "
+            f"{self.bytes_saved / 1e6:.1f} MB not re-synthesized, "
+            f"{len(self._entries)} entries using {self.total_bytes / 1e6:.1f} MB"
+        )
@@ -0,0 +1,89 @@
+import struct
+from typing import Union
+import numpy as np
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+PCM_DTYPES = {8: np.dtype("u1"), 16: np.dtype("<i2"), 32: np.dtype("<i4")}
+FLOAT_DTYPES = {32: np.dtype("<f4"), 64: np.dtype("<f8")}
+
+class WavFormatError(ValueError):
+    pass
+
+def wav_header(data_size: int, framerate: int, channels: int = 1, sample_width: int = 2) -> bytes:
+    """Header of a PCM WAV file whose data chunk is data_size bytes"""
+    block_align = channels * sample_width
+    return (
+        b"RIFF" + struct.pack("<I", 36 + data_size) + b"WAVE"
+        + b"fmt " + struct.pack("<IHHIIHH", 16, WAVE_FORMAT_PCM, channels, framerate,
+                                framerate * block_align, block_align, sample_width * 8)
+        + b"data" + struct.pack("<I", data_size)
+    )
+
+def _int24_to_int32(raw: np.ndarray) -> np.ndarray:
+    """Widen packed little-endian 24-bit samples to int32 (full scale, low byte zero)"""
+    widened = np.zeros((len(raw), 4), dtype=np.uint8)
+    widened[:, 1:] = raw
+    return widened.view("<i4").reshape(-1)
+
+def decode_wav(data: Union[bytes, bytearray, memoryview]) -> tuple[np.ndarray, int]:
+    """
+    Parse a RIFF/WAVE buffer and return its samples without copying them
+    Returns: (samples, framerate), samples shaped (frames, channels) as a view over data
+
+    8-bit PCM is unsigned (uint8). 16/32-bit PCM and 32/64-bit float are returned
+    as-is; 24-bit PCM has no numpy dtype and is widened to int32, which copies.
+    A data chunk with a placeholder size (0 or 0xFFFFFFFF) runs to the end of the buffer.
+    """
+    view = memoryview(data).cast("B")
+    if len(view) < 12 or view[0:4] != b"RIFF" or view[8:12] != b"WAVE":
+        raise WavFormatError("Not a RIFF/WAVE buffer")
+
+    fmt = None
+    offset = 12
+    while offset + 8 <= len(view):
+        chunk_id = bytes(view[offset:offset + 4])
+        (chunk_size,) = struct.unpack_from("<I", view, offset + 4)
+        body = offset + 8
+
+        if chunk_id == b"fmt ":
+            if chunk_size < 16 or body + 16 > len(view):
+                raise WavFormatError("Truncated fmt chunk")
+            audio_format, channels, framerate, _, block_align, bits = struct.unpack_from("<HHIIHH", view, body)
+            if not channels or not block_align:
+                raise WavFormatError("fmt chunk with no channels or a zero block size")
+            if audio_format == WAVE_FORMAT_EXTENSIBLE and chunk_size >= 26 and body + 26 <= len(view):
+                # The real format is the first two bytes of the SubFormat GUID
+                (audio_format,) = struct.unpack_from("<H", view, body + 24)
+            fmt = (audio_format, channels, framerate, block_align, bits)
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise WavFormatError("data chunk before fmt chunk")
+            audio_format, channels, framerate, block_align, bits = fmt
+            if block_align != channels * ((bits + 7) // 8):
+                raise WavFormatError(f"Block size {block_align} does not match {channels} channels of {bits} bits")
+            if chunk_size in (0, 0xFFFFFFFF):
+                # Streaming writers leave the size as a placeholder
+                size = len(view) - body
+            else:
+                size = min(chunk_size, len(view) - body)
+            size -= size % block_align
+            samples = view[body:body + size]
+
+            if audio_format == WAVE_FORMAT_PCM and bits == 24:
+                raw = np.frombuffer(samples, dtype=np.uint8).reshape(-1, 3)
+                return _int24_to_int32(raw).reshape(-1, channels), framerate
+            if audio_format == WAVE_FORMAT_PCM and bits in PCM_DTYPES:
+                dtype = PCM_DTYPES[bits]
+            elif audio_format == WAVE_FORMAT_IEEE_FLOAT and bits in FLOAT_DTYPES:
+                dtype = FLOAT_DTYPES[bits]
+            else:
+                raise WavFormatError(f"Unsupported WAV format {audio_format:#06x} with {bits} bits per sample")
+            return np.frombuffer(samples, dtype=dtype).reshape(-1, channels), framerate
+
+        # Chunks are padded to an even size
+        offset = body + chunk_size + (chunk_size & 1)
+
+    raise WavFormatError("No data chunk found")
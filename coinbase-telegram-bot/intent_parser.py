@@ -0,0 +1,132 @@
+import json
+import logging
+import re
+import threading
+import time
+import uuid
+from typing import Callable, Optional, Set
+
+_NUMBER = r"\d[\d,]*(?:\.\d+)?"
+
+# Amounts the parser is confident are in dollars. A bare number ("buy 50 SOL")
+# is ambiguous between dollars and units of the asset, so it is left to the model.
+_AMOUNT = (
+    rf"(?:\$\s*(?P<prefixed>{_NUMBER})"
+    rf"|(?P<suffixed>{_NUMBER})\s*(?:\$|usdc|usd|dollars?|bucks)"
+    rf"|(?P<all>all|everything))"
+)
+
+_COMMAND = re.compile(
+    rf"^\s*(?:please\s+)?(?P<action>buy|sell)\s+"
+    rf"(?:{_AMOUNT}\s+)?"
+    rf"(?:(?:worth\s+)?(?:of|in)\s+)?"
+    rf"(?:(?:my|the)\s+)?"
+    rf"(?P<asset>[a-z][a-z0-9]{{1,9}})"
+    rf"(?:\s+(?:now|please))?\s*[.!]?\s*$",
+    re.IGNORECASE
+)
+
+# Words that can land in the asset slot but are never a symbol
+_NOT_ASSETS = {"ALL", "EVERYTHING", "IT", "SOME", "MORE", "HALF"}
+
+class AssetCache:
+    """
+    Cached set of tradable asset symbols, reloaded after ttl_seconds.
+    If a load fails the previous set is kept and the load is tried again
+    after retry_seconds, so one failure does not disable parsing for a full ttl.
+    """
+    def __init__(self, loader: Callable[[], Set[str]], ttl_seconds: float = 3600, retry_seconds: float = 30):
+        self._loader = loader
+        self._ttl_seconds = ttl_seconds
+        self._retry_seconds = retry_seconds
+        self._assets: Set[str] = set()
+        self._expires_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Set[str]:
+        """Return the cached symbols, loading them if missing or stale"""
+        with self._lock:
+            now = time.monotonic()
+            if self._expires_at is None or now >= self._expires_at:
+                try:
+                    self._assets = set(self._loader())
+                    self._expires_at = now + self._ttl_seconds
+                except Exception as e:
+                    logging.warning(f"Failed to load tradable assets: {str(e)}")
+                    self._expires_at = now + self._retry_seconds
+            return self._assets
+
+class IntentParser:
+    """
+    Local parser for formulaic trading commands such as "buy $100 of BTC" or
+    "sell all ETH". Produces the same arguments as the create_order tool, or
+    None when the message should go to the model instead.
+    """
+    def __init__(self, asset_loader: Callable[[], Set[str]], ttl_seconds: float = 3600):
+        self.assets = AssetCache(asset_loader, ttl_seconds)
+        self.hits = 0
+        self.misses = 0
+
+    def _match(self, text: str) -> Optional[dict]:
+        match = _COMMAND.match(text or "")
+        if not match:
+            return None
+
+        asset = match.group("asset").upper()
+        if asset in _NOT_ASSETS:
+            return None
+
+        amount = match.group("prefixed") or match.group("suffixed")
+        if amount is not None:
+            amount = float(amount.replace(",", ""))
+            if amount <= 0:
+                return None
+        else:
+            # Same rule the tool description gives the model: no amount means all
+            amount = "all"
+
+        return {
+            "action": match.group("action").lower(),
+            "amountInDollars": amount,
+            "asset": asset
+        }
+
+    def parse(self, text: str) -> Optional[dict]:
+        """
+        Parse a trading command
+        Returns: create_order arguments, or None if the parser is not confident
+        """
+        args = self._match(text)
+        if args is not None and args["asset"] in self.assets.get():
+            self.hits += 1
+            return args
+        self.misses += 1
+        return None
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def format_stats(self) -> str:
+        return f"Intent fast path: {self.hits}/{self.hits + self.misses} messages ({self.hit_rate:.0%})"
+
+def build_tool_call_message(args: dict) -> tuple[dict, str]:
+    """
+    Build an assistant message equivalent to the model calling create_order with args
+    Returns: (assistant_message, tool_call_id)
+    """
+    tool_call_id = f"call_local_{uuid.uuid4().hex[:24]}"
+    message = {
+        "role": "assistant",
+        "content": None,
+        "tool_calls": [{
+            "id": tool_call_id,
+            "type": "function",
+            "function": {
+                "name": "create_order",
+                "arguments": json.dumps(args)
+            }
+        }]
+    }
+    return message, tool_call_id
@@ -0,0 +1,325 @@
+"""
+Load test for the Telegram bot handlers.
+
+Synthetic updates are fed into enqueue_message, the bot's message handler, so
+they go through the same fair per-chat scheduler as real updates. The Telegram
+Bot API, OpenAI and the Coinbase REST client are replaced by in-process fakes
+with configurable latency. Reports throughput, end-to-end latency percentiles,
+failed and refused messages and event-loop lag.
+
+Example:
+    python coinbase-telegram-bot/loadtest.py --messages 500 --concurrency 50 \
+        --openai-latency lognormal:800,0.4 --coinbase-latency const:120
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import random
+import sys
+import time
+import uuid
+from collections import defaultdict
+from types import SimpleNamespace
+from typing import Callable, Optional, Tuple
+
+# The real clients are created at import time and replaced below
+os.environ.setdefault("OPENAI_API_KEY", "loadtest")
+os.environ.setdefault("TELEGRAM_CB_ORDER_BOT_TOKEN", "123456:loadtest")
+
+from telegram import Bot, Update
+from telegram.request import BaseRequest, RequestData
+import telegram_bot
+import tests
+from shared.hedging import HedgedCompletions
+from metrics import percentile
+from scheduler import QUEUED
+
+FORMULAIC_MESSAGES = ["buy $25 of BTC", "sell all ETH", "buy $100 worth of SOL", "sell $40 of BTC"]
+FREEFORM_MESSAGES = [
+    "could you grab me some bitcoin with 25 bucks",
+    "i'd like to get rid of my ethereum",
+    "put a hundred dollars into solana please"
+]
+
+# Replies that tell the user their message was not handled
+ERROR_REPLIES = ("❌", "Sorry", "I couldn't")
+
+def parse_latency(spec: str) -> Callable[[], float]:
+    """
+    Build a sampler (in seconds) from a spec such as:
+    const:MS, uniform:LOW_MS,HIGH_MS, exp:MEAN_MS, lognormal:MEDIAN_MS,SIGMA
+    """
+    kind, _, params = spec.partition(":")
+    values = [float(value) for value in params.split(",") if value]
+    if kind == "const":
+        return lambda: values[0] / 1000
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1]) / 1000
+    if kind == "exp":
+        return lambda: random.expovariate(1000 / values[0])
+    if kind == "lognormal":
+        mu = math.log(values[0] / 1000)
+        return lambda: random.lognormvariate(mu, values[1])
+    raise ValueError(f"Unknown latency distribution '{spec}'")
+
+class FakeTelegramRequest(BaseRequest):
+    """Answers Bot API calls locally, echoing sent messages back as Message objects"""
+    def __init__(self, latency: Callable[[], float]):
+        self.latency = latency
+        self.calls = 0
+        # Texts sent to each chat with sendMessage
+        self.replies = defaultdict(list)
+        self._message_ids = itertools.count(1)
+
+    @property
+    def read_timeout(self) -> Optional[float]:
+        return None
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def do_request(self, url: str, method: str, request_data: Optional[RequestData] = None,
+                         read_timeout=None, write_timeout=None, connect_timeout=None,
+                         pool_timeout=None) -> Tuple[int, bytes]:
+        self.calls += 1
+        await asyncio.sleep(self.latency())
+        endpoint = url.rsplit("/", 1)[-1]
+        parameters = request_data.parameters if request_data else {}
+
+        if endpoint == "sendMessage":
+            self.replies[int(parameters["chat_id"])].append(parameters.get("text", ""))
+        if endpoint == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "LoadTest", "username": "loadtest_bot"}
+        else:
+            result = {
+                "message_id": parameters.get("message_id", next(self._message_ids)),
+                "date": int(time.time()),
+                "chat": {"id": parameters.get("chat_id", 0), "type": "private"},
+                "text": parameters.get("text", "")
+            }
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+class FakeCompletions:
+    """Stands in for the async OpenAI chat completions API"""
+    def __init__(self, latency: Callable[[], float]):
+        self.latency = latency
+        self.calls = 0
+
+    async def create(self, model, messages, tools=None, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency())
+
+        if messages[-1]["role"] == "tool":
+            message = SimpleNamespace(content="Your order was placed successfully.", tool_calls=None)
+        else:
+            arguments = json.dumps({"action": "buy", "amountInDollars": 25, "asset": "BTC"})
+            tool_call = SimpleNamespace(
+                id=f"call_{uuid.uuid4().hex[:24]}",
+                type="function",
+                function=SimpleNamespace(name="create_order", arguments=arguments)
+            )
+            message = SimpleNamespace(content=None, tool_calls=[tool_call])
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+class FakeRESTClient:
+    """Stands in for coinbase.rest.RESTClient with fixed prices and balances"""
+    latency: Callable[[], float] = staticmethod(lambda: 0.0)
+    calls = 0
+
+    def __init__(self, api_key=None, api_secret=None):
+        pass
+
+    def _wait(self):
+        FakeRESTClient.calls += 1
+        time.sleep(FakeRESTClient.latency())
+
+    def get_products(self):
+        self._wait()
+        products = [
+            SimpleNamespace(base_currency_id=asset, quote_currency_id="USDC", trading_disabled=False)
+            for asset in ("BTC", "ETH", "SOL")
+        ]
+        return SimpleNamespace(products=products)
+
+    def get_product(self, product_id):
+        self._wait()
+        return SimpleNamespace(price="100.0", base_increment="0.00000001", quote_increment="0.01")
+
+    def get_accounts(self):
+        self._wait()
+        accounts = [
+            SimpleNamespace(currency=asset, available_balance={"value": "1000"})
+            for asset in ("USDC", "BTC", "ETH", "SOL")
+        ]
+        return SimpleNamespace(accounts=accounts)
+
+    def _order(self, product_id, side):
+        self._wait()
+        return SimpleNamespace(
+            success=True,
+            success_response={"order_id": str(uuid.uuid4()), "product_id": product_id, "side": side}
+        )
+
+    def market_order_buy(self, client_order_id, product_id, quote_size):
+        return self._order(product_id, "BUY")
+
+    def market_order_sell(self, client_order_id, product_id, base_size):
+        return self._order(product_id, "SELL")
+
+def build_update(bot: Bot, update_id: int, chat_id: int, text: str) -> Update:
+    data = {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Load"},
+            "text": text
+        }
+    }
+    return Update.de_json(data, bot)
+
+async def monitor_loop_lag(samples: list, interval: float = 0.01) -> None:
+    """Record how late the event loop wakes up from a fixed sleep"""
+    while True:
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, time.perf_counter() - expected))
+
+async def run_load_test(args) -> dict:
+    telegram_request = FakeTelegramRequest(parse_latency(args.telegram_latency))
+    bot = Bot(os.environ["TELEGRAM_CB_ORDER_BOT_TOKEN"], request=telegram_request)
+    await bot.initialize()
+
+    fake_completions = FakeCompletions(parse_latency(args.openai_latency))
+    telegram_bot.completions = (
+        HedgedCompletions(fake_completions) if telegram_bot.OPENAI_HEDGING else fake_completions
+    )
+    FakeRESTClient.latency = staticmethod(parse_latency(args.coinbase_latency))
+    tests.RESTClient = FakeRESTClient
+
+    texts = [
+        random.choice(FORMULAIC_MESSAGES if random.random() < args.formulaic_ratio else FREEFORM_MESSAGES)
+        for _ in range(args.messages)
+    ]
+    latencies = []
+    errors = 0
+    refused = 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    # The scheduler calls handle_message through the module, so it can be wrapped to see when a
+    # message is done and which replies it sent (a chat's messages are handled one at a time)
+    handle_message = telegram_bot.handle_message
+    handled = {}
+
+    async def handle_and_report(update, context) -> None:
+        replies = telegram_request.replies[update.effective_chat.id]
+        sent = len(replies)
+        try:
+            await handle_message(update, context)
+        finally:
+            handled.pop(update.update_id).set_result(replies[sent:])
+
+    telegram_bot.handle_message = handle_and_report
+    scheduler = telegram_bot.scheduler
+    scheduler.workers = args.workers
+    scheduler.start()
+
+    async def process(update_id: int, text: str) -> None:
+        nonlocal errors, refused
+        update = build_update(bot, update_id, chat_id=update_id % args.chats + 1, text=text)
+        started = time.perf_counter()
+        done = handled[update_id] = asyncio.get_running_loop().create_future()
+        status = await telegram_bot.enqueue_message(update, None)
+        if status != QUEUED:
+            # Busy or coalesced with a pending instruction: the user was told so and nothing ran
+            del handled[update_id]
+            refused += 1
+            return
+        replies = await done
+        if not replies or any(reply.startswith(ERROR_REPLIES) for reply in replies):
+            errors += 1
+        else:
+            latencies.append(time.perf_counter() - started)
+
+    async def closed_loop(update_id: int, text: str) -> None:
+        async with semaphore:
+            await process(update_id, text)
+
+    lag_samples = []
+    monitor = asyncio.create_task(monitor_loop_lag(lag_samples))
+    started = time.perf_counter()
+    if args.rate:
+        # Open loop: inject at a fixed rate regardless of how fast messages complete
+        tasks = []
+        for update_id, text in enumerate(texts, start=1):
+            tasks.append(asyncio.create_task(process(update_id, text)))
+            await asyncio.sleep(1 / args.rate)
+        await asyncio.gather(*tasks)
+    else:
+        await asyncio.gather(*(closed_loop(update_id, text) for update_id, text in enumerate(texts, start=1)))
+    elapsed = time.perf_counter() - started
+    monitor.cancel()
+    await scheduler.stop()
+    telegram_bot.handle_message = handle_message
+    await bot.shutdown()
+
+    return {
+        "messages": args.messages,
+        "errors": errors,
+        "refused": refused,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_msg_s": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            f"p{pct}": round(percentile(latencies, pct) * 1000, 1) for pct in (50, 95, 99)
+        },
+        "loop_lag_ms": {
+            "p50": round(percentile(lag_samples, 50) * 1000, 1),
+            "p99": round(percentile(lag_samples, 99) * 1000, 1),
+            "max": round(max(lag_samples, default=0.0) * 1000, 1)
+        },
+        "backend_calls": {
+            "telegram": telegram_request.calls,
+            "openai": fake_completions.calls,
+            "coinbase": FakeRESTClient.calls
+        },
+        "intent_fast_path": telegram_bot.intent_parser.format_stats(),
+        "hedging": telegram_bot.completions.format_stats() if telegram_bot.OPENAI_HEDGING else "disabled",
+        "scheduler": scheduler.format_stats(),
+        "reply_mode": telegram_bot.REPLY_MODE
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the Telegram bot handlers against local fakes")
+    parser.add_argument("--messages", type=int, default=200, help="Number of synthetic updates to send")
+    parser.add_argument("--concurrency", type=int, default=20, help="Messages in flight at once (closed loop)")
+    parser.add_argument("--rate", type=float, default=None, help="Inject at this many messages/s instead (open loop)")
+    parser.add_argument("--chats", type=int, default=50, help="Number of distinct chats the messages come from")
+    parser.add_argument("--workers", type=int, default=telegram_bot.scheduler.workers,
+                        help="Scheduler workers, i.e. messages handled at once (default: TELEGRAM_SCHEDULER_WORKERS)")
+    parser.add_argument("--formulaic-ratio", type=float, default=0.7, help="Share of messages the local intent parser can handle")
+    parser.add_argument("--openai-latency", default="lognormal:700,0.4")
+    parser.add_argument("--coinbase-latency", default="lognormal:150,0.3")
+    parser.add_argument("--telegram-latency", default="const:50")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-loop-lag-ms", type=float, default=50.0,
+                        help="Fail if the event-loop lag p99 is above this, i.e. something blocked the loop (0 to disable)")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    result = asyncio.run(run_load_test(args))
+    print(json.dumps(result, indent=2))
+    lag = result["loop_lag_ms"]["p99"]
+    if args.max_loop_lag_ms and lag > args.max_loop_lag_ms:
+        print(f"Event-loop lag p99 {lag}ms is above {args.max_loop_lag_ms:g}ms: a blocking call runs on the loop",
+              file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
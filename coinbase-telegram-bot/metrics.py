@@ -0,0 +1,60 @@
+import math
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Dict, List
+
+def percentile(values: List[float], pct: float) -> float:
+    """Return the pct-th percentile (0-100) of values using nearest-rank"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+class LatencyStats:
+    """
+    Keeps a bounded window of latency samples per (label, stage).
+    The label is typically the mode being compared (e.g. the reply mode).
+    """
+    def __init__(self, max_samples: int = 1000):
+        self._samples = defaultdict(lambda: deque(maxlen=max_samples))
+
+    def record(self, label: str, stage: str, seconds: float) -> None:
+        """Record a single latency sample in seconds"""
+        self._samples[(label, stage)].append(seconds)
+
+    @contextmanager
+    def measure(self, label: str, stage: str):
+        """Time the enclosed block; failed blocks are not recorded"""
+        started = time.perf_counter()
+        yield
+        self.record(label, stage, time.perf_counter() - started)
+
+    def summary(self) -> Dict[str, Dict[str, dict]]:
+        """
+        Summarize the collected samples
+        Returns: {label: {stage: {count, mean_ms, p50_ms, p95_ms}}}
+        """
+        result = defaultdict(dict)
+        for (label, stage), samples in self._samples.items():
+            values = list(samples)
+            result[label][stage] = {
+                "count": len(values),
+                "mean_ms": round(sum(values) / len(values) * 1000, 1) if values else 0.0,
+                "p50_ms": round(percentile(values, 50) * 1000, 1),
+                "p95_ms": round(percentile(values, 95) * 1000, 1)
+            }
+        return dict(result)
+
+    def format_summary(self) -> str:
+        """Human readable summary, one line per stage"""
+        lines = []
+        for label, stages in sorted(self.summary().items()):
+            lines.append(f"[{label}]")
+            for stage, stats in stages.items():
+                lines.append(
+                    f"  {stage}: n={stats['count']} mean={stats['mean_ms']}ms "
+                    f"p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms"
+                )
+        return "\n".join(lines) if lines else "No latency samples recorded yet."
@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional
+from metrics import LatencyStats
+
+QUEUED = "queued"
+DUPLICATE = "duplicate"
+BUSY = "busy"
+
+class _Job:
+    __slots__ = ("key", "run", "enqueued_at")
+
+    def __init__(self, key: Optional[str], run: Callable[[], Awaitable[None]]):
+        self.key = key
+        self.run = run
+        self.enqueued_at = time.perf_counter()
+
+class FairScheduler:
+    """
+    Dispatches jobs from many chats fairly:
+    - each chat has a bounded queue and its jobs run one at a time, in order
+    - chats take turns round-robin, a chat with weight w runs up to w jobs per turn
+    - a job whose key matches one already pending in the same chat is coalesced
+    - submissions are refused (BUSY) when the chat's queue or the global limit is full
+    """
+    def __init__(self, workers: int = 4, max_per_chat: int = 5, max_pending: int = 1000):
+        self.workers = workers
+        self.max_per_chat = max_per_chat
+        self.max_pending = max_pending
+        self._queues: Dict[int, deque] = {}
+        self._weights: Dict[int, int] = {}
+        self._scheduled = set()
+        self._ready: Optional[asyncio.Queue] = None
+        self._tasks = []
+        self.pending = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.latency_stats = LatencyStats()
+
+    def set_weight(self, chat_id: int, weight: int) -> None:
+        """Let a chat run up to `weight` jobs per round-robin turn"""
+        self._weights[chat_id] = max(1, weight)
+
+    def start(self) -> None:
+        """Start the worker tasks; must be called from the running event loop"""
+        self._ready = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        # Chats submitted before start are waiting in _scheduled
+        for chat_id in self._scheduled:
+            self._ready.put_nowait(chat_id)
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, chat_id: int, key: Optional[str], run: Callable[[], Awaitable[None]]) -> str:
+        """
+        Queue run() for chat_id
+        Returns: QUEUED, DUPLICATE (coalesced with a pending job) or BUSY (queues full)
+        """
+        queue = self._queues.setdefault(chat_id, deque())
+        if key is not None and any(job.key == key for job in queue):
+            self.coalesced += 1
+            return DUPLICATE
+        if len(queue) >= self.max_per_chat or self.pending >= self.max_pending:
+            self.rejected += 1
+            if not queue and chat_id not in self._scheduled:
+                del self._queues[chat_id]
+            return BUSY
+
+        queue.append(_Job(key, run))
+        self.pending += 1
+        if chat_id not in self._scheduled:
+            self._scheduled.add(chat_id)
+            if self._ready is not None:
+                self._ready.put_nowait(chat_id)
+        return QUEUED
+
+    async def _worker(self) -> None:
+        while True:
+            chat_id = await self._ready.get()
+            queue = self._queues[chat_id]
+            for _ in range(self._weights.get(chat_id, 1)):
+                if not queue:
+                    break
+                job = queue.popleft()
+                self.pending -= 1
+                self.latency_stats.record("scheduler", "wait", time.perf_counter() - job.enqueued_at)
+                try:
+                    await job.run()
+                except Exception as e:
+                    logging.error(f"Scheduled job for chat {chat_id} failed: {str(e)}")
+
+            if queue:
+                # Back of the line so other chats get their turn
+                self._ready.put_nowait(chat_id)
+            else:
+                self._scheduled.discard(chat_id)
+                del self._queues[chat_id]
+
+    def depths(self) -> Dict[int, int]:
+        """Pending jobs per chat"""
+        return {chat_id: len(queue) for chat_id, queue in self._queues.items() if queue}
+
+    def format_stats(self) -> str:
+        depths = self.depths()
+        wait = self.latency_stats.summary().get("scheduler", {}).get("wait", {})
+        return (
+            f"Queue: {self.pending} pending across {len(depths)} chats "
+            f"(deepest {max(depths.values(), default=0)}), "
+            f"{self.coalesced} coalesced, {self.rejected} rejected as busy, "
+            f"wait p50={wait.get('p50_ms', 0.0)}ms p95={wait.get('p95_ms', 0.0)}ms"
+        )
@@ -0,0 +1,104 @@
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+def estimate_tokens(message: dict) -> int:
+    """Rough token count (~4 characters per token plus per-message overhead)"""
+    return len(message["content"]) // 4 + 4
+
+class ChatSession:
+    """Compact history of one chat: plain user/assistant text messages only"""
+    __slots__ = ("messages", "tokens", "last_used")
+
+    def __init__(self, messages: Optional[List[dict]] = None):
+        self.messages = messages or []
+        self.tokens = sum(estimate_tokens(message) for message in self.messages)
+        self.last_used = time.monotonic()
+
+class SessionStore:
+    """
+    Per-chat conversation memory with predictable size:
+    - each chat keeps at most max_tokens of history, oldest messages dropped first
+    - at most max_chats sessions are held in memory (least recently used evicted)
+    - sessions idle for idle_seconds are evicted
+    - evicted sessions are spilled to a SQLite file when db_path is set, otherwise dropped
+    """
+    def __init__(self, max_tokens: int = 1000, max_chats: int = 10000,
+                 idle_seconds: float = 1800, db_path: Optional[str] = None):
+        self.max_tokens = max_tokens
+        self.max_chats = max_chats
+        self.idle_seconds = idle_seconds
+        self._sessions: "OrderedDict[int, ChatSession]" = OrderedDict()
+        self._connection = None
+        if db_path:
+            self._connection = sqlite3.connect(db_path, isolation_level=None)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS sessions (chat_id INTEGER PRIMARY KEY, messages TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+        self.evictions = 0
+
+    def _spill(self, chat_id: int, session: ChatSession) -> None:
+        self.evictions += 1
+        if self._connection is not None and session.messages:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO sessions (chat_id, messages, updated_at) VALUES (?, ?, ?)",
+                (chat_id, json.dumps(session.messages), time.time())
+            )
+
+    def _load(self, chat_id: int) -> ChatSession:
+        if self._connection is not None:
+            row = self._connection.execute(
+                "SELECT messages FROM sessions WHERE chat_id = ?", (chat_id,)
+            ).fetchone()
+            if row:
+                return ChatSession(json.loads(row[0]))
+        return ChatSession()
+
+    def _evict_idle(self) -> None:
+        # Sessions are kept in recency order, so idle ones are at the front
+        cutoff = time.monotonic() - self.idle_seconds
+        while self._sessions:
+            chat_id, session = next(iter(self._sessions.items()))
+            if session.last_used >= cutoff:
+                break
+            self._sessions.popitem(last=False)
+            self._spill(chat_id, session)
+
+    def _get(self, chat_id: int) -> ChatSession:
+        self._evict_idle()
+        session = self._sessions.get(chat_id)
+        if session is None:
+            session = self._load(chat_id)
+            self._sessions[chat_id] = session
+            while len(self._sessions) > self.max_chats:
+                evicted_id, evicted = self._sessions.popitem(last=False)
+                self._spill(evicted_id, evicted)
+        else:
+            self._sessions.move_to_end(chat_id)
+        session.last_used = time.monotonic()
+        return session
+
+    def history(self, chat_id: int) -> List[dict]:
+        """Return a copy of the chat's history, ready to prepend to a request"""
+        return list(self._get(chat_id).messages)
+
+    def append(self, chat_id: int, role: str, content: str) -> None:
+        """Add a message to the chat's history, trimming the oldest ones over the token cap"""
+        session = self._get(chat_id)
+        message = {"role": role, "content": content}
+        session.messages.append(message)
+        session.tokens += estimate_tokens(message)
+        while session.tokens > self.max_tokens and len(session.messages) > 1:
+            session.tokens -= estimate_tokens(session.messages.pop(0))
+
+    def clear(self, chat_id: int) -> None:
+        """Forget the chat's history, in memory and on disk"""
+        self._sessions.pop(chat_id, None)
+        if self._connection is not None:
+            self._connection.execute("DELETE FROM sessions WHERE chat_id = ?", (chat_id,))
+
+    def format_stats(self) -> str:
+        tokens = sum(session.tokens for session in self._sessions.values())
+        return f"Sessions: {len(self._sessions)} in memory (~{tokens} tokens), {self.evictions} evicted"
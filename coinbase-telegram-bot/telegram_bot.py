@@ -1,10 +1,26 @@
+import asyncio
 import json
 import logging
-from telegram import Update
+import time
+import sys
+from telegram import Message, Update
 from telegram.ext import Application, CommandHandler, MessageHandler, ContextTypes, filters
-from openai import OpenAI
 import os
-from tests import tools, create_order
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from shared import cassettes
+from shared.hedging import HedgedCompletions
+from shared.model_router import ModelRouter, models_from_env
+from shared.openai_clients import get_async_client, prewarm_async, stats as connection_stats
+from tests import tools, create_order, get_usdc_assets
+from metrics import LatencyStats
+from intent_parser import IntentParser, build_tool_call_message
+from sessions import SessionStore
+from scheduler import FairScheduler, BUSY, DUPLICATE
+from webhook import run_webhook
+
+# Record Coinbase calls next to the OpenAI traffic, or serve them from a recording (CASSETTE_MODE)
+create_order = cassettes.wrap(create_order, "coinbase")
+get_usdc_assets = cassettes.wrap(get_usdc_assets, "coinbase")
 
 # Enable logging
 logging.basicConfig(
@@ -12,90 +28,243 @@ logging.basicConfig(
     level=logging.INFO
 )
 
-# Initialize OpenAI client
-client = OpenAI()
+# Initialize OpenAI client (shares one tuned connection pool)
+client = get_async_client("interactive")
+
+# Open the API connection at startup so the first trade does not pay for it
+OPENAI_PREWARM = os.getenv("OPENAI_PREWARM", "true").lower() == "true"
+
+# Completion calls have no side effects, so they may be hedged (opt-in)
+OPENAI_HEDGING = os.getenv("OPENAI_HEDGING", "false").lower() == "true"
+completions = HedgedCompletions(
+    client.chat.completions,
+    percentile=float(os.getenv("OPENAI_HEDGING_PERCENTILE", "90"))
+) if OPENAI_HEDGING else client.chat.completions
+
+# Models per phase, fastest first: the trade intent stays on the large model unless configured,
+# the confirmation only phrases a result that is already known
+router = ModelRouter(
+    {
+        "intent": models_from_env("intent", "gpt-4o"),
+        "confirmation": models_from_env("confirmation", "gpt-4o-mini,gpt-4o"),
+    },
+    budgets={"intent": 3.0, "confirmation": 3.0}
+)
+
+# How updates reach the bot: "polling" (default) or "webhook"
+TELEGRAM_MODE = os.getenv("TELEGRAM_MODE", "polling").lower()
+
+# How the bot confirms a trade:
+# - "llm": ask the model to phrase the confirmation (two model calls per trade)
+# - "fast": reply with a templated confirmation as soon as the order result is back
+# - "fast_edit": like "fast", then edit the message in place with the model's phrasing
+REPLY_MODES = ("llm", "fast", "fast_edit")
+REPLY_MODE = os.getenv("TELEGRAM_REPLY_MODE", "llm").lower()
+if REPLY_MODE not in REPLY_MODES:
+    logging.warning(f"Unknown TELEGRAM_REPLY_MODE '{REPLY_MODE}', falling back to 'llm'")
+    REPLY_MODE = "llm"
+
+# Per-stage latency samples, grouped by reply mode
+latency_stats = LatencyStats()
+
+# Local parser for formulaic commands; anything it is not sure about goes to the model
+INTENT_FAST_PATH = os.getenv("TELEGRAM_INTENT_FAST_PATH", "true").lower() == "true"
+intent_parser = IntentParser(get_usdc_assets, ttl_seconds=float(os.getenv("TELEGRAM_ASSET_CACHE_TTL", "3600")))
+
+# Bounded per-chat conversation memory so follow-ups like "now sell half of it" work
+session_store = SessionStore(
+    max_tokens=int(os.getenv("TELEGRAM_SESSION_TOKENS", "1000")),
+    max_chats=int(os.getenv("TELEGRAM_SESSION_MAX_CHATS", "10000")),
+    idle_seconds=float(os.getenv("TELEGRAM_SESSION_IDLE_SECONDS", "1800")),
+    db_path=os.getenv("TELEGRAM_SESSION_DB") or None
+)
+
+# Fair per-chat queueing in front of handle_message so one chat can't monopolize the bot
+scheduler = FairScheduler(
+    workers=int(os.getenv("TELEGRAM_SCHEDULER_WORKERS", "4")),
+    max_per_chat=int(os.getenv("TELEGRAM_SCHEDULER_MAX_PER_CHAT", "5")),
+    max_pending=int(os.getenv("TELEGRAM_SCHEDULER_MAX_PENDING", "1000"))
+)
+
+def summarize_order(result: dict) -> str:
+    """One-line description of a successful order, kept in the chat history"""
+    base, quote = result['product_id'].split('-')
+    if result['side'].upper() == "BUY":
+        amount = f"spent {result['rounded_amount']} {quote} on {base}"
+    else:
+        amount = f"sold {result['rounded_amount']} {base} for {quote}"
+    return f"Order {result['order_id']} executed: {amount} at ${result['price']} per {base}."
+
+def parse_trade_call(completion):
+    """(assistant_message, tool_call_id, args) from the model's create_order call, or None if it is unusable"""
+    try:
+        assistant_message = completion.choices[0].message
+        tool_call = assistant_message.tool_calls[0]
+        args = json.loads(tool_call.function.arguments)
+        missing = [name for name in ("action", "amountInDollars", "asset") if name not in args]
+        if missing:
+            raise KeyError(", ".join(missing))
+        return assistant_message, tool_call.id, args
+    except (IndexError, json.JSONDecodeError, AttributeError, TypeError, KeyError) as e:
+        logging.error(f"Tool call processing error: {str(e)}")
+        return None
+
+def format_order_confirmation(result: dict) -> str:
+    """Build the templated confirmation for a successful order"""
+    return (
+        f"✅ Trade executed successfully!\n"
+        f"Order ID: {result['order_id']}\n"
+        f"Product: {result['product_id']}\n"
+        f"Side: {result['side']}\n"
+        f"Price: ${result['price']}\n"
+        f"Amount: {result['rounded_amount']}"
+    )
+
+async def edit_with_llm_reply(sent_message: Message, messages: list) -> None:
+    """Replace a templated confirmation with the model's phrasing, keeping the template on failure"""
+    try:
+        with latency_stats.measure(REPLY_MODE, "llm_edit"):
+            with router.call("confirmation") as route:
+                completion_2 = await completions.create(
+                    model=route.model,
+                    messages=messages,
+                    tools=tools,
+                )
+                route.add_usage(completion_2.usage)
+            content = completion_2.choices[0].message.content
+            if content:
+                await sent_message.edit_text(content)
+    except Exception as e:
+        logging.warning(f"Could not edit confirmation with model reply: {str(e)}")
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Send a message when the command /start is issued."""
     await update.message.reply_text('Hi! Send me your crypto trading instructions.')
 
+async def reset(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Forget the conversation when the command /reset is issued."""
+    session_store.clear(update.effective_chat.id)
+    await update.message.reply_text('Conversation cleared.')
+
+async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Send the per-stage latency summary when the command /stats is issued."""
+    await update.message.reply_text(
+        latency_stats.format_summary() + "\n" + intent_parser.format_stats()
+        + ("\n" + completions.format_stats() if OPENAI_HEDGING else "")
+        + "\n" + session_store.format_stats()
+        + "\n" + scheduler.format_stats()
+        + "\n" + connection_stats.format_stats()
+        + "\n" + router.format_stats()
+        + ("\n" + cassettes.active().format_stats() if cassettes.active() else "")
+    )
+
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Process the user's message and execute the trading logic."""
+    started = time.perf_counter()
     try:
         user_input = update.message.text
+        chat_id = update.effective_chat.id
         
-        # Create the messages array for the OpenAI API
-        messages = [{
+        # Create the messages array for the OpenAI API, after the chat's earlier turns
+        messages = session_store.history(chat_id) + [{
             "role": "user",
             "content": user_input
         }]
 
-        try:
-            # Get the completion from OpenAI
-            completion = client.chat.completions.create(
-                model="gpt-4o",
-                messages=messages,
-                tools=tools,
-            )
-        except Exception as e:
-            await update.message.reply_text(
-                "Sorry, I'm having trouble understanding your request. Please try rephrasing it.\n"
-                "For example: 'Buy $100 worth of BTC' or 'Sell all my ETH'"
-            )
-            logging.error(f"OpenAI API error: {str(e)}")
-            return
+        args = None
+        if INTENT_FAST_PATH:
+            with latency_stats.measure(REPLY_MODE, "intent_local"):
+                # Off the event loop: a stale asset list is reloaded from Coinbase
+                args = await asyncio.to_thread(intent_parser.parse, user_input)
 
-        try:
-            tool_call = completion.choices[0].message.tool_calls[0]
-            args = json.loads(tool_call.function.arguments)
-        except (IndexError, json.JSONDecodeError, AttributeError) as e:
-            await update.message.reply_text(
-                "I couldn't process your trading instruction. Please make sure to specify:\n"
-                "1. Action (buy/sell)\n"
-                "2. Amount (a number or 'all')\n"
-                "3. Cryptocurrency (e.g., BTC, ETH)\n\n"
-                "Example: 'Buy $500 worth of ETH' or 'Sell all my BTC'"
-            )
-            logging.error(f"Tool call processing error: {str(e)}")
-            return
+        if args is not None:
+            assistant_message, tool_call_id = build_tool_call_message(args)
+        else:
+            # Get the completion from OpenAI; an unusable tool call is asked again of the next larger model
+            model = None
+            while True:
+                try:
+                    with latency_stats.measure(REPLY_MODE, "intent"), router.call("intent", model) as route:
+                        completion = await completions.create(
+                            model=route.model,
+                            messages=messages,
+                            tools=tools,
+                        )
+                        route.add_usage(completion.usage)
+                        parsed = parse_trade_call(completion)
+                        if parsed is None:
+                            route.reject()
+                except Exception as e:
+                    await update.message.reply_text(
+                        "Sorry, I'm having trouble understanding your request. Please try rephrasing it.\n"
+                        "For example: 'Buy $100 worth of BTC' or 'Sell all my ETH'"
+                    )
+                    logging.error(f"OpenAI API error: {str(e)}")
+                    return
+                model = router.escalate("intent", route.model) if parsed is None else None
+                if model is None:
+                    break
+
+            if parsed is None:
+                await update.message.reply_text(
+                    "I couldn't process your trading instruction. Please make sure to specify:\n"
+                    "1. Action (buy/sell)\n"
+                    "2. Amount (a number or 'all')\n"
+                    "3. Cryptocurrency (e.g., BTC, ETH)\n\n"
+                    "Example: 'Buy $500 worth of ETH' or 'Sell all my BTC'"
+                )
+                return
+            assistant_message, tool_call_id, args = parsed
 
         try:
             # Execute the trade
-            result = create_order(args["action"], args["amountInDollars"], args["asset"])
+            with latency_stats.measure(REPLY_MODE, "order"):
+                # The Coinbase client blocks; other chats' messages keep being handled meanwhile
+                result = await asyncio.to_thread(create_order, args["action"], args["amountInDollars"], args["asset"])
             
+            session_store.append(chat_id, "user", user_input)
             if not result.get("success", False):
                 error_message = result.get("error", "Unknown error occurred")
+                session_store.append(chat_id, "assistant", f"Order failed: {error_message}")
                 await update.message.reply_text(
                     f"❌ Trading error: {error_message}\n"
                     "Please check your balance and try again."
                 )
                 return
 
-            messages.append(completion.choices[0].message)
+            session_store.append(chat_id, "assistant", summarize_order(result))
+
+            messages.append(assistant_message)
             messages.append({
                 "role": "tool",
-                "tool_call_id": tool_call.id,
+                "tool_call_id": tool_call_id,
                 "content": str(result)
             })
 
+            if REPLY_MODE != "llm":
+                # Confirm right away without waiting for a second model call
+                with latency_stats.measure(REPLY_MODE, "reply"):
+                    sent_message = await update.message.reply_text(format_order_confirmation(result))
+                latency_stats.record(REPLY_MODE, "total", time.perf_counter() - started)
+                if REPLY_MODE == "fast_edit":
+                    await edit_with_llm_reply(sent_message, messages)
+                return
+
             # Get the final response
             try:
-                completion_2 = client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=messages,
-                    tools=tools,
-                )
-                await update.message.reply_text(completion_2.choices[0].message.content)
+                with latency_stats.measure(REPLY_MODE, "reply"):
+                    with router.call("confirmation") as route:
+                        completion_2 = await completions.create(
+                            model=route.model,
+                            messages=messages,
+                            tools=tools,
+                        )
+                        route.add_usage(completion_2.usage)
+                    await update.message.reply_text(completion_2.choices[0].message.content)
             except Exception as e:
                 # If we can't get the nice formatted message, at least show the successful result
-                await update.message.reply_text(
-                    f"✅ Trade executed successfully!\n"
-                    f"Order ID: {result['order_id']}\n"
-                    f"Product: {result['product_id']}\n"
-                    f"Side: {result['side']}\n"
-                    f"Price: ${result['price']}\n"
-                    f"Amount: {result['rounded_amount']}"
-                )
+                await update.message.reply_text(format_order_confirmation(result))
+            latency_stats.record(REPLY_MODE, "total", time.perf_counter() - started)
 
         except KeyError as e:
             await update.message.reply_text(
@@ -123,17 +292,58 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         logging.error(f"Unexpected error: {str(e)}")
         return
 
-def main() -> None:
-    """Start the bot."""
-    # Create the Application and pass it your bot's token
-    application = Application.builder().token(os.environ['TELEGRAM_CB_ORDER_BOT_TOKEN']).build()
+async def enqueue_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> str:
+    """Queue the message for handle_message, or tell the user to wait if the queues are full. Returns the scheduler status."""
+    # Identical pending instructions from the same chat are coalesced
+    key = " ".join(update.message.text.lower().split())
+    status = scheduler.submit(update.effective_chat.id, key, lambda: handle_message(update, context))
+    if status == DUPLICATE:
+        await update.message.reply_text("⏳ That instruction is already queued.")
+    elif status == BUSY:
+        await update.message.reply_text(
+            "⏳ I'm busy with other requests right now. Please try again in a moment."
+        )
+    return status
+
+async def post_init(application: Application) -> None:
+    """Start the scheduler workers (and prewarm the OpenAI connection) once the event loop is running."""
+    scheduler.start()
+    if OPENAI_PREWARM:
+        application.create_task(prewarm_async())
+
+def build_application() -> Application:
+    """Create the Application with all handlers registered."""
+    builder = Application.builder().token(os.environ['TELEGRAM_CB_ORDER_BOT_TOKEN']).post_init(post_init)
+    if TELEGRAM_MODE == "webhook":
+        # Updates are pushed to our own HTTP server, so no Updater is needed
+        builder = builder.updater(None)
+    application = builder.build()
 
     # Add handlers
     application.add_handler(CommandHandler("start", start))
-    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+    application.add_handler(CommandHandler("stats", stats))
+    application.add_handler(CommandHandler("reset", reset))
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, enqueue_message))
+    return application
+
+def main() -> None:
+    """Start the bot."""
+    if TELEGRAM_MODE == "webhook":
+        run_webhook(
+            build_application,
+            host=os.getenv("TELEGRAM_WEBHOOK_HOST", "0.0.0.0"),
+            port=int(os.getenv("TELEGRAM_WEBHOOK_PORT", "8443")),
+            url_path=os.getenv("TELEGRAM_WEBHOOK_PATH", "/telegram"),
+            dedup_path=os.getenv("TELEGRAM_UPDATE_DB", os.path.join(os.path.dirname(__file__), "claimed_updates.db")),
+            secret_token=os.getenv("TELEGRAM_WEBHOOK_SECRET"),
+            webhook_url=os.getenv("TELEGRAM_WEBHOOK_URL"),
+            workers=int(os.getenv("TELEGRAM_WEBHOOK_WORKERS", "1"))
+        )
+        return
 
     # Run the bot until the user presses Ctrl-C
+    application = build_application()
     application.run_polling(allowed_updates=Update.ALL_TYPES)
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -38,6 +38,19 @@ def get_balance(client: RESTClient, asset):
 def get_usdc_balance(client):
     return get_balance(client, "USDC")
 
+def get_usdc_assets():
+    """Return the symbols of every asset that can be traded against USDC"""
+    coinbase_client = RESTClient(
+        api_key=os.getenv("COINBASE_API_KEY"),
+        api_secret=os.getenv("COINBASE_API_SECRET")
+    )
+    products = coinbase_client.get_products()
+    return {
+        product.base_currency_id
+        for product in products.products
+        if product.quote_currency_id == "USDC" and not getattr(product, "trading_disabled", False)
+    }
+
 def create_order(action, amountInDollars, asset):
     try:
         # Initialize Coinbase client (uses API key and secret from environment variables)
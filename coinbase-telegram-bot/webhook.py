@@ -0,0 +1,187 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import sqlite3
+import time
+from typing import Callable, Optional
+from telegram import Update
+from telegram.ext import Application
+
+MAX_BODY_BYTES = 1024 * 1024
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    403: "Forbidden",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large"
+}
+
+class UpdateDeduplicator:
+    """
+    Remembers claimed update IDs in a SQLite file shared by every worker process,
+    so an update redelivered by Telegram or routed twice by a load balancer is
+    only handled once. Updates are claimed before they are processed: a crash
+    mid-update drops it rather than risking a second order.
+    """
+    def __init__(self, path: str, retention_seconds: float = 24 * 3600):
+        self.retention_seconds = retention_seconds
+        self._connection = sqlite3.connect(path, timeout=5, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS claimed_updates (update_id INTEGER PRIMARY KEY, claimed_at REAL NOT NULL)"
+        )
+        self._last_prune = 0.0
+
+    def claim(self, update_id: int) -> bool:
+        """Return True if this process is the first to claim update_id"""
+        now = time.time()
+        if now - self._last_prune > 60:
+            self._connection.execute(
+                "DELETE FROM claimed_updates WHERE claimed_at < ?", (now - self.retention_seconds,)
+            )
+            self._last_prune = now
+        cursor = self._connection.execute(
+            "INSERT OR IGNORE INTO claimed_updates (update_id, claimed_at) VALUES (?, ?)", (update_id, now)
+        )
+        return cursor.rowcount == 1
+
+    def close(self) -> None:
+        self._connection.close()
+
+class WebhookServer:
+    """
+    Minimal asyncio HTTP server that receives Telegram webhook POSTs and feeds
+    them into the application's update queue. GET /healthz answers 200 for load
+    balancer health checks.
+    """
+    def __init__(self, application: Application, deduplicator: UpdateDeduplicator,
+                 url_path: str = "/telegram", secret_token: Optional[str] = None):
+        self.application = application
+        self.deduplicator = deduplicator
+        self.url_path = url_path
+        self.secret_token = secret_token
+        self.received = 0
+        self.duplicates = 0
+
+    async def _dispatch(self, method: str, path: str, headers: dict, body: bytes) -> int:
+        if method == "GET" and path == "/healthz":
+            return 200
+        if path != self.url_path:
+            return 404
+        if method != "POST":
+            return 405
+        if self.secret_token and headers.get("x-telegram-bot-api-secret-token") != self.secret_token:
+            return 403
+
+        try:
+            data = json.loads(body)
+            update = Update.de_json(data, self.application.bot)
+        except Exception as e:
+            logging.warning(f"Rejected malformed webhook update: {str(e)}")
+            return 400
+
+        self.received += 1
+        if not self.deduplicator.claim(update.update_id):
+            self.duplicates += 1
+            logging.info(f"Skipping duplicate update {update.update_id}")
+            return 200
+
+        await self.application.update_queue.put(update)
+        return 200
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY_BYTES:
+                    status = 413
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    status = await self._dispatch(method, path.split("?", 1)[0], headers, body)
+                    keep_alive = headers.get("connection", "").lower() != "close"
+
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                    f"Content-Length: 0\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1")
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError) as e:
+            logging.debug(f"Closing webhook connection: {str(e)}")
+        finally:
+            writer.close()
+
+    async def serve(self, host: str, port: int, reuse_port: bool = False) -> None:
+        """Run the application and the HTTP server until cancelled"""
+        async with self.application:
+            # run_polling/run_webhook call post_init themselves; we replace them here
+            if self.application.post_init:
+                await self.application.post_init(self.application)
+            await self.application.start()
+            server = await asyncio.start_server(self._handle_connection, host, port, reuse_port=reuse_port)
+            logging.info(f"Webhook server listening on {host}:{port}{self.url_path}")
+            try:
+                async with server:
+                    await server.serve_forever()
+            finally:
+                await self.application.stop()
+
+def _run_worker(build_application: Callable[[], Application], host: str, port: int, url_path: str,
+                secret_token: Optional[str], dedup_path: str, reuse_port: bool) -> None:
+    application = build_application()
+    deduplicator = UpdateDeduplicator(dedup_path)
+    server = WebhookServer(application, deduplicator, url_path, secret_token)
+    try:
+        asyncio.run(server.serve(host, port, reuse_port=reuse_port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        deduplicator.close()
+
+def run_webhook(build_application: Callable[[], Application], host: str, port: int, url_path: str,
+                dedup_path: str, secret_token: Optional[str] = None, webhook_url: Optional[str] = None,
+                workers: int = 1) -> None:
+    """
+    Serve the bot over webhooks with `workers` processes sharing the port (SO_REUSEPORT).
+    If webhook_url is given, Telegram is told to deliver updates there first.
+    """
+    if webhook_url:
+        application = build_application()
+        asyncio.run(application.bot.set_webhook(
+            url=webhook_url, secret_token=secret_token, allowed_updates=Update.ALL_TYPES
+        ))
+        logging.info(f"Webhook registered at {webhook_url}")
+
+    args = (build_application, host, port, url_path, secret_token, dedup_path, workers > 1)
+    if workers <= 1:
+        _run_worker(*args)
+        return
+
+    processes = [multiprocessing.Process(target=_run_worker, args=args, daemon=True) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
@@ -0,0 +1,371 @@
+"""
+Record and replay of outbound calls, for offline performance regression runs.
+
+With CASSETTE_MODE=record every OpenAI HTTP request (through the shared
+clients) and every instrumented service call is appended to a cassette, a
+gzip-compressed JSON Lines file at CASSETTE_PATH, together with its timing:
+when it started, how long it took and, for streamed responses, when each
+chunk arrived. With CASSETTE_MODE=replay the same calls are answered from the
+cassette, in recorded order per operation, without network access.
+CASSETTE_SPEED scales the recorded delays: 1 replays at the original pace,
+10 ten times faster and 0 without any waiting, which leaves only the time
+spent in our own code.
+
+Request headers are never written (they carry API keys); request bodies are
+only kept as a digest, so replays can report calls that changed.
+"""
+import asyncio
+import atexit
+import base64
+import functools
+import gzip
+import hashlib
+import importlib
+import json
+import os
+import threading
+import time
+from collections import Counter, defaultdict, deque
+import httpx
+
+class CassetteMissing(LookupError):
+    """Replay needed a call the cassette does not have (the session went differently)"""
+
+def _encode(value):
+    """JSON-safe form of a value, keeping tuples, sets and bytes distinguishable"""
+    if isinstance(value, tuple):
+        return {"__tuple__": [_encode(item) for item in value]}
+    if isinstance(value, (set, frozenset)):
+        # Sorted so that equal sets give equal digests whatever the hash seed
+        items = sorted((_encode(item) for item in value), key=lambda item: json.dumps(item, sort_keys=True))
+        return {"__frozenset__" if isinstance(value, frozenset) else "__set__": items}
+    if isinstance(value, bytes):
+        return {"__bytes__": base64.b64encode(value).decode()}
+    if isinstance(value, list):
+        return [_encode(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): _encode(item) for key, item in value.items()}
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+def _decode(value):
+    if isinstance(value, list):
+        return [_decode(item) for item in value]
+    if isinstance(value, dict):
+        if "__tuple__" in value:
+            return tuple(_decode(item) for item in value["__tuple__"])
+        if "__bytes__" in value:
+            return base64.b64decode(value["__bytes__"])
+        if "__set__" in value:
+            return {_decode(item) for item in value["__set__"]}
+        if "__frozenset__" in value:
+            return frozenset(_decode(item) for item in value["__frozenset__"])
+        return {key: _decode(item) for key, item in value.items()}
+    return value
+
+def _digest(data) -> str:
+    if not isinstance(data, bytes):
+        data = json.dumps(_encode(data), sort_keys=True).encode()
+    return hashlib.sha1(data).hexdigest()[:12]
+
+def _encode_error(error: Exception) -> dict:
+    return {"type": f"{type(error).__module__}.{type(error).__qualname__}", "args": _encode(error.args)}
+
+def _decode_error(error: dict) -> Exception:
+    module, _, name = error["type"].rpartition(".")
+    args = _decode(error["args"])
+    try:
+        return getattr(importlib.import_module(module), name)(*args)
+    except Exception:
+        return RuntimeError(f"{error['type']}: {args}")
+
+class Cassette:
+    def __init__(self, path: str, mode: str, speed: float = 1.0):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode '{mode}', expected 'record' or 'replay'")
+        self.path = path
+        self.mode = mode
+        self.speed = speed
+        self.calls = Counter()
+        self.mismatches = 0
+        self.missing = 0
+        self.waited = 0.0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._started = time.perf_counter()
+        if mode == "record":
+            self._file = gzip.open(path, "wt", encoding="utf-8")
+        else:
+            self._entries = defaultdict(deque)
+            with gzip.open(path, "rt", encoding="utf-8") as file:
+                try:
+                    for line in file:
+                        entry = json.loads(line)
+                        self._entries[(entry["service"], entry["operation"])].append(entry)
+                except (EOFError, json.JSONDecodeError):
+                    # Recording was cut short; everything before the last complete line is usable
+                    pass
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._started
+
+    def record(self, entry: dict) -> None:
+        line = json.dumps(entry, separators=(",", ":"))
+        with self._lock:
+            if self._file.closed:
+                return
+            self.calls[entry["service"]] += 1
+            self._file.write(line + "\n")
+            # Keep what was recorded so far readable if the process is killed
+            self._file.flush()
+
+    def next(self, service: str, operation: str, digest: str = None) -> dict:
+        with self._lock:
+            entries = self._entries.get((service, operation))
+            if not entries:
+                self.missing += 1
+                raise CassetteMissing(f"No recorded {service} call left for {operation}")
+            entry = entries.popleft()
+            self.calls[service] += 1
+            if digest is not None and entry.get("request") != digest:
+                self.mismatches += 1
+        return entry
+
+    def delay(self, seconds: float) -> float:
+        """Recorded seconds scaled by the replay speed"""
+        delay = seconds / self.speed if self.speed > 0 else 0.0
+        with self._lock:
+            self.waited += delay
+        return delay
+
+    def wait(self, seconds: float) -> None:
+        delay = self.delay(seconds)
+        if delay > 0:
+            time.sleep(delay)
+
+    def wrap(self, function, service: str, operation: str = None, method: bool = False, missing=None):
+        """
+        Record or replay calls to `function`. method=True leaves `self` out of the request digest.
+        missing: exception class raised when a replay runs out of calls (default CassetteMissing)
+        """
+        operation = operation or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            # Calls made from inside another recorded call are part of that call
+            if getattr(self._local, "active", False):
+                return function(*args, **kwargs)
+            digest = _digest([list(args[1:] if method else args), kwargs])
+            if self.mode == "replay":
+                try:
+                    entry = self.next(service, operation, digest)
+                except CassetteMissing as e:
+                    raise (missing or CassetteMissing)(str(e)) from None
+                self.wait(entry["duration"])
+                if "error" in entry:
+                    raise _decode_error(entry["error"])
+                return _decode(entry["result"])
+
+            entry = {"service": service, "operation": operation, "request": digest, "offset": round(self.elapsed(), 6)}
+            started = time.perf_counter()
+            self._local.active = True
+            try:
+                result = function(*args, **kwargs)
+            except Exception as e:
+                entry.update(duration=round(time.perf_counter() - started, 6), error=_encode_error(e))
+                self.record(entry)
+                raise
+            finally:
+                self._local.active = False
+            entry.update(duration=round(time.perf_counter() - started, 6), result=_encode(result))
+            self.record(entry)
+            return result
+
+        return wrapper
+
+    def close(self) -> None:
+        if self.mode == "record":
+            with self._lock:
+                self._file.close()
+
+    def format_stats(self) -> str:
+        calls = ", ".join(f"{service} {count}" for service, count in sorted(self.calls.items())) or "none"
+        text = f"Cassette ({self.mode}, {self.path}): calls {calls}"
+        if self.mode == "replay":
+            text += (f"; {self.mismatches} requests differed from the recording, {self.missing} missing, "
+                     f"{self.waited:.2f}s of recorded delays at {self.speed:g}x")
+        return text
+
+def wrap(function, service: str, operation: str = None, missing=None):
+    """`function` recorded or replayed if a cassette is active, else unchanged"""
+    cassette = active()
+    return cassette.wrap(function, service, operation, missing=missing) if cassette else function
+
+def instrument(cls, service: str, names: list) -> None:
+    """Record or replay calls to the named methods of a class, if a cassette is active"""
+    cassette = active()
+    if cassette is None:
+        return
+    for name in names:
+        setattr(cls, name, cassette.wrap(getattr(cls, name), service, name, method=True))
+
+_active = None
+_active_lock = threading.Lock()
+
+def active():
+    """The process-wide cassette configured by CASSETTE_MODE / CASSETTE_PATH / CASSETTE_SPEED, if any"""
+    global _active
+    with _active_lock:
+        mode = os.getenv("CASSETTE_MODE", "").lower()
+        if _active is None and mode in ("record", "replay"):
+            _active = Cassette(
+                os.getenv("CASSETTE_PATH", "session.cassette.jsonl.gz"),
+                mode,
+                speed=float(os.getenv("CASSETTE_SPEED", "1"))
+            )
+            atexit.register(_active.close)
+        return _active
+
+# HTTP (used for OpenAI): responses are recorded chunk by chunk, as read from the network
+
+def _operation(request: httpx.Request) -> str:
+    return f"{request.method} {request.url.path}"
+
+def _request_digest(request: httpx.Request) -> str:
+    # Tool descriptions carry the current time, so only the conversation itself is compared
+    try:
+        return _digest(json.loads(request.content)["messages"])
+    except (ValueError, KeyError, TypeError):
+        return _digest(request.content)
+
+def _response_entry(request: httpx.Request, offset: float) -> dict:
+    return {"service": "openai", "operation": _operation(request), "request": _request_digest(request), "offset": offset}
+
+def _encode_chunk(data: bytes):
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        return {"__bytes__": base64.b64encode(data).decode()}
+
+class _RecordingStream(httpx.SyncByteStream, httpx.AsyncByteStream):
+    def __init__(self, stream, cassette: Cassette, entry: dict, started: float):
+        self._stream = stream
+        self._cassette = cassette
+        self._entry = entry
+        self._started = started
+        self._chunks = []
+        self._recorded = False
+
+    def _add(self, data: bytes) -> None:
+        self._chunks.append([round(time.perf_counter() - self._started, 6), _encode_chunk(data)])
+
+    def _finish(self) -> None:
+        if not self._recorded:
+            self._recorded = True
+            self._entry.update(duration=round(time.perf_counter() - self._started, 6), chunks=self._chunks)
+            self._cassette.record(self._entry)
+
+    def __iter__(self):
+        for data in self._stream:
+            self._add(data)
+            yield data
+        self._finish()
+
+    async def __aiter__(self):
+        async for data in self._stream:
+            self._add(data)
+            yield data
+        self._finish()
+
+    def close(self) -> None:
+        self._finish()
+        self._stream.close()
+
+    async def aclose(self) -> None:
+        self._finish()
+        await self._stream.aclose()
+
+class _ReplayStream(httpx.SyncByteStream, httpx.AsyncByteStream):
+    def __init__(self, cassette: Cassette, entry: dict):
+        self._cassette = cassette
+        self._chunks = entry["chunks"]
+        self._headers_at = entry["headers_at"]
+
+    def _data(self, chunk) -> bytes:
+        return chunk.encode("utf-8") if isinstance(chunk, str) else _decode(chunk)
+
+    def __iter__(self):
+        previous = self._headers_at
+        for at, chunk in self._chunks:
+            self._cassette.wait(at - previous)
+            previous = at
+            yield self._data(chunk)
+
+    async def __aiter__(self):
+        previous = self._headers_at
+        for at, chunk in self._chunks:
+            delay = self._cassette.delay(at - previous)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            previous = at
+            yield self._data(chunk)
+
+class CassetteTransport(httpx.BaseTransport):
+    """Records responses from the wrapped transport, or replays them without it"""
+    def __init__(self, cassette: Cassette, transport: httpx.BaseTransport = None):
+        self._cassette = cassette
+        self._transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        request.read()
+        if request.extensions.get("prewarm"):
+            # Connection management, not traffic: neither recorded nor replayed
+            if self._cassette.mode == "replay":
+                return httpx.Response(204)
+            return self._transport.handle_request(request)
+        if self._cassette.mode == "replay":
+            entry = self._cassette.next("openai", _operation(request), _request_digest(request))
+            self._cassette.wait(entry["headers_at"])
+            return httpx.Response(entry["status"], headers=entry["headers"], stream=_ReplayStream(self._cassette, entry))
+        entry = _response_entry(request, round(self._cassette.elapsed(), 6))
+        started = time.perf_counter()
+        response = self._transport.handle_request(request)
+        entry.update(status=response.status_code, headers=response.headers.multi_items(),
+                     headers_at=round(time.perf_counter() - started, 6))
+        return httpx.Response(response.status_code, headers=response.headers, extensions=response.extensions,
+                              stream=_RecordingStream(response.stream, self._cassette, entry, started))
+
+    def close(self) -> None:
+        if self._transport:
+            self._transport.close()
+
+class AsyncCassetteTransport(httpx.AsyncBaseTransport):
+    """Async version of CassetteTransport"""
+    def __init__(self, cassette: Cassette, transport: httpx.AsyncBaseTransport = None):
+        self._cassette = cassette
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        if request.extensions.get("prewarm"):
+            if self._cassette.mode == "replay":
+                return httpx.Response(204)
+            return await self._transport.handle_async_request(request)
+        if self._cassette.mode == "replay":
+            entry = self._cassette.next("openai", _operation(request), _request_digest(request))
+            delay = self._cassette.delay(entry["headers_at"])
+            if delay > 0:
+                await asyncio.sleep(delay)
+            return httpx.Response(entry["status"], headers=entry["headers"], stream=_ReplayStream(self._cassette, entry))
+        entry = _response_entry(request, round(self._cassette.elapsed(), 6))
+        started = time.perf_counter()
+        response = await self._transport.handle_async_request(request)
+        entry.update(status=response.status_code, headers=response.headers.multi_items(),
+                     headers_at=round(time.perf_counter() - started, 6))
+        return httpx.Response(response.status_code, headers=response.headers, extensions=response.extensions,
+                              stream=_RecordingStream(response.stream, self._cassette, entry, started))
+
+    async def aclose(self) -> None:
+        if self._transport:
+            await self._transport.aclose()
@@ -0,0 +1,128 @@
+import asyncio
+import math
+import time
+from collections import defaultdict, deque
+
+class _ResumedStream:
+    """Async stream whose first chunk has already been read"""
+    def __init__(self, stream, first_chunk, iterator):
+        self._stream = stream
+        self._first_chunk = first_chunk
+        self._iterator = iterator
+
+    async def __aiter__(self):
+        yield self._first_chunk
+        async for chunk in self._iterator:
+            yield chunk
+
+    async def close(self):
+        await self._stream.close()
+
+class HedgedCompletions:
+    """
+    Wraps AsyncOpenAI().chat.completions with request hedging.
+    If no response (or, when streaming, no first chunk) arrives within the
+    observed percentile latency, a duplicate request is sent and whichever
+    answers first is used; the other is cancelled.
+    Only wrap side-effect-free completion calls, never tool execution.
+    """
+    def __init__(self, completions, percentile: float = 90, initial_delay: float = 2.0,
+                 min_delay: float = 0.25, max_delay: float = 10.0, min_samples: int = 20,
+                 max_hedge_ratio: float = 0.1, window: int = 200):
+        self._completions = completions
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        self.max_hedge_ratio = max_hedge_ratio
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.saved_seconds = 0.0
+
+    def threshold(self, key) -> float:
+        """Seconds to wait before hedging requests with this (model, stream) key"""
+        samples = self._samples[key]
+        if len(samples) < self.min_samples:
+            return self.initial_delay
+        ordered = sorted(samples)
+        value = ordered[max(0, math.ceil(self.percentile / 100 * len(ordered)) - 1)]
+        return min(self.max_delay, max(self.min_delay, value))
+
+    async def _attempt(self, **kwargs):
+        if not kwargs.get("stream"):
+            return await self._completions.create(**kwargs)
+
+        stream = await self._completions.create(**kwargs)
+        iterator = stream.__aiter__()
+        try:
+            first_chunk = await iterator.__anext__()
+        except BaseException:
+            await stream.close()
+            raise
+        return _ResumedStream(stream, first_chunk, iterator)
+
+    def _estimate_saved(self, key, elapsed: float) -> float:
+        # The cancelled request took longer than `elapsed`; estimate how much
+        # longer from earlier samples that were at least that slow
+        slower = sorted(sample for sample in self._samples[key] if sample > elapsed)
+        return slower[len(slower) // 2] - elapsed if slower else 0.0
+
+    async def create(self, **kwargs):
+        """Same arguments and return value as chat.completions.create"""
+        key = (kwargs.get("model"), bool(kwargs.get("stream")))
+        self.requests += 1
+        started = time.perf_counter()
+
+        primary = asyncio.ensure_future(self._attempt(**kwargs))
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=self.threshold(key))
+        except asyncio.CancelledError:
+            # asyncio.wait does not cancel what it waits for; nothing else would await the request
+            primary.cancel()
+            raise
+        if done or self.hedged >= self.max_hedge_ratio * self.requests:
+            result = await primary
+            self._samples[key].append(time.perf_counter() - started)
+            return result
+
+        self.hedged += 1
+        hedge_started = time.perf_counter()
+        hedge = asyncio.ensure_future(self._attempt(**kwargs))
+        pending = {primary, hedge}
+        winner = None
+        error = None
+        try:
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = error or task.exception()
+                    elif winner is None:
+                        winner = task
+                    elif kwargs.get("stream"):
+                        await task.result().close()
+        finally:
+            for task in pending:
+                task.cancel()
+
+        if winner is None:
+            raise error
+
+        elapsed = time.perf_counter() - started
+        if winner is hedge:
+            self.hedge_wins += 1
+            self.saved_seconds += self._estimate_saved(key, elapsed)
+            self._samples[key].append(time.perf_counter() - hedge_started)
+        # The primary took at least this long, keep it in the distribution
+        self._samples[key].append(elapsed)
+        return winner.result()
+
+    def format_stats(self) -> str:
+        rate = self.hedged / self.requests if self.requests else 0.0
+        return (
+            f"Hedging: {self.hedged}/{self.requests} requests hedged ({rate:.0%}), "
+            f"hedge won {self.hedge_wins}, ~{self.saved_seconds:.1f}s saved"
+        )
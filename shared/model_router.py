@@ -0,0 +1,186 @@
+"""
+Per-phase model selection for the chat apps.
+
+Each phase of a conversation (the forced function decision, the final
+answer, the cancellation reply, the bot's trade confirmation...) has its own
+list of candidate models, fastest first. Requests go to the first candidate
+that is currently healthy and within the phase's latency budget; outputs that
+fail validation are retried on the next, larger model.
+"""
+import math
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+def models_from_env(phase: str, default: str) -> list:
+    """Candidate models for a phase from OPENAI_MODEL_<PHASE>, a comma-separated list, fastest first"""
+    value = os.getenv(f"OPENAI_MODEL_{phase.upper()}", default)
+    return [model.strip() for model in value.split(",") if model.strip()]
+
+def _percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+class RouteStats:
+    """Samples and totals for one (phase, model) route; samples are (time, value) pairs"""
+    def __init__(self, window: int):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.calls = 0
+        self.errors = 0
+        self.invalid = 0
+        self.escalations = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    @staticmethod
+    def recent(samples, max_age: float, min_samples: int = 0) -> list:
+        """
+        Values at most max_age seconds old. If fewer than min_samples are, the last min_samples
+        regardless of age: the route's last known state, until new calls (probes) replace it
+        """
+        oldest = time.monotonic() - max_age
+        values = [value for at, value in samples if at >= oldest]
+        if len(values) < min_samples:
+            values = [value for _, value in list(samples)[-min_samples:]]
+        return values
+
+class RouteCall:
+    """One request on a route; collects token usage and whether the output was rejected"""
+    def __init__(self, phase: str, model: str):
+        self.phase = phase
+        self.model = model
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.rejected = False
+
+    def add_usage(self, usage) -> None:
+        if usage:
+            self.prompt_tokens += usage.prompt_tokens or 0
+            self.completion_tokens += usage.completion_tokens or 0
+
+    def reject(self) -> None:
+        """Mark the output as invalid (e.g. the decision could not be parsed)"""
+        self.rejected = True
+
+class ModelRouter:
+    """
+    Chooses a model per phase from observed latency and error rates.
+
+    A candidate is healthy while its error rate (API errors and rejected
+    outputs) over its recent calls (the last `window`, at most max_age seconds
+    old) is at most max_error_rate. The first
+    healthy candidate whose p90 latency is within the phase budget is used; if
+    none is, the healthy one with the lowest p90; if none is healthy, the last
+    (largest) one. A route whose samples have expired keeps being judged on its
+    last ones, so a quiet spell does not send the next burst to a model that was
+    slow or failing. Every probe_every-th request of a phase goes to one of the
+    other candidates in turn, so a model that was avoided can win its place back.
+    """
+    def __init__(self, routes: dict, budgets: dict = None, default_budget: float = 5.0,
+                 max_error_rate: float = 0.2, min_samples: int = 5, probe_every: int = 10, window: int = 50,
+                 max_age: float = 300.0):
+        """
+        routes: {phase: [model, ...]} with the fastest model first and the largest last
+        budgets: {phase: seconds} of acceptable p90 latency per phase
+        """
+        self.routes = routes
+        self.budgets = budgets or {}
+        self.default_budget = default_budget
+        self.max_error_rate = max_error_rate
+        self.min_samples = min_samples
+        self.probe_every = probe_every
+        self.max_age = max_age
+        self._stats = defaultdict(lambda: RouteStats(window))
+        self._requests = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def _p90(self, phase: str, model: str) -> float:
+        latencies = RouteStats.recent(self._stats[(phase, model)].latencies, self.max_age, self.min_samples)
+        # Too few samples to judge: treat as fast so the model gets tried
+        return _percentile(latencies, 90) if len(latencies) >= self.min_samples else 0.0
+
+    def _healthy(self, phase: str, model: str) -> bool:
+        outcomes = RouteStats.recent(self._stats[(phase, model)].outcomes, self.max_age, self.min_samples)
+        return len(outcomes) < self.min_samples or 1 - sum(outcomes) / len(outcomes) <= self.max_error_rate
+
+    def _preferred(self, phase: str) -> str:
+        candidates = self.routes[phase]
+        healthy = [model for model in candidates if self._healthy(phase, model)]
+        if not healthy:
+            return candidates[-1]
+        budget = self.budgets.get(phase, self.default_budget)
+        for model in healthy:
+            if self._p90(phase, model) <= budget:
+                return model
+        return min(healthy, key=lambda model: self._p90(phase, model))
+
+    def choose(self, phase: str) -> str:
+        """The model for the next request of this phase"""
+        candidates = self.routes[phase]
+        with self._lock:
+            self._requests[phase] += 1
+            count = self._requests[phase]
+            preferred = self._preferred(phase)
+            if len(candidates) > 1 and count % self.probe_every == 0:
+                # Probe a model that would not get this request anyway
+                others = [model for model in candidates if model != preferred]
+                return others[(count // self.probe_every) % len(others)]
+            return preferred
+
+    def escalate(self, phase: str, model: str):
+        """The next larger model after `model`, or None if it already was the largest"""
+        candidates = self.routes[phase]
+        position = candidates.index(model) if model in candidates else len(candidates) - 1
+        if position + 1 >= len(candidates):
+            return None
+        with self._lock:
+            self._stats[(phase, model)].escalations += 1
+        return candidates[position + 1]
+
+    def record(self, call: RouteCall, seconds: float, error: bool = False) -> None:
+        with self._lock:
+            stats = self._stats[(call.phase, call.model)]
+            stats.calls += 1
+            stats.errors += int(error)
+            stats.invalid += int(call.rejected)
+            stats.prompt_tokens += call.prompt_tokens
+            stats.completion_tokens += call.completion_tokens
+            now = time.monotonic()
+            stats.outcomes.append((now, not (error or call.rejected)))
+            # Failed calls say nothing about how fast the model answers
+            if not error:
+                stats.latencies.append((now, seconds))
+
+    @contextmanager
+    def call(self, phase: str, model: str = None):
+        """
+        Time a request on a route; yields a RouteCall whose .model to use.
+        Pass model to pin it, e.g. after escalate(). Exceptions count as errors.
+        """
+        route_call = RouteCall(phase, model or self.choose(phase))
+        started = time.perf_counter()
+        try:
+            yield route_call
+        except Exception:
+            self.record(route_call, time.perf_counter() - started, error=True)
+            raise
+        self.record(route_call, time.perf_counter() - started)
+
+    def format_stats(self) -> str:
+        lines = []
+        with self._lock:
+            for (phase, model), stats in sorted(self._stats.items()):
+                if not stats.calls:
+                    continue
+                latencies = [seconds for _, seconds in stats.latencies]
+                p50 = _percentile(latencies, 50) * 1000 if latencies else 0.0
+                p90 = _percentile(latencies, 90) * 1000 if latencies else 0.0
+                lines.append(
+                    f"{phase} -> {model}: {stats.calls} calls, p50={p50:.0f}ms p90={p90:.0f}ms, "
+                    f"{stats.errors} errors, {stats.invalid} invalid, {stats.escalations} escalated, "
+                    f"{stats.prompt_tokens}+{stats.completion_tokens} tokens"
+                )
+        return "Model routes:\n  " + "\n  ".join(lines) if lines else "Model routes: no calls yet."
@@ -0,0 +1,174 @@
+"""
+Process-wide OpenAI clients that share one tuned HTTP connection pool.
+
+Every app used to create its own default client at import time. httpx drops
+idle connections after 5 seconds by default, which is shorter than the time a
+user takes to type a message, so almost every turn paid DNS, TCP and TLS setup
+again. Clients handed out here keep connections alive much longer, use HTTP/2
+when the optional h2 package is installed, can open a connection ahead of the
+first request (prewarm) and differ only in their timeout profile.
+"""
+from importlib.util import find_spec
+import os
+import threading
+import time
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+from shared import cassettes
+
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "10"))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "120"))
+OPENAI_HTTP2 = os.getenv("OPENAI_HTTP2", "true").lower() == "true"
+
+TIMEOUT_PROFILES = {
+    # Turns the user is waiting on; a connection that cannot be made quickly is retried
+    "interactive": httpx.Timeout(60.0, connect=5.0),
+    # Audio generation returns the whole clip in one response
+    "speech": httpx.Timeout(120.0, connect=5.0),
+    # Work nobody is watching
+    "background": httpx.Timeout(600.0, connect=10.0),
+}
+
+# Steps of setting up a new connection, as reported by httpcore's trace extension
+_CONNECT_STEPS = ("connection.connect_tcp", "connection.start_tls")
+
+class ConnectionStats:
+    """Requests sent vs connections opened through the shared pools"""
+    def __init__(self):
+        self.requests = 0
+        self.connections = 0
+        self.prewarms = 0
+        # Requests (not counting prewarms) that had to open their own connection
+        self.cold_requests = 0
+        self.connect_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def on_request(self, request: httpx.Request, is_async: bool = False) -> None:
+        is_prewarm = bool(request.extensions.get("prewarm"))
+        with self._lock:
+            if is_prewarm:
+                self.prewarms += 1
+            else:
+                self.requests += 1
+        started = {}
+
+        def trace(name: str, info: dict) -> None:
+            step, _, phase = name.rpartition(".")
+            if step not in _CONNECT_STEPS:
+                return
+            if phase == "started":
+                started[step] = time.perf_counter()
+            elif phase == "complete":
+                with self._lock:
+                    self.connect_seconds += time.perf_counter() - started.get(step, time.perf_counter())
+                    if step == "connection.connect_tcp":
+                        self.connections += 1
+                        if not is_prewarm:
+                            self.cold_requests += 1
+
+        async def async_trace(name: str, info: dict) -> None:
+            trace(name, info)
+
+        request.extensions["trace"] = async_trace if is_async else trace
+
+    def reuse_rate(self) -> float:
+        """Share of API requests that were sent on an already open connection"""
+        return 1 - self.cold_requests / self.requests if self.requests else 0.0
+
+    def format_stats(self) -> str:
+        return (
+            f"OpenAI connections: {self.requests} requests, {self.connections} connections opened "
+            f"({self.prewarms} prewarms), {self.reuse_rate():.0%} of requests reused one, "
+            f"{self.connect_seconds:.2f}s spent connecting, {'HTTP/2' if http2_enabled() else 'HTTP/1.1'}"
+        )
+
+stats = ConnectionStats()
+
+_lock = threading.Lock()
+_http_clients = {}
+_clients = {}
+
+def http2_enabled() -> bool:
+    # httpx only speaks HTTP/2 with the optional h2 package installed
+    return OPENAI_HTTP2 and find_spec("h2") is not None
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY
+    )
+
+def _transport(is_async: bool):
+    """The cassette transport when recording or replaying (CASSETTE_MODE), else None for httpx's own"""
+    cassette = cassettes.active()
+    if cassette is None:
+        return None
+    if is_async:
+        # A custom transport replaces the client's pool, so the pool settings go to the wrapped one
+        inner = httpx.AsyncHTTPTransport(limits=_limits(), http2=http2_enabled())
+        return cassettes.AsyncCassetteTransport(cassette, inner)
+    return cassettes.CassetteTransport(cassette, httpx.HTTPTransport(limits=_limits(), http2=http2_enabled()))
+
+def _http_client(is_async: bool):
+    if is_async not in _http_clients:
+        if is_async:
+            async def on_request(request):
+                stats.on_request(request, is_async=True)
+            _http_clients[is_async] = DefaultAsyncHttpxClient(
+                limits=_limits(), http2=http2_enabled(), event_hooks={"request": [on_request]},
+                transport=_transport(True)
+            )
+        else:
+            _http_clients[is_async] = DefaultHttpxClient(
+                limits=_limits(), http2=http2_enabled(), event_hooks={"request": [stats.on_request]},
+                transport=_transport(False)
+            )
+    return _http_clients[is_async]
+
+def _client(is_async: bool, profile: str):
+    with _lock:
+        key = (is_async, profile)
+        if key not in _clients:
+            base = _clients.get((is_async, None))
+            if base is None:
+                client_class = AsyncOpenAI if is_async else OpenAI
+                base = _clients[(is_async, None)] = client_class(http_client=_http_client(is_async))
+            # Copies share the base client's connection pool
+            _clients[key] = base.with_options(timeout=TIMEOUT_PROFILES[profile])
+        return _clients[key]
+
+def get_client(profile: str = "interactive") -> OpenAI:
+    """The shared synchronous client with the given timeout profile"""
+    return _client(False, profile)
+
+def get_async_client(profile: str = "interactive") -> AsyncOpenAI:
+    """The shared asynchronous client with the given timeout profile; use it from a single event loop"""
+    return _client(True, profile)
+
+def _prewarm_request(client) -> dict:
+    # Any response will do, the point is the connection left in the pool
+    return dict(method="HEAD", url=str(client.base_url), timeout=10.0, extensions={"prewarm": True})
+
+def prewarm() -> threading.Thread:
+    """Open a connection for the synchronous clients in the background, e.g. while the user types"""
+    client = get_client()
+
+    def run():
+        try:
+            _http_client(False).request(**_prewarm_request(client))
+        except httpx.HTTPError:
+            pass
+
+    thread = threading.Thread(target=run, name="openai-prewarm", daemon=True)
+    thread.start()
+    return thread
+
+async def prewarm_async() -> None:
+    """Open a connection for the asynchronous clients; run it as a task on the loop that will use them"""
+    client = get_async_client()
+    try:
+        await _http_client(True).request(**_prewarm_request(client))
+    except httpx.HTTPError:
+        pass
@@ -0,0 +1,184 @@
+"""
+Local stand-in for the OpenAI chat completions endpoint.
+
+Answers POST /v1/chat/completions with a fixed reply, streamed as server-sent
+events when the request asks for it, so the apps' HTTP path can be run and
+benchmarked without network access or an API key:
+
+    python shared/openai_stand_in.py --port 8790 --handshake-delay 0.15
+    OPENAI_BASE_URL=http://localhost:8790/v1 OPENAI_API_KEY=test python chatgpt-terminal/index.py
+
+handshake_delay is added to every new connection, standing in for DNS, TCP
+and TLS setup; model_latency overrides latency for individual models and
+chunk_delay is the time between streamed chunks. A request that forces a
+function (tool_choice) gets a call to it, with the reply in the terminal's
+use_function_decision format as arguments.
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class OpenAIStandIn:
+    def __init__(self, latency: float = 0.0, handshake_delay: float = 0.0, reply: str = "Hello!",
+                 model_latency: dict = None, chunk_delay: float = 0.0):
+        self.latency = latency
+        self.model_latency = model_latency or {}
+        self.handshake_delay = handshake_delay
+        self.chunk_delay = chunk_delay
+        self.reply = reply
+        self.connections = 0
+        self.requests = 0
+
+    def forced_function(self, request: dict):
+        """Name of the function the request forces with tool_choice, if any"""
+        tool_choice = request.get("tool_choice")
+        if isinstance(tool_choice, dict):
+            return tool_choice.get("function", {}).get("name")
+        return None
+
+    def arguments(self) -> str:
+        return json.dumps({"use_function": False, "function_name": "", "response": f"▓{self.reply}░",
+                           "function_arguments": ""}, ensure_ascii=False)
+
+    def completion(self, request: dict) -> dict:
+        function = self.forced_function(request)
+        if function:
+            message = {"role": "assistant", "content": None, "tool_calls": [{
+                "id": f"call_{uuid.uuid4().hex[:24]}", "type": "function",
+                "function": {"name": function, "arguments": self.arguments()}
+            }]}
+        else:
+            message = {"role": "assistant", "content": self.reply}
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "gpt-4o"),
+            "choices": [{
+                "index": 0,
+                "message": message,
+                "finish_reason": "tool_calls" if function else "stop"
+            }],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12}
+        }
+
+    def deltas(self, request: dict):
+        function = self.forced_function(request)
+        if function:
+            yield {"role": "assistant", "content": None, "tool_calls": [{
+                "index": 0, "id": f"call_{uuid.uuid4().hex[:24]}", "type": "function",
+                "function": {"name": function, "arguments": ""}
+            }]}
+            # Arguments arrive in small pieces, as they do from the API
+            arguments = self.arguments()
+            for start in range(0, len(arguments), 8):
+                yield {"tool_calls": [{"index": 0, "function": {"arguments": arguments[start:start + 8]}}]}
+            return
+        for i, word in enumerate(self.reply.split(" ")):
+            yield {"role": "assistant", "content": word} if i == 0 else {"content": " " + word}
+
+    def chunks(self, request: dict):
+        """The reply as chat.completion.chunk objects, one word (or a few argument characters) per chunk"""
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        words = self.reply.split(" ")
+        for delta in self.deltas(request):
+            yield {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                   "model": request.get("model", "gpt-4o"),
+                   "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+        yield {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+               "model": request.get("model", "gpt-4o"),
+               "choices": [{"index": 0, "delta": {}, "finish_reason": "tool_calls" if self.forced_function(request) else "stop"}]}
+        if (request.get("stream_options") or {}).get("include_usage"):
+            yield {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                   "model": request.get("model", "gpt-4o"), "choices": [],
+                   "usage": {"prompt_tokens": 10, "completion_tokens": len(words), "total_tokens": 10 + len(words)}}
+
+    def make_handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes; avoid Nagle stalls on kept-alive connections
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                stand_in.connections += 1
+                time.sleep(stand_in.handshake_delay)
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, body: dict, head: bool = False) -> None:
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                if not head:
+                    self.wfile.write(data)
+
+            def _not_found(self, head: bool = False) -> None:
+                self._send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}}, head)
+
+            def do_HEAD(self):
+                self._not_found(head=True)
+
+            def do_GET(self):
+                self._not_found()
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                if self.path.rstrip("/") != "/v1/chat/completions":
+                    self._not_found()
+                    return
+                stand_in.requests += 1
+                time.sleep(stand_in.model_latency.get(request.get("model"), stand_in.latency))
+                if not request.get("stream"):
+                    self._send_json(200, stand_in.completion(request))
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for chunk in stand_in.chunks(request):
+                    self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+                    time.sleep(stand_in.chunk_delay)
+                self._write_chunk(b"data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _write_chunk(self, data: bytes) -> None:
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+    def serve(self, host: str = "localhost", port: int = 0) -> ThreadingHTTPServer:
+        """Start serving in a background thread; returns the server (shutdown() it to stop)"""
+        server = ThreadingHTTPServer((host, port), self.make_handler())
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the OpenAI chat completions API")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument("--handshake-delay", type=float, default=0.0, help="Seconds added to every new connection")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="Seconds between streamed chunks")
+    parser.add_argument("--reply", default="Hello! How can I help you today?")
+    args = parser.parse_args()
+    server = OpenAIStandIn(args.latency, args.handshake_delay, args.reply, chunk_delay=args.chunk_delay).serve(args.host, args.port)
+    print(f"OpenAI stand-in listening on http://{args.host}:{server.server_port}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
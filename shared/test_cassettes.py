@@ -0,0 +1,58 @@
+"""
+Record/replay round trips through a cassette.
+
+    python -m unittest shared.test_cassettes
+"""
+import json
+import os
+import tempfile
+import unittest
+from shared import cassettes
+from shared.cassettes import Cassette, _decode, _encode
+
+def usdc_assets() -> set:
+    return {"BTC", "ETH", "SOL"}
+
+class CassetteRoundTripTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "session.cassette.jsonl.gz")
+
+    def round_trip(self, function, *args):
+        recorder = Cassette(self.path, "record")
+        recorded = recorder.wrap(function, "test")(*args)
+        recorder.close()
+        player = Cassette(self.path, "replay", speed=0)
+        return recorded, player.wrap(function, "test")(*args)
+
+    def test_encode_keeps_value_types(self):
+        value = {"set": {"BTC", "ETH"}, "frozen": frozenset({1, 2}), "tuple": (1, "a"), "bytes": b"\x00\xff"}
+        self.assertEqual(_decode(json.loads(json.dumps(_encode(value)))), value)
+
+    def test_equal_sets_encode_alike(self):
+        self.assertEqual(_encode({"ETH", "BTC", "SOL"}), _encode({"SOL", "BTC", "ETH"}))
+
+    def test_set_returning_function_replays_as_set(self):
+        recorded, replayed = self.round_trip(usdc_assets)
+        self.assertIsInstance(replayed, set)
+        self.assertEqual(replayed, recorded)
+
+    def test_replay_raises_recorded_error(self):
+        def fail():
+            raise ValueError("insufficient balance")
+
+        recorder = Cassette(self.path, "record")
+        with self.assertRaises(ValueError):
+            recorder.wrap(fail, "test")()
+        recorder.close()
+        with self.assertRaisesRegex(ValueError, "insufficient balance"):
+            Cassette(self.path, "replay", speed=0).wrap(fail, "test")()
+
+    def test_replay_without_recording_raises_missing(self):
+        Cassette(self.path, "record").close()
+        with self.assertRaises(cassettes.CassetteMissing):
+            Cassette(self.path, "replay", speed=0).wrap(usdc_assets, "test")()
+
+if __name__ == "__main__":
+    unittest.main()